@@ -3,12 +3,15 @@ import asyncio
 import json
 import logging
 import os
+from functools import cache
 
 import boto3
 from web3 import Web3
 
+from kakarot_scripts.constants import EVM_PRIVATE_KEY, NETWORK, RPC_CLIENT
 from kakarot_scripts.utils.starknet import (
     get_balance,
+    get_balances,
     get_contract,
     get_eth_contract,
     get_starknet_account,
@@ -18,55 +21,106 @@ from kakarot_scripts.utils.starknet import (
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
-client = boto3.client("secretsmanager")
-ssm = boto3.client("ssm")
-node_url = os.getenv("NODE_URL")
-web3 = Web3(Web3.HTTPProvider(node_url))
+# In dry-run mode, secrets are read from the local .env (see kakarot_scripts.constants)
+# instead of AWS Secrets Manager, and no transaction is sent. Pointing NODE_URL and
+# STARKNET_NETWORK to a local devnet (e.g. katana) allows running the whole balancing
+# logic without touching the real chain.
+DRY_RUN = os.getenv("DRY_RUN", "false").lower() in {"1", "true", "yes"}
 
-with open("coinbase_abi.json", "r") as f:
-    coinbase_abi = json.load(f)
+# The event loop is kept at module level so that warm lambda invocations reuse the
+# clients (and their underlying http sessions) created by the previous invocations.
+_loop = asyncio.new_event_loop()
 
-contract_address = os.getenv("COINBASE_CONTRACT_ADDRESS")
 
-# Create smart contract instance
-contract = web3.eth.contract(address=contract_address, abi=coinbase_abi)
+@cache
+def get_secrets_client():
+    return boto3.client("secretsmanager")
 
 
-def lambda_handler(event, context):
-    return asyncio.get_event_loop().run_until_complete(check_and_fund_relayers())
+@cache
+def get_web3():
+    return Web3(Web3.HTTPProvider(os.getenv("NODE_URL")))
 
 
-async def check_and_fund_relayers():
-    # Load relayers information from JSON file
-    with open("relayers.json", "r") as f:
-        relayers = json.load(f)
+@cache
+def get_coinbase_contract():
+    with open("coinbase_abi.json", "r") as f:
+        coinbase_abi = json.load(f)
 
-    # Retrieve starknet secret from AWS Secrets Manager
-    response = client.get_secret_value(SecretId="relayers_fund_account")
+    return get_web3().eth.contract(
+        address=os.getenv("COINBASE_CONTRACT_ADDRESS"), abi=coinbase_abi
+    )
+
+
+@cache
+def get_relayers():
+    with open("relayers.json", "r") as f:
+        return json.load(f)
+
+
+@cache
+def get_secret(secret_id):
+    """
+    Return the (address, private_key) pair stored in the given secret.
+    """
+    if DRY_RUN:
+        return {
+            "relayers_fund_account": (
+                NETWORK["account_address"],
+                NETWORK["private_key"],
+            ),
+            "eth_coinbase_owner": (
+                get_web3().eth.account.from_key(EVM_PRIVATE_KEY).address,
+                EVM_PRIVATE_KEY,
+            ),
+        }[secret_id]
+
+    response = get_secrets_client().get_secret_value(SecretId=secret_id)
     secret_dict = json.loads(response["SecretString"])
+    return next(iter(secret_dict.items()))
+
+
+def warm_up():
+    """
+    Create all the clients and load the static files once per lambda container.
+    """
+    if not DRY_RUN:
+        get_secrets_client()
+    get_web3()
+    get_coinbase_contract()
+    get_relayers()
+
+
+def lambda_handler(event, context):
+    return _loop.run_until_complete(check_and_fund_relayers())
+
+
+async def check_and_fund_relayers():
+    relayers = get_relayers()
 
-    starknet_address, starknet_private_key = next(iter(secret_dict.items()))
+    starknet_address, starknet_private_key = get_secret("relayers_fund_account")
     starknet_account = await get_starknet_account(
         starknet_address, starknet_private_key
     )
     eth_contract = await get_eth_contract(starknet_account)
 
-    # Retrieve eth secret from AWS Secrets Manager
-    response = client.get_secret_value(SecretId="eth_coinbase_owner")
-    secret_dict = json.loads(response["SecretString"])
-
-    eth_address, eth_private_key = next(iter(secret_dict.items()))
-    nonce = web3.eth.get_transaction_count(eth_address)
+    eth_address, eth_private_key = get_secret("eth_coinbase_owner")
+    nonce = get_web3().eth.get_transaction_count(eth_address)
 
     account_balance_before_withdraw = await get_balance(
-        starknet_account.starknet_address, eth_contract
+        starknet_account.address, eth_contract
     )
 
     # withdraw fees from coinbase contract
     await withdraw_fee(starknet_address, nonce, eth_address, eth_private_key)
 
-    account_balance = await get_balance(starknet_account.starknet_address, eth_contract)
-    relayers_total_balance = await get_total_balance_of_relayers(relayers, eth_contract)
+    block_number = await RPC_CLIENT.get_block_number()
+    account_balance = await get_balance(
+        starknet_account.address, eth_contract, block_number
+    )
+    relayers_total_balance = await get_total_balance_of_relayers(
+        relayers, eth_contract, block_number
+    )
 
     actual_fee = account_balance - account_balance_before_withdraw
 
@@ -78,8 +132,6 @@ async def check_and_fund_relayers():
 
     cairo_counter = get_contract("Kakarot")
 
-    yield cairo_counter
-
     base_fee = await cairo_counter.functions["get_base_fee"].call()
     logger.info(f"Base fee: {base_fee}")
     changed_fee = base_fee
@@ -98,33 +150,43 @@ async def check_and_fund_relayers():
         logger.info("No changes to the base fee")
 
     if changed_fee != base_fee:
-        tx = await cairo_counter.functions["set_base_fee"].invoke_v1(base_fee)
-        await wait_for_transaction(tx.hash)
+        if DRY_RUN:
+            logger.info(f"Dry run: would set base fee from {base_fee} to {changed_fee}")
+        else:
+            tx = await cairo_counter.functions["set_base_fee"].invoke_v1(
+                int(changed_fee)
+            )
+            await wait_for_transaction(tx.hash)
 
     return {
         "statusCode": 200,
     }
 
 
-async def get_total_balance_of_relayers(relayers, eth_contract, block_number):
-    total_balance = 0
-
-    for relayer in relayers:
-        account_balance = await get_balance(
-            relayer["address"], eth_contract, block_number
-        )
-        total_balance += account_balance
-
-    return total_balance
+async def get_total_balance_of_relayers(relayers, eth_contract, block_number=None):
+    """
+    Sum the balances of all the relayers, read concurrently at the same block.
+    """
+    balances = await get_balances(
+        [relayer["address"] for relayer in relayers], eth_contract, block_number
+    )
+    return sum(balances)
 
 
 async def withdraw_fee(starknet_address, nonce, eth_address, eth_private_key):
+    web3 = get_web3()
     Chain_id = web3.eth.chain_id
 
     # Call your function
-    call_function = contract.functions.withdraw(
-        toStarknetAddress=starknet_address
-    ).build_transaction({"chainId": Chain_id, "from": eth_address, "nonce": nonce})
+    call_function = (
+        get_coinbase_contract()
+        .functions.withdraw(toStarknetAddress=starknet_address)
+        .build_transaction({"chainId": Chain_id, "from": eth_address, "nonce": nonce})
+    )
+
+    if DRY_RUN:
+        logger.info(f"Dry run: would send withdraw transaction {call_function}")
+        return
 
     # Sign transaction
     signed_tx = web3.eth.account.sign_transaction(
@@ -137,3 +199,12 @@ async def withdraw_fee(starknet_address, nonce, eth_address, eth_private_key):
     # Wait for transaction receipt
     tx_receipt = web3.eth.wait_for_transaction_receipt(send_tx)
     logger.info(tx_receipt)
+
+
+# AWS_LAMBDA_FUNCTION_NAME is set in the lambda containers only, so that the module can
+# be imported, e.g. in the tests, without the static files and the AWS credentials.
+if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    warm_up()
+
+if __name__ == "__main__":
+    print(lambda_handler({}, None))
@@ -0,0 +1,90 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import fee_balancer
+from kakarot_scripts.utils import starknet
+
+
+class TestGetBalances:
+    async def test_should_read_all_balances_at_the_same_block(self):
+        with (
+            patch.object(
+                starknet,
+                "get_balance",
+                AsyncMock(side_effect=lambda address, *_: address * 10),
+            ) as get_balance,
+            patch.object(
+                starknet.RPC_CLIENT, "get_block_number", AsyncMock(return_value=42)
+            ),
+        ):
+            balances = await starknet.get_balances(
+                [3, 1, 2], token_contract="eth", max_concurrency=2
+            )
+
+        assert balances == [30, 10, 20]
+        assert {call.args[1:] for call in get_balance.call_args_list} == {("eth", 42)}
+
+    async def test_should_use_the_given_block(self):
+        with (
+            patch.object(
+                starknet, "get_balance", AsyncMock(return_value=1)
+            ) as get_balance,
+            patch.object(starknet.RPC_CLIENT, "get_block_number", AsyncMock()) as bn,
+        ):
+            total = await fee_balancer.get_total_balance_of_relayers(
+                [{"address": 1}, {"address": 2}], "eth", block_number=7
+            )
+
+        assert total == 2
+        bn.assert_not_awaited()
+        assert {call.args[1:] for call in get_balance.call_args_list} == {("eth", 7)}
+
+
+class TestCheckAndFundRelayers:
+    @pytest.fixture
+    def kakarot(self):
+        set_base_fee = MagicMock(invoke_v1=AsyncMock(return_value=MagicMock(hash=1)))
+        return MagicMock(
+            functions={
+                "get_base_fee": MagicMock(call=AsyncMock(return_value=800)),
+                "set_base_fee": set_base_fee,
+            }
+        )
+
+    @pytest.fixture(autouse=True)
+    def network(self, kakarot, monkeypatch):
+        monkeypatch.setenv("PREV_TOTAL_BALANCE", "0")
+        monkeypatch.setenv("EARNING_PERCENTAGE", "10")
+        # The account gets 50 from the coinbase while the relayers spent 100
+        mocks = {
+            "get_relayers": MagicMock(return_value=[]),
+            "get_secret": MagicMock(return_value=(0x1, 0x2)),
+            "get_starknet_account": AsyncMock(return_value=MagicMock(address=0x1)),
+            "get_eth_contract": AsyncMock(),
+            "get_web3": MagicMock(),
+            "get_balance": AsyncMock(side_effect=[100, 150]),
+            "withdraw_fee": AsyncMock(),
+            "RPC_CLIENT": MagicMock(get_block_number=AsyncMock(return_value=42)),
+            "get_total_balance_of_relayers": AsyncMock(return_value=100),
+            "get_contract": MagicMock(return_value=kakarot),
+            "wait_for_transaction": AsyncMock(),
+        }
+        for name, mock in mocks.items():
+            monkeypatch.setattr(fee_balancer, name, mock)
+        return mocks
+
+    async def test_should_set_the_changed_fee(self, kakarot, network, monkeypatch):
+        monkeypatch.setattr(fee_balancer, "DRY_RUN", False)
+
+        await fee_balancer.check_and_fund_relayers()
+
+        kakarot.functions["set_base_fee"].invoke_v1.assert_awaited_once_with(900)
+        network["wait_for_transaction"].assert_awaited_once_with(1)
+
+    async def test_should_not_set_the_fee_in_dry_run(self, kakarot, monkeypatch):
+        monkeypatch.setattr(fee_balancer, "DRY_RUN", True)
+
+        await fee_balancer.check_and_fund_relayers()
+
+        kakarot.functions["set_base_fee"].invoke_v1.assert_not_awaited()
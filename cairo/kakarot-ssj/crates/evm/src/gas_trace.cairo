@@ -0,0 +1,29 @@
+//! Structured trace of the executed opcodes, enabled with the `gas-trace` feature:
+//! `snforge test --features gas-trace`.
+//! Each opcode is printed as a NDJSON line, see scripts/gas_debug_call.py.
+use crate::errors::EVMError;
+use crate::interpreter::EVMTrait;
+use crate::model::vm::{VM, VMTrait};
+
+#[cfg(feature: 'gas-trace')]
+pub fn execute_opcode_traced(ref vm: VM, pc: usize, opcode: u8) -> Result<(), EVMError> {
+    let gas_before = vm.gas_left();
+    let result = EVMTrait::execute_opcode(ref vm, opcode);
+    let address: felt252 = vm.message().target.evm.into();
+    println!(
+        "{{\"address\":{},\"depth\":{},\"pc\":{},\"opcode\":{},\"gas_before\":{},\"gas_after\":{}}}",
+        address,
+        vm.message().depth,
+        pc,
+        opcode,
+        gas_before,
+        vm.gas_left()
+    );
+    result
+}
+
+#[cfg(not(feature: 'gas-trace'))]
+#[inline(always)]
+pub fn execute_opcode_traced(ref vm: VM, _pc: usize, opcode: u8) -> Result<(), EVMError> {
+    EVMTrait::execute_opcode(ref vm, opcode)
+}
@@ -7,6 +7,7 @@ use core::starknet::storage::{StoragePointerReadAccess};
 use crate::backend::starknet_backend;
 use crate::create_helpers::CreateHelpers;
 use crate::errors::{EVMError, EVMErrorTrait};
+use crate::gas_trace::execute_opcode_traced;
 
 use crate::instructions::{
     ExchangeOperationsTrait, LoggingOperationsTrait, StopAndArithmeticOperationsTrait,
@@ -364,8 +365,9 @@ pub impl EVMImpl of EVMTrait {
         }
 
         let opcode: u8 = *bytecode.at(pc);
+        let result = execute_opcode_traced(ref vm, pc, opcode);
 
-        match Self::execute_opcode(ref vm, opcode) {
+        match result {
             Result::Ok(_) => {
                 if opcode != 0x56 && opcode != 0x57 {
                     // Increment pc if not a JUMP family opcode
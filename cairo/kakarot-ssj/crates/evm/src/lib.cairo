@@ -11,6 +11,9 @@ pub mod errors;
 // Gas module
 pub mod gas;
 
+// Opcodes trace module
+mod gas_trace;
+
 // instructions module
 pub mod instructions;
 
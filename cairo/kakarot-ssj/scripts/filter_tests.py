@@ -13,15 +13,17 @@ def filter_tests(directory, filter_string):
     print(f"Filtered tests for {filter_string}")
 
 
-def filter_file(file_path, filter_string):
-    with open(file_path, "r") as f:
-        content = f.read()
+# Regular expression to match test functions, including nested braces
+TEST_PATTERN = re.compile(
+    r"#\[test\]\s*(?:#\[available_gas\([^\)]+\)\]\s*)?fn\s+(\w+)\s*\([^)]*\)\s*(\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\})",
+    re.DOTALL,
+)
 
-    # Regular expression to match test functions, including nested braces
-    test_pattern = re.compile(
-        r"#\[test\]\s*(?:#\[available_gas\([^\)]+\)\]\s*)?fn\s+(\w+)\s*\([^)]*\)\s*(\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\})",
-        re.DOTALL,
-    )
+
+def filter_content(content, filter_string):
+    """Remove the test functions whose name doesn't contain the filter string."""
+    if "#[test]" not in content:
+        return content
 
     def replace_func(match):
         full_match = match.group(0)
@@ -31,7 +33,14 @@ def filter_file(file_path, filter_string):
         else:
             return ""
 
-    new_content = test_pattern.sub(replace_func, content)
+    return TEST_PATTERN.sub(replace_func, content)
+
+
+def filter_file(file_path, filter_string):
+    with open(file_path, "r") as f:
+        content = f.read()
+
+    new_content = filter_content(content, filter_string)
 
     if new_content != content:
         with open(file_path, "w") as f:
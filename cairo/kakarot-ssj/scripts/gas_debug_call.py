@@ -1,38 +1,108 @@
-import re
+"""
+Aggregate the gas used per opcode and per call frame from a NDJSON opcodes trace.
 
+The trace is printed by the tests when built with the `gas-trace` feature, or dumped
+by the cairo_zero tests run with --profile-evm:
+    snforge test --features gas-trace <test> | python scripts/gas_debug_call.py
+    python scripts/gas_debug_call.py <path_to_file_evm.ndjson>
 
-def process_logs(logs):
-    gas_consumption = {}
-    previous_gas = {}
+Each line is a JSON object with the address, depth, pc, opcode, gas_before and
+gas_after of an executed opcode. The other lines of the input are ignored. The gas of
+the CALL and CREATE opcodes includes the gas used by the frame they open.
+"""
 
-    pattern = re.compile(
-        r"Address (\d+), opcode (\w+), pc (\d+), gas left in call (\d+)"
-    )
+import argparse
+import fileinput
+import json
+from collections import defaultdict
+
+
+def read_trace(lines):
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{") or '"gas_before"' not in line:
+            continue
+        yield json.loads(line)
+
+
+def close_frame(stack, frames):
+    frame = stack.pop()
+    frame["self_gas"] = frame["gas"] - frame["children_gas"]
+    del frame["children_gas"]
+    frames.append(frame)
+    if stack and stack[-1]["depth"] == frame["depth"] - 1:
+        stack[-1]["children_gas"] += frame["gas"]
+
+
+def process_trace(records):
+    """
+    Aggregate the trace in a single pass.
+
+    The frames are tracked with a stack: a deeper record opens a frame, a shallower one
+    closes the frames above it. This is independent of whether a CALL is traced before
+    (cairo_zero) or after (kakarot-ssj) the records of the frame it opens.
+    """
+    opcodes = defaultdict(lambda: {"count": 0, "gas": 0})
+    frames = []
+    stack = []
 
-    for line in logs.split("\n"):
-        match = pattern.search(line)
-        if match:
-            address, opcode, pc, gas_left = match.groups()
-            address = int(address)
-            pc = int(pc)
-            gas_left = int(gas_left)
-
-            if address not in gas_consumption:
-                gas_consumption[address] = 0
-                previous_gas[address] = gas_left
-            else:
-                gas_used = previous_gas[address] - gas_left
-                gas_consumption[address] += gas_used
-                previous_gas[address] = gas_left
-
-            print(
-                f"{hex(address)} - {pc} - {opcode} --> total gas used: {gas_consumption[address]}"
+    for record in records:
+        while stack and stack[-1]["depth"] > record["depth"]:
+            close_frame(stack, frames)
+        if stack and stack[-1]["depth"] == record["depth"]:
+            if stack[-1]["address"] != record["address"]:
+                close_frame(stack, frames)
+        if not stack or stack[-1]["depth"] < record["depth"]:
+            stack.append(
+                {
+                    "address": record["address"],
+                    "depth": record["depth"],
+                    "opcodes": 0,
+                    "gas": 0,
+                    "children_gas": 0,
+                }
             )
 
+        gas_used = (
+            record["gas_before"] - record["gas_after"]
+            if record["gas_after"] is not None
+            else 0
+        )
+        stack[-1]["opcodes"] += 1
+        stack[-1]["gas"] += gas_used
+        opcodes[record["opcode"]]["count"] += 1
+        opcodes[record["opcode"]]["gas"] += gas_used
+
+    while stack:
+        close_frame(stack, frames)
+
+    return dict(opcodes), frames
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("files", nargs="*", help="defaults to stdin")
+    args = parser.parse_args()
+
+    with fileinput.input(files=args.files) as lines:
+        opcodes, frames = process_trace(read_trace(lines))
+
+    print("| Opcode | Count | Gas |")
+    print("| ------ | ----- | --- |")
+    for opcode, values in sorted(opcodes.items(), key=lambda item: -item[1]["gas"]):
+        print(f"| 0x{opcode:02x} | {values['count']:>8} | {values['gas']:>10} |")
+
+    print()
+    print("| Address | Depth | Opcodes | Gas | Self gas |")
+    print("| ------- | ----- | ------- | --- | -------- |")
+    for frame in frames:
+        print(
+            f"| 0x{frame['address']:040x} | {frame['depth']:>3} | {frame['opcodes']:>8} | {frame['gas']:>10} | {frame['self_gas']:>10} |"
+        )
 
-# Example usage
-logs = """
-Address 1169201309864722334562947866173026415724746034380, opcode 96, pc 1, gas left in call 79978644
-"""
 
-process_logs(logs)
+if __name__ == "__main__":
+    main()
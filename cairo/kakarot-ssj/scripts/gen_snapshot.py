@@ -1,18 +1,21 @@
 import json
-import re
 import subprocess
+import sys
+
+from snapshot_store import connect, current_commit, parse_test_output, save_snapshot
 
 # Execute the command and capture the output
 output = subprocess.check_output("scarb cairo-test", shell=True).decode("utf-8")
 
-# Use regex to capture test names and their associated gas usage
-pattern = r"test (.+?) \.\.\. ok \(gas usage est.: (\d+)\)"
-matches = re.findall(pattern, output)
-
-# Convert matches to a dictionary
-results = {match[0]: int(match[1]) for match in matches}
-sorted_results = {k: results[k] for k in sorted(results.keys())}
+# Capture test names and their associated gas usage
+results = parse_test_output(output)
 
 # Dump the results to a JSON file
 with open("gas_snapshot.json", "w") as outfile:
-    json.dump(sorted_results, outfile, indent=4)
+    json.dump(
+        {test: value["gas"] for test, value in results.items()}, outfile, indent=4
+    )
+
+# Also store the snapshot in the local history, see snapshot_store.py
+if "--store" in sys.argv[1:]:
+    save_snapshot(connect(), current_commit(), results)
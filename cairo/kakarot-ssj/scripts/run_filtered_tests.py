@@ -1,51 +1,128 @@
+import hashlib
+import json
 import os
 import pty
+import re
 import select
 import shutil
 import subprocess
 import sys
-import tempfile
+import time
 from contextlib import contextmanager
 from pathlib import Path
 
-from filter_tests import filter_tests
+from filter_tests import filter_content
 
 PROJECT_FILES = ["Scarb.toml", "Scarb.lock", ".tool-versions"]
+# Filtered workspaces are kept between runs, one per filter string, so that their
+# target/ directory stays warm.
+WORKSPACES_DIR = Path("target") / "filtered"
+MANIFEST_FILE = ".filtered.json"
+
+
+def workspace_name(filter_string):
+    slug = re.sub(r"[^\w-]", "_", filter_string)[:32]
+    return f"{slug}-{hashlib.sha256(filter_string.encode()).hexdigest()[:8]}"
+
+
+def link_file(src_file, dst_file):
+    """Hard link dst_file to src_file, unless it already is; copy across devices."""
+    if dst_file.exists() and os.path.samefile(src_file, dst_file):
+        return
+    dst_file.unlink(missing_ok=True)
+    dst_file.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src_file, dst_file)
+    except OSError:
+        shutil.copy2(src_file, dst_file)
+
+
+def sync_workspace(src_path, workspace_path, filter_string):
+    """
+    Mirror the project into the workspace: the files are hard linked, except the
+    .cairo files having tests filtered out, which are rewritten.
+    The filtered files are only rewritten when their source changed since the last run.
+    """
+    manifest_path = workspace_path / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    filtered = {}
+
+    for file in PROJECT_FILES:
+        if (src_file := src_path / file).exists():
+            link_file(src_file, workspace_path / file)
+
+    src_files = set()
+    for root, dirs, files in os.walk(src_path / "crates"):
+        dirs[:] = [d for d in dirs if d != "target"]
+        for file in files:
+            src_file = Path(root) / file
+            rel_path = src_file.relative_to(src_path)
+            dst_file = workspace_path / rel_path
+            src_files.add(rel_path)
+
+            if src_file.suffix != ".cairo":
+                link_file(src_file, dst_file)
+                continue
+
+            stat = src_file.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            if manifest.get(str(rel_path)) == signature and dst_file.exists():
+                filtered[str(rel_path)] = signature
+                continue
+
+            content = src_file.read_text()
+            new_content = filter_content(content, filter_string)
+            if new_content == content:
+                link_file(src_file, dst_file)
+                continue
+
+            # Never write through a hard link to the source file
+            dst_file.unlink(missing_ok=True)
+            dst_file.parent.mkdir(parents=True, exist_ok=True)
+            dst_file.write_text(new_content)
+            filtered[str(rel_path)] = signature
+
+    # Remove the files deleted from the project since the last run
+    for root, dirs, files in os.walk(workspace_path / "crates"):
+        dirs[:] = [d for d in dirs if d != "target"]
+        for file in files:
+            dst_file = Path(root) / file
+            if dst_file.relative_to(workspace_path) not in src_files:
+                dst_file.unlink()
+
+    manifest_path.write_text(json.dumps(filtered))
+    print(f"Filtered {len(filtered)} files for {filter_string}")
 
 
 @contextmanager
-def temporary_project_copy(src_dir):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        src_path = Path(src_dir)
-        temp_dir_creation_time = temp_path.stat().st_ctime
-
-        for file in PROJECT_FILES:
-            if (src_file := src_path / file).exists():
-                shutil.copy2(src_file, temp_path / file)
-
-        if (src_crates := src_path / "crates").exists():
-            shutil.copytree(src_crates, temp_path / "crates", symlinks=True)
-
-        yield temp_path
-
-        # Copy back only newly created or modified files, excluding build/ directories and .cairo files
-        for root, dirs, files in os.walk(temp_path):
-            dirs[:] = [
-                d for d in dirs if d != "target"
-            ]  # Don't traverse into build directories
-            for file in files:
-                temp_file = Path(root) / file
-                rel_path = temp_file.relative_to(temp_path)
-                src_file = src_path / rel_path
-
-                if (
-                    not src_file.exists()
-                    or temp_file.stat().st_mtime > temp_dir_creation_time
-                ) and temp_file.suffix != ".cairo":
-                    src_file.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(temp_file, src_file)
-                    print(f"Copied new or modified file: {rel_path}")
+def filtered_workspace(src_dir, filter_string):
+    src_path = Path(src_dir)
+    workspace_path = src_path / WORKSPACES_DIR / workspace_name(filter_string)
+    workspace_path.mkdir(parents=True, exist_ok=True)
+    sync_workspace(src_path, workspace_path, filter_string)
+    run_start_time = time.time()
+
+    yield workspace_path
+
+    # Copy back only newly created or modified files, excluding build/ directories and .cairo files
+    for root, dirs, files in os.walk(workspace_path):
+        dirs[:] = [
+            d for d in dirs if d != "target"
+        ]  # Don't traverse into build directories
+        for file in files:
+            temp_file = Path(root) / file
+            rel_path = temp_file.relative_to(workspace_path)
+            src_file = src_path / rel_path
+
+            if temp_file.suffix == ".cairo" or str(rel_path) == MANIFEST_FILE:
+                continue
+            # Hard linked files are already up to date in the project
+            if src_file.exists() and os.path.samefile(src_file, temp_file):
+                continue
+            if not src_file.exists() or temp_file.stat().st_mtime > run_start_time:
+                src_file.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(temp_file, src_file)
+                print(f"Copied new or modified file: {rel_path}")
 
 
 def stream_output(fd):
@@ -80,15 +157,13 @@ def run_scarb_command(command, cwd):
 def run_filtered_tests(command):
     project_root = Path(__file__).parent.parent
 
-    with temporary_project_copy(project_root) as temp_project_dir:
-        # Extract the package and filter name from the command
-        cmd_parts = command.split()
-        package_index = cmd_parts.index("-p") + 1
-        cmd_parts[package_index]
-        filter_name = cmd_parts[package_index + 1]
+    # Extract the package and filter name from the command
+    cmd_parts = command.split()
+    package_index = cmd_parts.index("-p") + 1
+    filter_name = cmd_parts[package_index + 1]
 
-        filter_tests(temp_project_dir / "crates", filter_name)
-        run_scarb_command(command, temp_project_dir)
+    with filtered_workspace(project_root, filter_name) as workspace_dir:
+        run_scarb_command(command, workspace_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+"""
+Local history of the gas snapshots, stored in a SQLite database keyed by commit.
+
+Usage:
+    python scripts/snapshot_store.py ingest gas_snapshot.json [--commit <sha>]
+    python scripts/snapshot_store.py compare [--snapshot gas_snapshot.json] [--last 10]
+    python scripts/snapshot_store.py history <test>
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = Path(
+    os.environ.get(
+        "GAS_SNAPSHOTS_DB",
+        Path(__file__).parent.parent / "target" / "gas_snapshots.db",
+    )
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    commit_sha TEXT NOT NULL UNIQUE,
+    committed_at TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    test TEXT NOT NULL,
+    gas INTEGER NOT NULL,
+    steps INTEGER,
+    PRIMARY KEY (snapshot_id, test)
+);
+"""
+
+
+def connect(path=DEFAULT_DB):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snapshots)")}
+    if "committed_at" not in columns:
+        # Databases created before the commit dates were stored
+        conn.execute("ALTER TABLE snapshots ADD COLUMN committed_at TEXT")
+    return conn
+
+
+def current_commit():
+    return (
+        subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent)
+        .decode()
+        .strip()
+    )
+
+
+def commit_date(commit_sha):
+    """Return the UTC commit date of the given commit, None if unknown to git."""
+    try:
+        output = subprocess.check_output(
+            ["git", "show", "-s", "--format=%cI", commit_sha],
+            cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL,
+        )
+    except subprocess.CalledProcessError:
+        return None
+    # Normalized to UTC so that the dates of different time zones sort as strings
+    return (
+        datetime.fromisoformat(output.decode().strip())
+        .astimezone(timezone.utc)
+        .isoformat()
+    )
+
+
+def parse_test_output(output):
+    """
+    Extract the gas and, when reported, the steps of each passing test from the output
+    of `scarb test`.
+    """
+    results = {}
+    current = None
+    for line in output.splitlines():
+        if match := re.search(r"test ([\w\:]+).*gas usage est\.\: (\d+)", line):
+            current = match.group(1)
+            results[current] = {"gas": int(match.group(2)), "steps": None}
+        elif match := re.search(r"\[PASS\] ([\w\:]+) \(gas: ~(\d+)\)", line):
+            current = match.group(1)
+            results[current] = {"gas": int(match.group(2)), "steps": None}
+        elif current is not None and (match := re.search(r"steps: (\d+)", line)):
+            results[current]["steps"] = int(match.group(1))
+    return dict(sorted(results.items()))
+
+
+def normalize(snapshot):
+    """Accept both the {test: gas} JSON snapshots and the {test: {gas, steps}} ones."""
+    return {
+        test: (
+            {"gas": value.get("gas"), "steps": value.get("steps")}
+            if isinstance(value, dict)
+            else {"gas": value, "steps": None}
+        )
+        for test, value in snapshot.items()
+    }
+
+
+def save_snapshot(conn, commit_sha, snapshot, created_at=None, committed_at=None):
+    """Save a snapshot, replacing the one already stored for this commit if any."""
+    created_at = created_at or datetime.now(timezone.utc).isoformat()
+    committed_at = committed_at or commit_date(commit_sha)
+    with conn:
+        conn.execute("DELETE FROM snapshots WHERE commit_sha = ?", (commit_sha,))
+        snapshot_id = conn.execute(
+            "INSERT INTO snapshots (commit_sha, committed_at, created_at) "
+            "VALUES (?, ?, ?)",
+            (commit_sha, committed_at, created_at),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO results (snapshot_id, test, gas, steps) VALUES (?, ?, ?, ?)",
+            [
+                (snapshot_id, test, value["gas"], value["steps"])
+                for test, value in normalize(snapshot).items()
+            ],
+        )
+    return snapshot_id
+
+
+def load_history(conn, last=10, exclude_commit=None):
+    """
+    Return the last snapshots as a list of (commit_sha, snapshot), the most recent
+    commit first. The snapshots of commits unknown to git are ordered by ingestion
+    time instead.
+    """
+    snapshots = conn.execute(
+        "SELECT id, commit_sha FROM snapshots WHERE commit_sha IS NOT ? "
+        "ORDER BY COALESCE(committed_at, created_at) DESC, id DESC LIMIT ?",
+        (exclude_commit, last),
+    ).fetchall()
+    return [
+        (
+            commit_sha,
+            {
+                test: {"gas": gas, "steps": steps}
+                for test, gas, steps in conn.execute(
+                    "SELECT test, gas, steps FROM results WHERE snapshot_id = ?",
+                    (snapshot_id,),
+                )
+            },
+        )
+        for snapshot_id, commit_sha in snapshots
+    ]
+
+
+def find_regressions(current, history, metric="gas", z_score=3.0, min_ratio=0.0):
+    """
+    Flag the tests whose metric is significantly above its history.
+
+    With a noisy history, a value is significant when it is more than z_score
+    standard deviations above the mean. As the gas is mostly deterministic, a
+    constant history flags any increase. In both cases, the increase must also be
+    above min_ratio of the mean.
+    """
+    regressions = []
+    for test, value in normalize(current).items():
+        if value[metric] is None:
+            continue
+        past = [
+            snapshot[test][metric]
+            for _, snapshot in history
+            if test in snapshot and snapshot[test][metric] is not None
+        ]
+        if not past:
+            continue
+
+        mean = statistics.mean(past)
+        stdev = statistics.stdev(past) if len(past) > 1 else 0
+        threshold = max(mean + z_score * stdev, mean * (1 + min_ratio))
+        if value[metric] > threshold:
+            regressions.append(
+                {
+                    "test": test,
+                    "mean": mean,
+                    "stdev": stdev,
+                    "current": value[metric],
+                    "ratio": value[metric] / mean if mean else float("inf"),
+                }
+            )
+    return regressions
+
+
+def get_current_snapshot():
+    output = subprocess.check_output("scarb test", shell=True).decode("utf-8")
+    return parse_test_output(output)
+
+
+def ingest(args):
+    conn = connect(args.db)
+    snapshot = json.loads(Path(args.snapshot).read_text())
+    commit_sha = args.commit or current_commit()
+    save_snapshot(conn, commit_sha, snapshot)
+    logger.info(f"Saved {len(snapshot)} tests for {commit_sha}")
+
+
+def compare(args):
+    conn = connect(args.db)
+    current = (
+        json.loads(Path(args.snapshot).read_text())
+        if args.snapshot
+        else get_current_snapshot()
+    )
+    commit_sha = current_commit()
+    history = load_history(conn, last=args.last, exclude_commit=commit_sha)
+    if not history:
+        logger.error("Error: No previous snapshot stored, run ingest first.")
+        return 1
+
+    if args.save:
+        save_snapshot(conn, commit_sha, current)
+
+    failed = False
+    for metric in ("gas", "steps"):
+        regressions = find_regressions(
+            current,
+            history,
+            metric=metric,
+            z_score=args.z_score,
+            min_ratio=args.min_ratio,
+        )
+        if not regressions:
+            continue
+        failed = True
+        max_key_len = max(len(regression["test"]) for regression in regressions)
+        logger.info(
+            "\n".join(
+                [
+                    f"****{metric.upper()} REGRESSIONS over the last {len(history)} snapshots****",
+                    "| Test | Mean | Stdev | Cur | Ratio |",
+                    "| ---- | ---- | ----- | --- | ----- |",
+                ]
+                + [
+                    f"|{r['test']:<{max_key_len + 5}} | {r['mean']:>12.1f} | {r['stdev']:>10.1f} | {r['current']:>10} | {r['ratio']:>6.2%}|"
+                    for r in regressions
+                ]
+            )
+        )
+
+    if failed:
+        logger.error("Gas usage increased")
+        return 1
+    logger.info("Gas change ✅")
+    return 0
+
+
+def history(args):
+    conn = connect(args.db)
+    rows = conn.execute(
+        "SELECT snapshots.commit_sha, "
+        "COALESCE(snapshots.committed_at, snapshots.created_at) AS date, "
+        "results.gas, results.steps "
+        "FROM results JOIN snapshots ON snapshots.id = results.snapshot_id "
+        "WHERE results.test = ? ORDER BY date DESC, snapshots.id DESC LIMIT ?",
+        (args.test, args.last),
+    ).fetchall()
+    for commit_sha, date, gas, steps in rows:
+        logger.info(f"{commit_sha[:10]} {date} gas={gas} steps={steps}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--db", default=DEFAULT_DB, type=Path)
+    subparsers = parser.add_subparsers(required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="store a JSON snapshot, e.g. from gen_snapshot.py"
+    )
+    ingest_parser.add_argument("snapshot")
+    ingest_parser.add_argument("--commit", help="defaults to the current HEAD")
+    ingest_parser.set_defaults(func=ingest)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare the current snapshot with the last stored ones"
+    )
+    compare_parser.add_argument(
+        "--snapshot", help="JSON snapshot to compare, runs `scarb test` if not set"
+    )
+    compare_parser.add_argument("--last", default=10, type=int)
+    compare_parser.add_argument("--z-score", default=3.0, type=float)
+    compare_parser.add_argument("--min-ratio", default=0.0, type=float)
+    compare_parser.add_argument(
+        "--save", action="store_true", help="store the current snapshot"
+    )
+    compare_parser.set_defaults(func=compare)
+
+    history_parser = subparsers.add_parser(
+        "history", help="show the stored values of a test"
+    )
+    history_parser.add_argument("test")
+    history_parser.add_argument("--last", default=20, type=int)
+    history_parser.set_defaults(func=history)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
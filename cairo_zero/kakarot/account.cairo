@@ -142,7 +142,8 @@ namespace Account {
         let balance = fetch_balance(address);
         assert balance_ptr = new Uint256(balance.low, balance.high);
 
-        let (bytecode_len, bytecode) = IAccount.bytecode(contract_address=starknet_address);
+        // The code is only loaded when executed or copied, see `Account.fetch_code`
+        let (bytecode_len) = IAccount.bytecode_len(contract_address=starknet_address);
         let (nonce) = IAccount.get_nonce(contract_address=starknet_address);
         IAccount.get_code_hash(contract_address=starknet_address);
         let (ap_val) = get_ap();
@@ -155,7 +156,7 @@ namespace Account {
         let account = Account.init(
             address=address,
             code_len=bytecode_len,
-            code=bytecode,
+            code=cast(0, felt*),
             code_hash=code_hash,
             nonce=nonce,
             balance=balance_ptr,
@@ -163,6 +164,46 @@ namespace Account {
         return account;
     }
 
+    // @notice Load the code of an account fetched from Starknet.
+    // @dev The code of the accounts is not loaded by `fetch_or_create`, so that touching
+    //      an account, e.g. for its balance or code size, doesn't pay for its whole bytecode.
+    // @param self The pointer to the Account, with code not loaded yet.
+    // @return The updated Account with the code loaded.
+    func fetch_code{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        self: model.Account*
+    ) -> model.Account* {
+        alloc_locals;
+        local code: felt*;
+        if (self.code_len == 0) {
+            let (empty_code: felt*) = alloc();
+            assert code = empty_code;
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        } else {
+            let (_, bytecode) = IAccount.bytecode(contract_address=self.address.starknet);
+            assert code = bytecode;
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        }
+
+        return new model.Account(
+            address=self.address,
+            code_len=self.code_len,
+            code=code,
+            code_hash=self.code_hash,
+            storage_start=self.storage_start,
+            storage=self.storage,
+            transient_storage_start=self.transient_storage_start,
+            transient_storage=self.transient_storage,
+            valid_jumpdests_start=self.valid_jumpdests_start,
+            valid_jumpdests=self.valid_jumpdests,
+            nonce=self.nonce,
+            balance=self.balance,
+            selfdestruct=self.selfdestruct,
+            created=self.created,
+        );
+    }
+
     // @notice Read a given storage
     // @dev Try to retrieve in the local Dict<Uint256*> first, if not already here
     //      read the contract storage and cache the result.
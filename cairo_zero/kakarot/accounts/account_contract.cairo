@@ -266,22 +266,34 @@ func set_nonce{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
 // @param jumpdests_len The length of the jumpdests array.
 // @param jumpdests The jumpdests array, containing indexes of valid jumpdests.
 @external
-func write_jumpdests{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-    jumpdests_len: felt, jumpdests: felt*
-) {
+func write_jumpdests{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}(jumpdests_len: felt, jumpdests: felt*) {
     // Access control check.
     Ownable.assert_only_owner();
     AccountContract.write_jumpdests(jumpdests_len, jumpdests);
     return ();
 }
 
+// @notice Write the valid jumpdests of the account's bytecode in the jumpdests bitmap.
+// @dev Migrates the accounts deployed with one storage slot per valid jumpdest.
+@external
+func migrate_jumpdests{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}() {
+    // Access control check.
+    Ownable.assert_only_owner();
+    AccountContract.migrate_jumpdests();
+    return ();
+}
+
 // @notice Returns whether the jumpdest at the given index is valid.
 // @param index The index of the jumpdest.
 // @return is_valid 1 if the jumpdest is valid, 0 otherwise.
 @view
-func is_valid_jumpdest{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-    index: felt
-) -> (is_valid: felt) {
+func is_valid_jumpdest{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}(index: felt) -> (is_valid: felt) {
     let is_valid = AccountContract.is_valid_jumpdest(index);
     return (is_valid=is_valid);
 }
@@ -4,11 +4,13 @@ from openzeppelin.access.ownable.library import Ownable, Ownable_owner
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.bool import FALSE, TRUE
 from starkware.cairo.common.dict_access import DictAccess
+from starkware.cairo.common.bitwise import bitwise_and, bitwise_or
 from starkware.cairo.common.cairo_builtins import HashBuiltin, BitwiseBuiltin
 from starkware.cairo.common.math import split_int
 from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.uint256 import Uint256, uint256_lt
 from starkware.cairo.common.math_cmp import is_nn, is_le_felt
+from starkware.cairo.common.pow import pow
 from starkware.starknet.common.syscalls import (
     StorageRead,
     StorageWrite,
@@ -54,6 +56,14 @@ func Account_nonce() -> (nonce: felt) {
 func Account_evm_address() -> (evm_address: felt) {
 }
 
+// @dev: bitmap of the valid jumpdests, the bit `index % JUMPDESTS_PER_FELT` of the word stored at
+// the address `base_address + index / JUMPDESTS_PER_FELT` is set if `index` is a valid jumpdest.
+@storage_var
+func Account_jumpdests_bitmap() -> (bitmap: felt) {
+}
+
+// @dev: legacy layout of the valid jumpdests, one slot per jumpdest at `base_address + index`.
+// Still read for the accounts whose jumpdests are not migrated to the bitmap yet.
 @storage_var
 func Account_valid_jumpdests() -> (is_valid: felt) {
 }
@@ -71,6 +81,8 @@ func transaction_executed(response_len: felt, response: felt*, success: felt, ga
 }
 
 const BYTES_PER_FELT = 31;
+// 2**251 - 1 is the biggest all-ones felt
+const JUMPDESTS_PER_FELT = 251;
 
 const SECP256K1N_DIV_2_LOW = 0x5d576e7357a4501ddfe92f46681b20a0;
 const SECP256K1N_DIV_2_HIGH = 0x7fffffffffffffffffffffffffffffff;
@@ -343,9 +355,12 @@ namespace AccountContract {
     // @notice Writes an array of valid jumpdests indexes to storage.
     // @param jumpdests_len The length of the jumpdests array.
     // @param jumpdests The jumpdests array.
-    func write_jumpdests{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-        jumpdests_len: felt, jumpdests: felt*
-    ) {
+    func write_jumpdests{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr,
+        bitwise_ptr: BitwiseBuiltin*,
+    }(jumpdests_len: felt, jumpdests: felt*) {
         // Recursively store the jumpdests.
         Internals.write_jumpdests(
             jumpdests_len=jumpdests_len, jumpdests=jumpdests, iteration_size=1
@@ -353,26 +368,59 @@ namespace AccountContract {
         return ();
     }
 
+    // @notice Writes the valid jumpdests of the account bytecode to the jumpdests bitmap.
+    // @dev Used to migrate the accounts deployed with one storage slot per valid jumpdest.
+    //      The legacy slots are left untouched, is_valid_jumpdest only reads them for empty words.
+    func migrate_jumpdests{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr,
+        bitwise_ptr: BitwiseBuiltin*,
+    }() {
+        alloc_locals;
+        let (bytecode_len, bytecode) = AccountContract.bytecode();
+        let (valid_jumpdests_start, valid_jumpdests) = Helpers.initialize_jumpdests(
+            bytecode_len, bytecode
+        );
+        // The dict is only written to by initialize_jumpdests, so it contains only valid entries
+        // in increasing order and the keys can be read directly from the dict accesses.
+        Internals.write_jumpdests(
+            jumpdests_len=(valid_jumpdests - valid_jumpdests_start) / DictAccess.SIZE,
+            jumpdests=cast(valid_jumpdests_start, felt*),
+            iteration_size=DictAccess.SIZE,
+        );
+        return ();
+    }
+
     // @notice Checks if the jump destination at the given index is valid.
+    // @dev An empty bitmap word falls back to the legacy one-slot-per-jumpdest layout, as the
+    //      accounts not upgraded yet, e.g. the ones still on the uninitialized account class,
+    //      run this class without having migrated their jumpdests.
     // @param index The index of the jump destination.
     // @return is_valid 1 if the jump destination is valid, 0 otherwise.
-    func is_valid_jumpdest{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-        index: felt
-    ) -> felt {
+    func is_valid_jumpdest{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr,
+        bitwise_ptr: BitwiseBuiltin*,
+    }(index: felt) -> felt {
         alloc_locals;
-        let (base_address) = Account_valid_jumpdests.addr();
-        let index_address = base_address + index;
+        let (base_address) = Account_jumpdests_bitmap.addr();
+        let (word_index, bit_index) = unsigned_div_rem(index, JUMPDESTS_PER_FELT);
+        let (bitmap) = storage_read(base_address + word_index);
+        if (bitmap == 0) {
+            let (legacy_base_address) = Account_valid_jumpdests.addr();
+            let (is_valid) = storage_read(legacy_base_address + index);
+            return is_valid;
+        }
 
-        let syscall = [cast(syscall_ptr, StorageRead*)];
-        assert syscall.request = StorageReadRequest(
-            selector=STORAGE_READ_SELECTOR, address=index_address
-        );
-        %{ syscall_handler.storage_read(segments=segments, syscall_ptr=ids.syscall_ptr) %}
-        let response = syscall.response;
-        tempvar syscall_ptr = syscall_ptr + StorageRead.SIZE;
-        tempvar value = response.value;
+        let (mask) = pow(2, bit_index);
+        let (is_valid) = bitwise_and(bitmap, mask);
 
-        return value;
+        if (is_valid == 0) {
+            return FALSE;
+        }
+        return TRUE;
     }
 
     // @notice Gets the code hash of the account.
@@ -489,46 +537,78 @@ namespace Internals {
     // @notice Store the jumpdests of the contract.
     // @dev This function can be used by either passing an array of valid jumpdests,
     // or a dict that only contains valid entries (i.e. no invalid index has been read).
+    // Consecutive jumpdests falling in the same bitmap word are written with a single storage write.
     // @param jumpdests_len The length of the valid jumpdests.
     // @param jumpdests The jumpdests of the contract. Can be an array of valid indexes or a dict.
     // @param iteration_size The size of the object we are iterating over.
-    func write_jumpdests{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-        jumpdests_len: felt, jumpdests: felt*, iteration_size: felt
-    ) {
+    func write_jumpdests{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr,
+        bitwise_ptr: BitwiseBuiltin*,
+    }(jumpdests_len: felt, jumpdests: felt*, iteration_size: felt) {
         alloc_locals;
 
         if (jumpdests_len == 0) {
             return ();
         }
 
-        let (local base_address) = Account_valid_jumpdests.addr();
-        local pedersen_ptr: HashBuiltin* = pedersen_ptr;
-        local range_check_ptr = range_check_ptr;
-        tempvar syscall_ptr = syscall_ptr;
-        tempvar jumpdests = jumpdests;
-        tempvar remaining = jumpdests_len;
+        let (local base_address) = Account_jumpdests_bitmap.addr();
+        let (word_index, _) = unsigned_div_rem([jumpdests], JUMPDESTS_PER_FELT);
+        let (bitmap) = storage_read(base_address + word_index);
 
-        body:
-        let syscall_ptr = cast([ap - 3], felt*);
-        let jumpdests = cast([ap - 2], felt*);
-        let remaining = [ap - 1];
-        let base_address = [fp];
-        let iteration_size = [fp - 3];
+        return _write_jumpdests_bitmap(
+            base_address, word_index, bitmap, jumpdests_len, jumpdests, iteration_size
+        );
+    }
 
-        let index_to_store = [jumpdests];
-        tempvar storage_address = base_address + index_to_store;
+    // @notice Sets the bits of the jumpdests in the current bitmap word, and writes the word
+    // to storage when the next jumpdest falls in another word.
+    // @param base_address The base address of the jumpdests bitmap.
+    // @param word_index The index of the current bitmap word.
+    // @param bitmap The current bitmap word.
+    // @param jumpdests_len The length of the remaining valid jumpdests.
+    // @param jumpdests The remaining jumpdests.
+    // @param iteration_size The size of the object we are iterating over.
+    func _write_jumpdests_bitmap{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr,
+        bitwise_ptr: BitwiseBuiltin*,
+    }(
+        base_address: felt,
+        word_index: felt,
+        bitmap: felt,
+        jumpdests_len: felt,
+        jumpdests: felt*,
+        iteration_size: felt,
+    ) {
+        alloc_locals;
 
-        assert [cast(syscall_ptr, StorageWrite*)] = StorageWrite(
-            selector=STORAGE_WRITE_SELECTOR, address=storage_address, value=1
-        );
-        %{ syscall_handler.storage_write(segments=segments, syscall_ptr=ids.syscall_ptr) %}
-        tempvar syscall_ptr = syscall_ptr + StorageWrite.SIZE;
-        tempvar jumpdests = jumpdests + iteration_size;
-        tempvar remaining = remaining - 1;
+        if (jumpdests_len == 0) {
+            storage_write(base_address + word_index, bitmap);
+            return ();
+        }
 
-        jmp body if remaining != 0;
+        let (next_word_index, bit_index) = unsigned_div_rem([jumpdests], JUMPDESTS_PER_FELT);
+        if (next_word_index != word_index) {
+            storage_write(base_address + word_index, bitmap);
+            let (next_bitmap) = storage_read(base_address + next_word_index);
+            return _write_jumpdests_bitmap(
+                base_address, next_word_index, next_bitmap, jumpdests_len, jumpdests, iteration_size
+            );
+        }
 
-        return ();
+        let (mask) = pow(2, bit_index);
+        let (bitmap) = bitwise_or(bitmap, mask);
+        return _write_jumpdests_bitmap(
+            base_address,
+            word_index,
+            bitmap,
+            jumpdests_len - 1,
+            jumpdests + iteration_size,
+            iteration_size,
+        );
     }
 
     // @notice Load the bytecode of the contract in the specified array.
@@ -18,7 +18,6 @@ from kakarot.model import model
 from kakarot.account import Account
 from kakarot.stack import Stack
 from kakarot.state import State
-from kakarot.interfaces.interfaces import IAccount
 
 // @title EVM related functions.
 // @notice This file contains functions related to the execution context.
@@ -361,7 +360,7 @@ namespace Internals {
             return FALSE;
         }
 
-        let (is_valid) = IAccount.is_valid_jumpdest(code_address.starknet, index);
+        let is_valid = State.is_valid_jumpdest(code_account, index);
         dict_write{dict_ptr=valid_jumpdests}(index, is_valid);
 
         return is_valid;
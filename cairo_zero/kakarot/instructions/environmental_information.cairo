@@ -433,7 +433,7 @@ namespace EnvironmentalInformation {
             return evm;
         }
 
-        let account = State.get_account(evm_address);
+        let account = State.get_account_with_code(evm_address);
         slice(data_to_store, account.code_len, account.code, offset.low, size.low);
 
         Memory.store_n(size.low, data_to_store, dest_offset.low);
@@ -141,9 +141,7 @@ namespace MemoryOperations {
             words_len=memory_expansion.new_words_len,
         );
 
-        let (data: felt*) = alloc();
-        Memory.load_n(size.low, data, src.low);
-        Memory.store_n(size.low, data, dst.low);
+        Memory.copy(size.low, src.low, dst.low);
 
         return evm;
     }
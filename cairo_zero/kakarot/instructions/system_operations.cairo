@@ -23,6 +23,7 @@ from kakarot.stack import Stack
 from kakarot.storages import Kakarot_cairo1_helpers_class_hash
 from kakarot.state import State
 from utils.utils import Helpers
+from utils.dict import default_dict_copy
 from utils.array import slice
 from utils.bytes import (
     bytes_to_bytes8_little_endian,
@@ -897,9 +898,14 @@ namespace CallHelper {
 
         // 2. Build child_evm
 
-        let code_account = State.get_account(code_address);
+        let code_account = State.get_account_with_code(code_address);
         local code_len: felt = code_account.code_len;
         local code: felt* = code_account.code;
+        // The account may be shared with the parent state, so the jumpdests cached during the call
+        // are written in a copy and only set back to the account when finalizing the call.
+        let (local valid_jumpdests_start, local valid_jumpdests) = default_dict_copy(
+            code_account.valid_jumpdests_start, code_account.valid_jumpdests
+        );
 
         let to_starknet_address = Account.get_starknet_address(to);
         tempvar to_address = new model.Address(starknet=to_starknet_address, evm=to);
@@ -917,8 +923,8 @@ namespace CallHelper {
         tempvar message = new model.Message(
             bytecode=code,
             bytecode_len=code_len,
-            valid_jumpdests_start=code_account.valid_jumpdests_start,
-            valid_jumpdests=code_account.valid_jumpdests,
+            valid_jumpdests_start=valid_jumpdests_start,
+            valid_jumpdests=valid_jumpdests,
             calldata=calldata,
             calldata_len=args_size.low,
             value=value,
@@ -966,7 +972,8 @@ namespace CallHelper {
 
         // Restore parent state if the call has reverted
         if (evm.reverted != FALSE) {
-            tempvar state = evm.message.parent.state;
+            State.restore(evm.message.parent.state);
+            tempvar state = state;
         } else {
             tempvar state = state;
         }
@@ -1257,7 +1264,7 @@ namespace CreateHelper {
             tempvar stack_code = new Uint256(low=0, high=0);
             Stack.push(stack_code);
 
-            tempvar state = evm.message.parent.state;
+            State.restore(evm.message.parent.state);
 
             tempvar evm = new model.EVM(
                 message=message,
@@ -1292,7 +1299,7 @@ namespace CreateHelper {
         Stack.push(address);
 
         if (success == FALSE) {
-            tempvar state = evm.message.parent.state;
+            State.restore(evm.message.parent.state);
             with_attr error_message(
                     "EVM tx reverted, reverting SN tx because of previous calls to cairo precompiles") {
                 assert cairo_precompile_called = FALSE;
@@ -69,6 +69,9 @@ namespace IAccount {
     func write_jumpdests(jumpdests_len: felt, jumpdests: felt*) {
     }
 
+    func migrate_jumpdests() {
+    }
+
     func set_authorized_pre_eip155_tx(msg_hash: Uint256) {
     }
 
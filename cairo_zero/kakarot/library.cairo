@@ -339,6 +339,8 @@ namespace Kakarot {
     }
 
     // @notice Upgrades an account to a new contract implementation.
+    // @dev When upgrading to the current account class, the valid jumpdests of the account
+    //      are migrated to the jumpdests bitmap.
     // @param evm_address The evm address of the account.
     // @param new_class_hash The new class hash of the account.
     func upgrade_account{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
@@ -347,6 +349,12 @@ namespace Kakarot {
         alloc_locals;
         let starknet_address = Account.get_starknet_address(evm_address);
         IAccount.upgrade(starknet_address, new_class_hash);
+
+        let (account_contract_class_hash) = Kakarot_account_contract_class_hash.read();
+        if (new_class_hash != account_contract_class_hash) {
+            return ();
+        }
+        IAccount.migrate_jumpdests(starknet_address);
         return ();
     }
 
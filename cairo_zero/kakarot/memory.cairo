@@ -1,5 +1,6 @@
 // SPDX-License-Identifier: MIT
 
+from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.cairo_builtins import HashBuiltin, BitwiseBuiltin
 from starkware.cairo.common.default_dict import default_dict_new, default_dict_finalize
 from starkware.cairo.common.dict import DictAccess, dict_read, dict_write
@@ -250,6 +251,78 @@ namespace Memory {
         tempvar memory = new model.Memory(memory.word_dict_start, word_dict, memory.words_len);
         return ();
     }
+
+    // @notice Copy N bytes from a memory offset to another one.
+    // @dev When both offsets have the same alignment in their 16B chunks, the words in between
+    // @dev are copied as is and only the first and last words are merged with the destination.
+    // @dev Otherwise the bytes are loaded and stored back.
+    // @param memory The pointer to the memory.
+    // @param size The number of bytes to copy.
+    // @param src_offset The memory offset to copy from.
+    // @param dst_offset The memory offset to copy to.
+    // @return memory The new pointer to the memory.
+    func copy{range_check_ptr, memory: model.Memory*}(
+        size: felt, src_offset: felt, dst_offset: felt
+    ) {
+        alloc_locals;
+
+        if (size == 0) {
+            return ();
+        }
+
+        // Check alignment of offsets to 16B chunks.
+        let (local chunk_index_i, local offset_in_chunk_i) = unsigned_div_rem(src_offset, 16);
+        let (local dst_chunk_index_i, dst_offset_in_chunk_i) = unsigned_div_rem(dst_offset, 16);
+
+        if (offset_in_chunk_i != dst_offset_in_chunk_i) {
+            let (data: felt*) = alloc();
+            load_n(size, data, src_offset);
+            store_n(size, data, dst_offset);
+            return ();
+        }
+
+        let (chunk_index_f, offset_in_chunk_f) = unsigned_div_rem(src_offset + size - 1, 16);
+        local words_len = chunk_index_f - chunk_index_i + 1;
+        local dst_chunk_index_f = dst_chunk_index_i + words_len - 1;
+        local mask_f = Helpers.pow256_rev(offset_in_chunk_f + 1);
+        local mask_i = Helpers.pow256_rev(offset_in_chunk_i);
+
+        // Read all the source words first, as the source and destination may overlap.
+        let word_dict = memory.word_dict;
+        let (local words: felt*) = alloc();
+        Internals.load_words{dict_ptr=word_dict}(chunk_index_i, words_len, words);
+
+        // Special case: within the same word.
+        if (words_len == 1) {
+            let (w) = dict_read{dict_ptr=word_dict}(dst_chunk_index_i);
+            let (w_h, w_l) = Helpers.div_rem(w, mask_i);
+            let (_, w_ll) = Helpers.div_rem(w_l, mask_f);
+            let (_, x_l) = Helpers.div_rem(words[0], mask_i);
+            let (x, _) = Helpers.div_rem(x_l, mask_f);
+            dict_write{dict_ptr=word_dict}(dst_chunk_index_i, w_h * mask_i + x * mask_f + w_ll);
+            tempvar memory = new model.Memory(memory.word_dict_start, word_dict, memory.words_len);
+            return ();
+        }
+
+        // Otherwise.
+        // Fill first word.
+        let (w_i) = dict_read{dict_ptr=word_dict}(dst_chunk_index_i);
+        let (w_i_h, _) = Helpers.div_rem(w_i, mask_i);
+        let (_, x_i) = Helpers.div_rem(words[0], mask_i);
+        dict_write{dict_ptr=word_dict}(dst_chunk_index_i, w_i_h * mask_i + x_i);
+
+        // Fill last word.
+        let (w_f) = dict_read{dict_ptr=word_dict}(dst_chunk_index_f);
+        let (_, w_f_l) = Helpers.div_rem(w_f, mask_f);
+        let (x_f, _) = Helpers.div_rem(words[words_len - 1], mask_f);
+        dict_write{dict_ptr=word_dict}(dst_chunk_index_f, x_f * mask_f + w_f_l);
+
+        // Copy blocks.
+        Internals.store_words{dict_ptr=word_dict}(dst_chunk_index_i + 1, words_len - 2, words + 1);
+
+        tempvar memory = new model.Memory(memory.word_dict_start, word_dict, memory.words_len);
+        return ();
+    }
 }
 
 namespace Internals {
@@ -295,4 +368,29 @@ namespace Internals {
             chunk_index=chunk_index + 1, chunk_index_f=chunk_index_f, element=&element[16]
         );
     }
+
+    // @notice Read words from the memory dict.
+    // @param chunk_index The index of the first word to read.
+    // @param words_len The number of words to read.
+    // @param words The output array of words.
+    func load_words{dict_ptr: DictAccess*}(chunk_index: felt, words_len: felt, words: felt*) {
+        if (words_len == 0) {
+            return ();
+        }
+        let (value) = dict_read(chunk_index);
+        assert [words] = value;
+        return load_words(chunk_index + 1, words_len - 1, words + 1);
+    }
+
+    // @notice Write words to the memory dict.
+    // @param chunk_index The index of the first word to write.
+    // @param words_len The number of words to write.
+    // @param words The array of words to write.
+    func store_words{dict_ptr: DictAccess*}(chunk_index: felt, words_len: felt, words: felt*) {
+        if (words_len == 0) {
+            return ();
+        }
+        dict_write(chunk_index, [words]);
+        return store_words(chunk_index + 1, words_len - 1, words + 1);
+    }
 }
@@ -48,12 +48,20 @@ namespace model {
     //      dict of structs, we store in the dict pointers to the struct. List of structs are just list of
     //      felt with inlined structs. Hence one has eventually
     //      accounts := Dict<starknet_address, Account*>
+    //      owned_accounts := Dict<evm_address, bool>
+    //      valid_jumpdests := Dict<hash(code_hash, index), 1 + is_valid>
     //      events := List<Event>
     //      transfers := List<Transfer>
     //      Unlike in standard EVM, we need to store the native token transfers as well since we use the
     //      Starknet's ETH and can't just set the balances
     // @param accounts_start Pointer to the start of the accounts DictAccess array.
     // @param accounts Pointer to the end of the accounts DictAccess array.
+    // @param owned_accounts_start Pointer to the start of the owned accounts DictAccess array.
+    // @param owned_accounts Pointer to the end of the owned accounts DictAccess array.
+    // @dev Accounts are shared with the parent state until they are owned, i.e. copied, by this state.
+    // @param valid_jumpdests_start Pointer to the start of the valid jumpdests DictAccess array.
+    // @param valid_jumpdests Pointer to the end of the valid jumpdests DictAccess array.
+    // @dev The valid jumpdests are cached by code hash for the whole transaction, and are not reverted.
     // @param events_len The number of events.
     // @param events Pointer to the start of the events array.
     // @param transfers_len The number of transfers.
@@ -61,6 +69,10 @@ namespace model {
     struct State {
         accounts_start: DictAccess*,
         accounts: DictAccess*,
+        owned_accounts_start: DictAccess*,
+        owned_accounts: DictAccess*,
+        valid_jumpdests_start: DictAccess*,
+        valid_jumpdests: DictAccess*,
         events_len: felt,
         events: Event*,
         transfers_len: felt,
@@ -73,7 +85,7 @@ namespace model {
     // we can compute the starknet only once.
     // @param address Pointer to the address of the account.
     // @param code_len The length of the code.
-    // @param code Pointer to the code.
+    // @param code Pointer to the code, null until loaded with `Account.fetch_code` for the accounts fetched from Starknet.
     // @param code_hash Pointer to the code hash.
     // @param storage_start Pointer to the start of the storage DictAccess array.
     // @param storage Pointer to the end of the storage DictAccess array.
@@ -7,12 +7,14 @@ from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.default_dict import default_dict_new, default_dict_finalize
 from starkware.cairo.common.dict import dict_read, dict_write
 from starkware.cairo.common.dict_access import DictAccess
+from starkware.cairo.common.hash import hash2
 from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.registers import get_fp_and_pc
 from starkware.cairo.common.uint256 import Uint256, uint256_le
 from starkware.cairo.common.bool import FALSE, TRUE
 
 from kakarot.account import Account
+from kakarot.interfaces.interfaces import IAccount
 from kakarot.model import model
 from kakarot.gas import Gas
 from utils.dict import default_dict_copy
@@ -25,11 +27,17 @@ namespace State {
     // @return The pointer to the new State
     func init() -> model.State* {
         let (accounts_start) = default_dict_new(0);
+        let (owned_accounts_start) = default_dict_new(0);
+        let (valid_jumpdests_start) = default_dict_new(0);
         let (events: model.Event*) = alloc();
         let (transfers: model.Transfer*) = alloc();
         return new model.State(
             accounts_start=accounts_start,
             accounts=accounts_start,
+            owned_accounts_start=owned_accounts_start,
+            owned_accounts=owned_accounts_start,
+            valid_jumpdests_start=valid_jumpdests_start,
+            valid_jumpdests=valid_jumpdests_start,
             events_len=0,
             events=events,
             transfers_len=0,
@@ -37,15 +45,19 @@ namespace State {
         );
     }
 
-    // @notice Deep copy of the state, creating new memory segments
+    // @notice Copy of the state, creating new memory segments
+    // @dev The accounts themselves are not copied: they are shared with the parent state until
+    //      their first mutation in the new state, see Internals._own_account.
     // @param state The pointer to the State
     // @return The pointer to the copied State
     func copy{range_check_ptr, state: model.State*}() -> model.State* {
         alloc_locals;
         // accounts are a new memory segment
-        let (accounts_start, accounts) = default_dict_copy(state.accounts_start, state.accounts);
-        // for each account, storage is a new memory segment
-        Internals._copy_accounts{accounts=accounts}(accounts_start, accounts);
+        let (local accounts_start, local accounts) = default_dict_copy(
+            state.accounts_start, state.accounts
+        );
+        // no account is owned by the new state yet
+        let (local owned_accounts_start) = default_dict_new(0);
 
         let (local events: felt*) = alloc();
         memcpy(dst=events, src=state.events, len=state.events_len * model.Event.SIZE);
@@ -56,6 +68,10 @@ namespace State {
         tempvar state_copy = new model.State(
             accounts_start=accounts_start,
             accounts=accounts,
+            owned_accounts_start=owned_accounts_start,
+            owned_accounts=owned_accounts_start,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=cast(events, model.Event*),
             transfers_len=state.transfers_len,
@@ -73,14 +89,29 @@ namespace State {
             state.accounts_start, state.accounts, 0
         );
 
+        // Squash the owned accounts, the accounts copied below being owned by the new state
+        default_dict_finalize(state.owned_accounts_start, state.owned_accounts, 0);
+        let (local owned_accounts_start: DictAccess*) = default_dict_new(0);
+        // The valid jumpdests are kept for the rest of the transaction
+        let (local valid_jumpdests_start, local valid_jumpdests) = default_dict_copy(
+            state.valid_jumpdests_start, state.valid_jumpdests
+        );
+
         let (local accounts_copy: DictAccess*) = default_dict_new(0);
         tempvar accounts_copy_start = accounts_copy;
+        tempvar owned_accounts = owned_accounts_start;
         // Squashes the storage dicts of accounts, and copy the result to a new memory segment.
-        Internals._copy_accounts{accounts=accounts_copy}(accounts_start, accounts_end);
+        Internals._copy_accounts{accounts=accounts_copy, owned_accounts=owned_accounts}(
+            accounts_start, accounts_end
+        );
 
         tempvar state = new model.State(
             accounts_start=accounts_copy_start,
             accounts=accounts_copy,
+            owned_accounts_start=owned_accounts_start,
+            owned_accounts=owned_accounts,
+            valid_jumpdests_start=valid_jumpdests_start,
+            valid_jumpdests=valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -107,6 +138,10 @@ namespace State {
             tempvar state = new model.State(
                 accounts_start=state.accounts_start,
                 accounts=accounts,
+                owned_accounts_start=state.owned_accounts_start,
+                owned_accounts=state.owned_accounts,
+                valid_jumpdests_start=state.valid_jumpdests_start,
+                valid_jumpdests=state.valid_jumpdests,
                 events_len=state.events_len,
                 events=state.events,
                 transfers_len=state.transfers_len,
@@ -118,9 +153,16 @@ namespace State {
         // Otherwise read values from contract storage
         let account = Account.fetch_or_create(evm_address);
         dict_write{dict_ptr=accounts}(key=evm_address, new_value=cast(account, felt));
+        // A freshly fetched account is not shared with any other state
+        let owned_accounts = state.owned_accounts;
+        dict_write{dict_ptr=owned_accounts}(key=evm_address, new_value=TRUE);
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -129,6 +171,108 @@ namespace State {
         return account;
     }
 
+    // @notice Get a given EVM Account to mutate its storage or transient storage dicts.
+    // @dev The account is copied the first time it is mutated in the current state, see Internals._own_account.
+    // @param evm_address The evm address of the Account
+    // @return The account
+    func get_account_mut{
+        syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
+    }(evm_address: felt) -> model.Account* {
+        alloc_locals;
+        let account = get_account(evm_address);
+        let account = Internals._own_account(account);
+        return account;
+    }
+
+    // @notice Get a given EVM Account with its code loaded.
+    // @dev The code of the accounts fetched from Starknet is loaded on first use.
+    // @param evm_address The evm address of the Account
+    // @return The Account with its code
+    func get_account_with_code{
+        syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
+    }(evm_address: felt) -> model.Account* {
+        alloc_locals;
+        let account = get_account(evm_address);
+        if (cast(account.code, felt) != 0) {
+            return account;
+        }
+
+        let account = Account.fetch_code(account);
+        update_account(account);
+        return account;
+    }
+
+    // @notice Restores the state of the parent context when a sub-context reverts.
+    // @dev The valid jumpdests are kept, the jumpdests analyzed in the sub-context being still valid.
+    // @param parent The state of the parent context, before the sub-context started
+    func restore{state: model.State*}(parent: model.State*) {
+        tempvar state = new model.State(
+            accounts_start=parent.accounts_start,
+            accounts=parent.accounts,
+            owned_accounts_start=parent.owned_accounts_start,
+            owned_accounts=parent.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
+            events_len=parent.events_len,
+            events=parent.events,
+            transfers_len=parent.transfers_len,
+            transfers=parent.transfers,
+        );
+        return ();
+    }
+
+    // @notice Check whether the given index is a valid jumpdest in the code of the given account.
+    // @dev The result is cached by code hash for the whole transaction, so that accounts sharing the same
+    //      code only query their Starknet contract once per jumpdest.
+    // @param account The account whose code is executed
+    // @param index The index to check
+    // @return TRUE if the index is a valid jumpdest, FALSE otherwise
+    func is_valid_jumpdest{
+        syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
+    }(account: model.Account*, index: felt) -> felt {
+        alloc_locals;
+        let (code_hash) = hash2{hash_ptr=pedersen_ptr}(
+            account.code_hash.low, account.code_hash.high
+        );
+        let (local key) = hash2{hash_ptr=pedersen_ptr}(code_hash, index);
+        let valid_jumpdests = state.valid_jumpdests;
+        let (cached) = dict_read{dict_ptr=valid_jumpdests}(key);
+        if (cached != 0) {
+            tempvar state = new model.State(
+                accounts_start=state.accounts_start,
+                accounts=state.accounts,
+                owned_accounts_start=state.owned_accounts_start,
+                owned_accounts=state.owned_accounts,
+                valid_jumpdests_start=state.valid_jumpdests_start,
+                valid_jumpdests=valid_jumpdests,
+                events_len=state.events_len,
+                events=state.events,
+                transfers_len=state.transfers_len,
+                transfers=state.transfers,
+            );
+            return cached - 1;
+        }
+
+        local valid_jumpdests_ptr: DictAccess* = valid_jumpdests;
+        let (is_valid) = IAccount.is_valid_jumpdest(account.address.starknet, index);
+        let valid_jumpdests = valid_jumpdests_ptr;
+        // Store 1 + is_valid to distinguish invalid jumpdests from missing keys
+        dict_write{dict_ptr=valid_jumpdests}(key, 1 + is_valid);
+        tempvar state = new model.State(
+            accounts_start=state.accounts_start,
+            accounts=state.accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=valid_jumpdests,
+            events_len=state.events_len,
+            events=state.events,
+            transfers_len=state.transfers_len,
+            transfers=state.transfers,
+        );
+        return is_valid;
+    }
+
     // @notice Cache precompiles accounts in the state, making them warm.
     // @param state The pointer to the State
     func cache_precompiles{
@@ -160,6 +304,10 @@ namespace State {
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts_ptr,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -186,6 +334,10 @@ namespace State {
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts_ptr,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -211,6 +363,10 @@ namespace State {
             tempvar state = new model.State(
                 accounts_start=state.accounts_start,
                 accounts=accounts,
+                owned_accounts_start=state.owned_accounts_start,
+                owned_accounts=state.owned_accounts,
+                valid_jumpdests_start=state.valid_jumpdests_start,
+                valid_jumpdests=state.valid_jumpdests,
                 events_len=state.events_len,
                 events=state.events,
                 transfers_len=state.transfers_len,
@@ -222,9 +378,15 @@ namespace State {
         // Warms up the account
         let account = Account.fetch_or_create(address);
         dict_write{dict_ptr=accounts}(key=address, new_value=cast(account, felt));
+        let owned_accounts = state.owned_accounts;
+        dict_write{dict_ptr=owned_accounts}(key=address, new_value=TRUE);
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -248,29 +410,25 @@ namespace State {
         // Get the account
         let accounts = state.accounts;
         let (pointer) = dict_read{dict_ptr=accounts}(key=address);
-        if (pointer == 0) {
-            tempvar state = new model.State(
-                accounts_start=state.accounts_start,
-                accounts=accounts,
-                events_len=state.events_len,
-                events=state.events,
-                transfers_len=state.transfers_len,
-                transfers=state.transfers,
-            );
-            return FALSE;
-        }
-
-        let (account, res) = Account.is_storage_warm(cast(pointer, model.Account*), key);
-        dict_write{dict_ptr=accounts}(key=account.address.evm, new_value=cast(account, felt));
-
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
             transfers=state.transfers,
         );
+        if (pointer == 0) {
+            return FALSE;
+        }
+
+        let account = Internals._own_account(cast(pointer, model.Account*));
+        let (account, res) = Account.is_storage_warm(account, key);
+        update_account(account);
         return res;
     }
 
@@ -282,6 +440,10 @@ namespace State {
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -300,7 +462,7 @@ namespace State {
         syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
     }(evm_address: felt, key: Uint256*) -> Uint256* {
         alloc_locals;
-        let account = get_account(evm_address);
+        let account = get_account_mut(evm_address);
         let (account, value) = Account.read_storage(account, key);
         update_account(account);
         return value;
@@ -314,7 +476,7 @@ namespace State {
         syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
     }(evm_address: felt, key: Uint256*, value: Uint256*) {
         alloc_locals;
-        let account = get_account(evm_address);
+        let account = get_account_mut(evm_address);
         let account = Account.write_storage(account, key, value);
         update_account(account);
         return ();
@@ -328,7 +490,7 @@ namespace State {
         syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
     }(evm_address: felt, key: Uint256*) -> Uint256* {
         alloc_locals;
-        let account = get_account(evm_address);
+        let account = get_account_mut(evm_address);
         let (account, value) = Account.read_transient_storage(account, key);
         update_account(account);
         return value;
@@ -342,7 +504,7 @@ namespace State {
         syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, state: model.State*
     }(evm_address: felt, key: Uint256*, value: Uint256*) {
         alloc_locals;
-        let account = get_account(evm_address);
+        let account = get_account_mut(evm_address);
         let account = Account.write_transient_storage(account, key, value);
         update_account(account);
         return ();
@@ -356,6 +518,10 @@ namespace State {
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=state.accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len + 1,
             events=state.events,
             transfers_len=state.transfers_len,
@@ -413,6 +579,10 @@ namespace State {
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=state.transfers_len + 1,
@@ -450,7 +620,7 @@ namespace Internals {
     // @dev Should be applied on a squashed dict
     // @param accounts_start The dict start pointer
     // @param accounts_end The dict end pointer
-    func _copy_accounts{range_check_ptr, accounts: DictAccess*}(
+    func _copy_accounts{range_check_ptr, accounts: DictAccess*, owned_accounts: DictAccess*}(
         accounts_start: DictAccess*, accounts_end: DictAccess*
     ) {
         if (accounts_start == accounts_end) {
@@ -467,10 +637,57 @@ namespace Internals {
         let account = cast(accounts_start.new_value, model.Account*);
         let account = Account.copy(account);
         dict_write{dict_ptr=accounts}(key=accounts_start.key, new_value=cast(account, felt));
+        dict_write{dict_ptr=owned_accounts}(key=accounts_start.key, new_value=TRUE);
 
         return _copy_accounts(accounts_start + DictAccess.SIZE, accounts_end);
     }
 
+    // @notice Returns an account owned by the current state, whose internal dicts can be mutated.
+    // @dev Accounts are shared with the parent state after a State.copy, so that an account is only
+    //      copied when it is first mutated in the new state: the parent is left untouched if the
+    //      current context reverts.
+    // @param account The account, as read from the accounts dict of the state
+    // @return The owned account, to be written back with State.update_account after mutation
+    func _own_account{range_check_ptr, state: model.State*}(
+        account: model.Account*
+    ) -> model.Account* {
+        alloc_locals;
+        let owned_accounts = state.owned_accounts;
+        let (is_owned) = dict_read{dict_ptr=owned_accounts}(key=account.address.evm);
+        if (is_owned != FALSE) {
+            tempvar state = new model.State(
+                accounts_start=state.accounts_start,
+                accounts=state.accounts,
+                owned_accounts_start=state.owned_accounts_start,
+                owned_accounts=owned_accounts,
+                valid_jumpdests_start=state.valid_jumpdests_start,
+                valid_jumpdests=state.valid_jumpdests,
+                events_len=state.events_len,
+                events=state.events,
+                transfers_len=state.transfers_len,
+                transfers=state.transfers,
+            );
+            return account;
+        }
+
+        dict_write{dict_ptr=owned_accounts}(key=account.address.evm, new_value=TRUE);
+        local owned_accounts_end: DictAccess* = owned_accounts;
+        let account = Account.copy(account);
+        tempvar state = new model.State(
+            accounts_start=state.accounts_start,
+            accounts=state.accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=owned_accounts_end,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
+            events_len=state.events_len,
+            events=state.events,
+            transfers_len=state.transfers_len,
+            transfers=state.transfers,
+        );
+        return account;
+    }
+
     // @notice Cache a precompiled account in the state.
     // @param evm_address The EVM address of the precompiled account.
     func _cache_precompile{
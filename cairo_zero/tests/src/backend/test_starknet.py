@@ -1,3 +1,4 @@
+import pytest
 from starkware.starknet.public.abi import get_selector_from_name
 
 from tests.utils.syscall_handler import SyscallHandler
@@ -11,6 +12,7 @@ class TestStarknet:
             assert env["gas_price"] == 2
 
     class TestSaveValidJumpdests:
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch(
             "IERC20.balanceOf",
             lambda *_: [0, 0],
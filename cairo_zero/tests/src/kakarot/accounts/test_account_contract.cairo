@@ -12,6 +12,7 @@ from kakarot.accounts.account_contract import (
     write_bytecode,
     bytecode as read_bytecode,
     write_jumpdests,
+    migrate_jumpdests,
     is_valid_jumpdest,
     set_nonce,
     set_authorized_pre_eip155_tx,
@@ -191,7 +192,9 @@ func test__execute_from_outside_entrypoint{
     return (return_data_len, return_data);
 }
 
-func test__write_jumpdests{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}() {
+func test__write_jumpdests{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}() {
     // Given
     tempvar jumpdests_len: felt;
     let (jumpdests) = alloc();
@@ -206,8 +209,16 @@ func test__write_jumpdests{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range
     return ();
 }
 
-func test__is_valid_jumpdest{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
-    ) -> felt {
+func test__migrate_jumpdests{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}() {
+    migrate_jumpdests();
+    return ();
+}
+
+func test__is_valid_jumpdest{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, bitwise_ptr: BitwiseBuiltin*
+}() -> felt {
     tempvar index: felt;
     %{ ids.index = program_input["index"] %}
 
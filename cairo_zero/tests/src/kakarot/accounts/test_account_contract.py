@@ -42,6 +42,7 @@ class TestAccountContract:
         return random.randbytes(request.param)
 
     class TestInitialize:
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("IKakarot.register_account", lambda *_: [])
         @SyscallHandler.patch("IKakarot.get_native_token", lambda *_: [0xDEAD])
         @SyscallHandler.patch("IERC20.approve", lambda *_: [1])
@@ -83,6 +84,7 @@ class TestAccountContract:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__write_bytecode", bytecode=[])
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_write_bytecode(self, cairo_run, bytecode):
             cairo_run("test__write_bytecode", bytecode=list(bytecode))
@@ -110,6 +112,7 @@ class TestAccountContract:
 
             return _storage
 
+        @pytest.mark.record_syscalls
         def test_should_read_bytecode(self, cairo_run, bytecode):
             with patch.object(
                 SyscallHandler, "mock_storage", side_effect=self.storage(bytecode)
@@ -121,6 +124,7 @@ class TestAccountContract:
             mock_storage.assert_has_calls(calls)
             assert output[:output_len] == list(bytecode)
 
+        @pytest.mark.record_syscalls
         @given(bytecode=binary(min_size=1, max_size=400))
         @settings(max_examples=5)
         def test_should_raise_when_read_bytecode_zellic_issue_1279(
@@ -145,6 +149,7 @@ class TestAccountContract:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_nonce", new_nonce=0x00)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_nonce(self, cairo_run):
             cairo_run("test__set_nonce", new_nonce=1)
@@ -159,6 +164,7 @@ class TestAccountContract:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__upgrade", new_class=0x00)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_new_class(self, cairo_run):
             cairo_run("test__upgrade", new_class=0x1234)
@@ -171,31 +177,53 @@ class TestAccountContract:
                 with cairo_error(message="Ownable: caller is not the owner"):
                     cairo_run("test__write_jumpdests", jumpdests=[])
 
+            @pytest.mark.record_syscalls
             @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
             def test__should_store_valid_jumpdests(self, cairo_run):
-                jumpdests = [0x02, 0x10, 0xFF]
+                jumpdests = [0x02, 0x10, 0xFF, 0x1F5]
                 cairo_run("test__write_jumpdests", jumpdests=jumpdests)
 
-                base_address = get_storage_var_address("Account_valid_jumpdests")
-                calls = [
-                    call(address=base_address + jumpdest, value=1)
-                    for jumpdest in jumpdests
+                base_address = get_storage_var_address("Account_jumpdests_bitmap")
+                # One storage write per bitmap word
+                writes = [
+                    storage_call
+                    for storage_call in SyscallHandler.mock_storage.call_args_list
+                    if "value" in storage_call.kwargs
+                ]
+                assert writes == [
+                    call(address=base_address, value=2**0x02 | 2**0x10),
+                    call(address=base_address + 1, value=2**4 | 2**250),
                 ]
 
-                SyscallHandler.mock_storage.assert_has_calls(calls)
+            @pytest.mark.record_syscalls
+            @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
+            @SyscallHandler.patch("Account_jumpdests_bitmap", 2**0x01)
+            def test__should_keep_stored_jumpdests(self, cairo_run):
+                cairo_run("test__write_jumpdests", jumpdests=[0x02])
+
+                SyscallHandler.mock_storage.assert_any_call(
+                    address=get_storage_var_address("Account_jumpdests_bitmap"),
+                    value=2**0x01 | 2**0x02,
+                )
 
         class TestReadJumpdests:
             @pytest.fixture
             def store_jumpdests(self, jumpdests):
-                base_address = get_storage_var_address("Account_valid_jumpdests")
-                valid_addresses = [base_address + jumpdest for jumpdest in jumpdests]
+                base_address = get_storage_var_address("Account_jumpdests_bitmap")
+                bitmaps = {}
+                for jumpdest in jumpdests:
+                    word_index, bit_index = divmod(jumpdest, 251)
+                    bitmaps[base_address + word_index] = bitmaps.get(
+                        base_address + word_index, 0
+                    ) | (2**bit_index)
 
                 def _storage(address):
-                    return 1 if address in valid_addresses else 0
+                    return bitmaps.get(address, 0)
 
                 return _storage
 
-            @pytest.mark.parametrize("jumpdests", [[0x02, 0x10, 0xFF]])
+            @pytest.mark.record_syscalls
+            @pytest.mark.parametrize("jumpdests", [[0x02, 0x10, 0xFF, 0x1F5]])
             def test__should_return_if_jumpdest_valid(
                 self, cairo_run, jumpdests, store_jumpdests
             ):
@@ -204,14 +232,63 @@ class TestAccountContract:
                 ):
                     for jumpdest in jumpdests:
                         assert cairo_run("test__is_valid_jumpdest", index=jumpdest) == 1
+                    for index in [0x03, 0xFA, 0xFB, 0x1F6]:
+                        assert cairo_run("test__is_valid_jumpdest", index=index) == 0
 
-                    base_address = get_storage_var_address("Account_valid_jumpdests")
+                    base_address = get_storage_var_address("Account_jumpdests_bitmap")
                     calls = [
-                        call(address=base_address + jumpdest) for jumpdest in jumpdests
+                        call(address=base_address + jumpdest // 251)
+                        for jumpdest in jumpdests
                     ]
                     SyscallHandler.mock_storage.assert_has_calls(calls)
 
+            @pytest.mark.record_syscalls
+            @pytest.mark.parametrize("jumpdests", [[0x02, 0x10, 0xFF, 0x1F5]])
+            def test__should_fallback_to_legacy_jumpdests(self, cairo_run, jumpdests):
+                # Account not migrated yet: only the legacy slots are populated
+                base_address = get_storage_var_address("Account_valid_jumpdests")
+
+                def _storage(address):
+                    return int(address - base_address in jumpdests)
+
+                with patch.object(SyscallHandler, "mock_storage", side_effect=_storage):
+                    for jumpdest in jumpdests:
+                        assert cairo_run("test__is_valid_jumpdest", index=jumpdest) == 1
+                    for index in [0x03, 0xFA, 0xFB, 0x1F6]:
+                        assert cairo_run("test__is_valid_jumpdest", index=index) == 0
+
+        class TestMigrateJumpdests:
+            @SyscallHandler.patch("Ownable_owner", 0xDEAD)
+            def test_should_assert_only_owner(self, cairo_run):
+                with cairo_error(message="Ownable: caller is not the owner"):
+                    cairo_run("test__migrate_jumpdests")
+
+            @pytest.mark.record_syscalls
+            @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
+            def test_should_store_bytecode_jumpdests(self, cairo_run):
+                # PUSH1 0x5b, JUMPDEST at 2, STOPs and JUMPDEST at 303
+                bytecode = bytes([0x60, 0x5B, 0x5B] + [0x00] * 300 + [0x5B])
+                chunks = wrap(bytecode.hex(), 2 * 31)
+
+                def _storage(address, value=None):
+                    if address == get_storage_var_address("Account_bytecode_len"):
+                        return len(bytecode)
+                    if address < len(chunks):
+                        return int(chunks[address], 16)
+
+                with patch.object(
+                    SyscallHandler, "mock_storage", side_effect=_storage
+                ) as mock_storage:
+                    cairo_run("test__migrate_jumpdests")
+
+                base_address = get_storage_var_address("Account_jumpdests_bitmap")
+                mock_storage.assert_any_call(address=base_address, value=2**2)
+                mock_storage.assert_any_call(
+                    address=base_address + 1, value=2 ** (303 - 251)
+                )
+
     class TestCodeHash:
+        @pytest.mark.record_syscalls
         @given(code_hash=integers(min_value=0, max_value=2**256 - 1))
         def test__should_set_code_hash(self, cairo_run, code_hash):
             with patch.object(SyscallHandler, "mock_storage") as mock_storage:
@@ -229,6 +306,7 @@ class TestAccountContract:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_authorized_pre_eip155_tx", msg_hash=[0, 0])
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_authorized_pre_eip155_tx(self, cairo_run):
             msg_hash = int.from_bytes(keccak(b"test"), "big")
@@ -253,6 +331,7 @@ class TestAccountContract:
                     calldata=[],
                 )
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_execute_starknet_call(self, cairo_run):
             call_to = 0xABCDEF1234567890
@@ -412,6 +491,7 @@ class TestAccountContract:
                     chain_id=CHAIN_ID + 1,
                 )
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("IKakarot.get_native_token", lambda *_: [0xDEAD])
         @SyscallHandler.patch("IERC20.balanceOf", lambda *_: int_to_uint256(10**128))
         @SyscallHandler.patch(
@@ -458,6 +538,7 @@ class TestAccountContract:
             assert output_len == 1
             assert output[0] == 0x68656C6C6F
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("IERC20.balanceOf", lambda *_: int_to_uint256(10**128))
         @SyscallHandler.patch(
             "IKakarot.eth_send_raw_unsigned_tx",
@@ -495,6 +576,7 @@ class TestAccountContract:
             assert output_len == 1
             assert output[0] == 0x68656C6C6F
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("IERC20.balanceOf", lambda *_: int_to_uint256(10**128))
         @SyscallHandler.patch(
             "IKakarot.eth_send_raw_unsigned_tx",
@@ -48,7 +48,7 @@ class TestEnvironmentalInformation:
         @SyscallHandler.patch("IAccount.get_code_hash", lambda *_: [0x1, 0x1])
         def test_extcodesize_should_push_code_size(self, cairo_run, bytecode, address):
             with SyscallHandler.patch(
-                "IAccount.bytecode", lambda *_: [len(bytecode), *bytecode]
+                "IAccount.bytecode_len", lambda *_: [len(bytecode)]
             ):
                 output = cairo_run("test__exec_extcodesize", address=address)
 
@@ -74,8 +74,13 @@ class TestEnvironmentalInformation:
             self, cairo_run, size, offset, dest_offset, bytecode, address
         ):
 
-            with SyscallHandler.patch(
-                "IAccount.bytecode", lambda *_: [len(bytecode), *bytecode]
+            with (
+                SyscallHandler.patch(
+                    "IAccount.bytecode_len", lambda *_: [len(bytecode)]
+                ),
+                SyscallHandler.patch(
+                    "IAccount.bytecode", lambda *_: [len(bytecode), *bytecode]
+                ),
             ):
                 memory = cairo_run(
                     "test__exec_extcodecopy",
@@ -116,8 +121,13 @@ class TestEnvironmentalInformation:
         ):
             offset_high = 1
 
-            with SyscallHandler.patch(
-                "IAccount.bytecode", lambda *_: [len(bytecode), *bytecode]
+            with (
+                SyscallHandler.patch(
+                    "IAccount.bytecode_len", lambda *_: [len(bytecode)]
+                ),
+                SyscallHandler.patch(
+                    "IAccount.bytecode", lambda *_: [len(bytecode), *bytecode]
+                ),
             ):
                 memory = cairo_run(
                     "test__exec_extcodecopy_zellic_issue_1258",
@@ -240,8 +250,8 @@ class TestEnvironmentalInformation:
         ):
             with (
                 SyscallHandler.patch(
-                    "IAccount.bytecode",
-                    lambda *_: [len(bytecode), *bytecode],
+                    "IAccount.bytecode_len",
+                    lambda *_: [len(bytecode)],
                 ),
                 SyscallHandler.patch(
                     "IAccount.get_code_hash",
@@ -74,6 +74,7 @@ class TestPrecompiles:
                 assert gas_used == 3450
 
         class TestKakarotPrecompiles:
+            @pytest.mark.record_syscalls
             @SyscallHandler.patch(
                 "Kakarot_authorized_cairo_precompiles_callers",
                 AUTHORIZED_CALLER_ADDRESS,
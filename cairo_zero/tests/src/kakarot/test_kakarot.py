@@ -1,6 +1,10 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from threading import Barrier
 from types import MethodType
-from unittest.mock import PropertyMock, patch
+from unittest.mock import PropertyMock, call, patch
 
 import pytest
 from eth_abi import decode, encode
@@ -16,10 +20,11 @@ from web3._utils.abi import map_abi_data
 from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
 from web3.exceptions import NoABIFunctionsFound
 
-from kakarot_scripts.ef_tests.fetch import EF_TESTS_PARSED_DIR
+from kakarot_scripts.utils.uint256 import int_to_uint256
 from tests.utils.constants import CHAIN_ID, TRANSACTION_GAS_LIMIT, TRANSACTIONS
 from tests.utils.errors import cairo_error
 from tests.utils.helpers import felt_to_signed_int, rlp_encode_signed_data
+from tests.utils.reporting import dump_evm_profile
 from tests.utils.syscall_handler import SyscallHandler, parse_state
 
 CONTRACT_ADDRESS = 1234
@@ -28,6 +33,8 @@ OTHER = to_checksum_address(f"0x{0xE1A5:040x}")
 
 EVM_ADDRESS = 0x42069
 
+EF_SMOKE_TEST = Path("tests") / "ef_tests" / "smoke_test.json"
+
 
 @pytest.fixture(scope="module")
 def get_contract(cairo_run):
@@ -75,6 +82,124 @@ def get_contract(cairo_run):
     return _factory
 
 
+@contextmanager
+def patch_block_header(header):
+    """
+    Patch the block values read by Kakarot, i.e. the coinbase, base fee, prev_randao,
+    block gas limit, block number and timestamp, with the ones of an EF block header.
+    """
+    block_number = int(header["number"], 16)
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(SyscallHandler, "block_number", block_number))
+        stack.enter_context(
+            patch.object(
+                SyscallHandler, "block_timestamp", int(header["timestamp"], 16)
+            )
+        )
+        stack.enter_context(
+            SyscallHandler.patch("Kakarot_coinbase", int(header["coinbase"], 16))
+        )
+        stack.enter_context(
+            SyscallHandler.patch(
+                "Kakarot_base_fee",
+                int.from_bytes(b"current_block", "big"),
+                value=[int(header.get("baseFeePerGas", "0x0"), 16), block_number],
+            )
+        )
+        stack.enter_context(
+            SyscallHandler.patch(
+                "Kakarot_prev_randao",
+                value=int_to_uint256(int(header.get("mixHash", "0x0"), 16)),
+            )
+        )
+        stack.enter_context(
+            SyscallHandler.patch("Kakarot_block_gas_limit", int(header["gasLimit"], 16))
+        )
+        yield
+
+
+def run_blockchain_test(cairo_run, test_case):
+    """
+    Run all the transactions of an EF BlockchainTest, each one on the state left by the
+    previous one, and check the gas used by each block and the final state.
+
+    Invalid blocks and transactions, i.e. expecting an exception, are not part of the
+    post state and are skipped.
+    """
+    state = parse_state(test_case["pre"])
+    for block in test_case["blocks"]:
+        if "expectException" in block:
+            continue
+        header = block["blockHeader"]
+        base_fee = int(header.get("baseFeePerGas", "0x0"), 16)
+        coinbase = int(header["coinbase"], 16)
+        block_gas_used = 0
+        for tx in block.get("transactions", []):
+            if "expectException" in tx:
+                continue
+            if "gasPrice" in tx:
+                gas_price = int(tx["gasPrice"], 16)
+            else:
+                gas_price = min(
+                    int(tx["maxFeePerGas"], 16),
+                    base_fee + int(tx["maxPriorityFeePerGas"], 16),
+                )
+            with patch_block_header(header), SyscallHandler.patch_state(state):
+                evm, tx_state, gas_used, required_gas = cairo_run(
+                    "eth_call",
+                    origin=int(tx["sender"], 16),
+                    to=int(tx.get("to"), 16) if tx.get("to") else None,
+                    gas_limit=int(tx["gasLimit"], 16),
+                    gas_price=gas_price,
+                    value=int(tx["value"], 16),
+                    data=tx["data"],
+                    nonce=int(tx["nonce"], 16),
+                )
+            block_gas_used += gas_used
+            tx_accounts = parse_state(
+                {
+                    int(address, 16): {
+                        "balance": int(account["balance"], 16),
+                        "code": account["code"],
+                        "nonce": account["nonce"],
+                        "storage": {
+                            key: int(value, 16)
+                            for key, value in account["storage"].items()
+                        },
+                    }
+                    for address, account in tx_state["accounts"].items()
+                    if int(address, 16) > 10
+                }
+            )
+            # The returned accounts only hold the code loaded and the storage
+            # accessed during the transaction
+            for address, account in tx_accounts.items():
+                previous = state.get(address, {"code": [], "storage": {}})
+                state[address] = {
+                    **account,
+                    "code": (
+                        previous["code"] if account["code"] is None else account["code"]
+                    ),
+                    "storage": {**previous["storage"], **account["storage"]},
+                }
+            # Kakarot sends the whole fee to the coinbase, while the base fee is burnt
+            state[coinbase]["balance"] -= base_fee * gas_used
+        assert block_gas_used == int(header["gasUsed"], 16)
+
+    # Empty accounts, e.g. the warm precompiles, are not part of the post state
+    parsed_state = {
+        address: {
+            **account,
+            "storage": {
+                key: value for key, value in account["storage"].items() if value > 0
+            },
+        }
+        for address, account in state.items()
+        if account["balance"] or account["code"] or account["nonce"]
+    }
+    assert parsed_state == parse_state(test_case["postState"])
+
+
 class TestKakarot:
 
     class TestPause:
@@ -83,6 +208,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__pause")
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         @SyscallHandler.patch("Pausable_paused", 0)
         def test_should_pause(self, cairo_run):
@@ -97,6 +223,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__unpause")
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         @SyscallHandler.patch("Pausable_paused", 1)
         def test_should_unpause(self, cairo_run):
@@ -111,6 +238,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__transfer_ownership", new_owner=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_transfer_ownership(self, cairo_run):
             new_owner = 0xABCDE12345
@@ -125,6 +253,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_base_fee", base_fee=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         @patch.object(SyscallHandler, "block_number", 0x100)
         def test_set_base_fee_should_set_next_block_fee(self, cairo_run):
@@ -144,6 +273,7 @@ class TestKakarot:
                 value=0x101,
             )
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         @SyscallHandler.patch(
             get_storage_var_address(
@@ -205,6 +335,7 @@ class TestKakarot:
             base_fee = cairo_run("test__get_base_fee")
             assert base_fee == 1
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         @SyscallHandler.patch(
             get_storage_var_address(
@@ -262,6 +393,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_coinbase", coinbase=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_coinbase(self, cairo_run):
             coinbase = 0xC0DE
@@ -276,6 +408,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_prev_randao", prev_randao=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_prev_randao(self, cairo_run):
             prev_randao = 0x123
@@ -291,6 +424,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__initialize_chain_id", chain_id=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_initialize_chain_id(self, cairo_run):
             chain_id = 0x123
@@ -316,6 +450,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_block_gas_limit", block_gas_limit=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_block_gas_limit(self, cairo_run):
             block_gas_limit = 0x1000
@@ -332,6 +467,7 @@ class TestKakarot:
             with cairo_error(message="Ownable: caller is not the owner"):
                 cairo_run("test__set_account_contract_class_hash", class_hash=0xABC)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_account_contract_class_hash(self, cairo_run):
             class_hash = 0x123
@@ -350,6 +486,7 @@ class TestKakarot:
                     "test__set_uninitialized_account_class_hash", class_hash=0xABC
                 )
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_uninitialized_account_class_hash(self, cairo_run):
             class_hash = 0x123
@@ -373,6 +510,7 @@ class TestKakarot:
                     authorized=0xBCD,
                 )
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
         def test_should_set_authorized_cairo_precompile_caller(self, cairo_run):
             caller = 0x123
@@ -410,6 +548,7 @@ class TestKakarot:
             with cairo_error(message="Pausable: paused"):
                 cairo_run("test__register_account", evm_address=EVM_ADDRESS)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Kakarot_evm_to_starknet_address", EVM_ADDRESS, 0)
         @patch(
             "tests.utils.syscall_handler.SyscallHandler.caller_address",
@@ -432,6 +571,7 @@ class TestKakarot:
                 value=starknet_address,
             )
 
+        @pytest.mark.record_syscalls
         @pytest.mark.slow
         @SyscallHandler.patch("Kakarot_evm_to_starknet_address", 0x42069, 1)
         @patch(
@@ -449,6 +589,7 @@ class TestKakarot:
             with cairo_error(message="Kakarot: account already registered"):
                 cairo_run("test__register_account", evm_address=EVM_ADDRESS)
 
+        @pytest.mark.record_syscalls
         @SyscallHandler.patch("Kakarot_evm_to_starknet_address", EVM_ADDRESS, 0)
         @patch(
             "tests.utils.syscall_handler.SyscallHandler.caller_address",
@@ -477,6 +618,7 @@ class TestKakarot:
                         new_class_hash=0x1234,
                     )
 
+            @pytest.mark.record_syscalls
             @SyscallHandler.patch(
                 "Kakarot_evm_to_starknet_address", EVM_ADDRESS, 0x99999
             )
@@ -494,6 +636,33 @@ class TestKakarot:
                     calldata=[0x1234],
                 )
 
+            @pytest.mark.record_syscalls
+            @SyscallHandler.patch(
+                "Kakarot_evm_to_starknet_address", EVM_ADDRESS, 0x99999
+            )
+            @SyscallHandler.patch("Kakarot_account_contract_class_hash", 0x1234)
+            @SyscallHandler.patch("Ownable_owner", SyscallHandler.caller_address)
+            @SyscallHandler.patch("IAccount.upgrade", lambda *_: [])
+            @SyscallHandler.patch("IAccount.migrate_jumpdests", lambda *_: [])
+            def test_upgrade_account_should_migrate_jumpdests(self, cairo_run):
+                cairo_run(
+                    "test__upgrade_account",
+                    evm_address=EVM_ADDRESS,
+                    new_class_hash=0x1234,
+                )
+                assert SyscallHandler.mock_call.call_args_list == [
+                    call(
+                        contract_address=0x99999,
+                        function_selector=get_selector_from_name("upgrade"),
+                        calldata=[0x1234],
+                    ),
+                    call(
+                        contract_address=0x99999,
+                        function_selector=get_selector_from_name("migrate_jumpdests"),
+                        calldata=[],
+                    ),
+                ]
+
     class TestEthCall:
         @pytest.mark.slow
         @pytest.mark.SolmateERC20
@@ -543,49 +712,230 @@ class TestKakarot:
                 )
             assert not evm["reverted"]
 
+        @pytest.mark.slow
+        @SyscallHandler.patch("IAccount.get_code_hash", lambda *_: [0x1, 0x1])
+        @pytest.mark.parametrize("warm_accounts_count", [0, 30])
+        def test_nested_calls_should_only_revert_reverted_context(
+            self, cairo_run, warm_accounts_count
+        ):
+            callee = CONTRACT_ADDRESS + 1
+            reverting_callee = CONTRACT_ADDRESS + 2
+
+            def call(to):
+                # CALL with all the gas left, no value, no args and no return data
+                return "6000" * 5 + f"61{to:04x}" + "5af150"
+
+            initial_state = {
+                # Warm up some accounts then call the callee 10 times
+                CONTRACT_ADDRESS: {
+                    "code": "".join(
+                        f"61{0x100 + i:04x}3150" for i in range(warm_accounts_count)
+                    )
+                    + call(callee) * 10
+                    + "00",
+                    "storage": {},
+                    "balance": 0,
+                    "nonce": 1,
+                },
+                # Increment the counter at slot 0 then call the reverting callee
+                callee: {
+                    "code": "600160005401600055" + call(reverting_callee) + "00",
+                    "storage": {},
+                    "balance": 0,
+                    "nonce": 1,
+                },
+                # Write 1 at slot 0 then revert
+                reverting_callee: {
+                    "code": "6001600055" + "60006000fd",
+                    "storage": {},
+                    "balance": 0,
+                    "nonce": 1,
+                },
+            }
+            with SyscallHandler.patch_state(parse_state(initial_state)):
+                evm, state, *_ = cairo_run(
+                    "eth_call",
+                    origin=int(OWNER, 16),
+                    to=CONTRACT_ADDRESS,
+                    gas_limit=int(TRANSACTION_GAS_LIMIT),
+                    gas_price=0,
+                    value=0,
+                    data="0x",
+                )
+
+            assert not evm["reverted"]
+            accounts = {
+                int(address, 16): account
+                for address, account in state["accounts"].items()
+            }
+            assert list(accounts[callee]["storage"].values()) == ["0xa"]
+            assert accounts[reverting_callee]["storage"] == {}
+
+        @pytest.mark.record_syscalls
+        @SyscallHandler.patch("IAccount.is_valid_jumpdest", lambda *_: [1])
+        @SyscallHandler.patch("IAccount.get_code_hash", lambda *_: [0x1, 0x1])
+        def test_sibling_calls_should_share_valid_jumpdests(self, cairo_run):
+            callees = [CONTRACT_ADDRESS + 1, CONTRACT_ADDRESS + 2]
+
+            def call(to):
+                # CALL with all the gas left, no value, no args and no return data
+                return "6000" * 5 + f"61{to:04x}" + "5af150"
+
+            initial_state = {
+                CONTRACT_ADDRESS: {
+                    "code": "".join(call(callee) for callee in callees) + "00",
+                    "storage": {},
+                    "balance": 0,
+                    "nonce": 1,
+                },
+                # Same code, hence same code hash: JUMP to the JUMPDEST at 3 then STOP
+                **{
+                    callee: {
+                        "code": "6003565b00",
+                        "storage": {},
+                        "balance": 0,
+                        "nonce": 1,
+                    }
+                    for callee in callees
+                },
+            }
+            with SyscallHandler.patch_state(parse_state(initial_state)):
+                evm, *_ = cairo_run(
+                    "eth_call",
+                    origin=int(OWNER, 16),
+                    to=CONTRACT_ADDRESS,
+                    gas_limit=int(TRANSACTION_GAS_LIMIT),
+                    gas_price=0,
+                    value=0,
+                    data="0x",
+                )
+
+            assert not evm["reverted"]
+            jumpdest_calls = [
+                args
+                for args in SyscallHandler.mock_call.call_args_list
+                if args.kwargs["function_selector"]
+                == get_selector_from_name("is_valid_jumpdest")
+            ]
+            assert len(jumpdest_calls) == 1
+            assert jumpdest_calls[0].kwargs["calldata"] == [3]
+
+        def test_should_profile_the_executed_opcodes(
+            self, cairo_run, request, monkeypatch, tmp_path
+        ):
+            monkeypatch.setattr(request.config.option, "profile_evm", True)
+            monkeypatch.setattr(
+                "tests.fixtures.starknet.dump_evm_profile",
+                lambda _, samples: dump_evm_profile(tmp_path / "profile", samples),
+            )
+            initial_state = {
+                CONTRACT_ADDRESS: {
+                    # PUSH1 0x01, PUSH1 0x02, ADD, STOP
+                    "code": "600160020100",
+                    "storage": {},
+                    "balance": 0,
+                    "nonce": 1,
+                }
+            }
+            with SyscallHandler.patch_state(parse_state(initial_state)):
+                cairo_run(
+                    "eth_call",
+                    origin=int(OWNER, 16),
+                    to=CONTRACT_ADDRESS,
+                    gas_limit=int(TRANSACTION_GAS_LIMIT),
+                    gas_price=0,
+                    value=0,
+                    data="0x",
+                )
+
+            contract = f"0x{CONTRACT_ADDRESS:040x}"
+            folded = {
+                stack: int(steps)
+                for stack, steps in (
+                    line.rsplit(" ", 1)
+                    for line in (tmp_path / "profile.folded").read_text().splitlines()
+                )
+            }
+            assert list(folded) == [
+                f"{contract};PUSH1;pc_0",
+                f"{contract};PUSH1;pc_2",
+                f"{contract};ADD;pc_4",
+                f"{contract};STOP;pc_5",
+            ]
+            assert all(steps > 0 for steps in folded.values())
+
+            profile = json.loads((tmp_path / "profile.json").read_text())
+            assert {
+                opcode: resources["count"]
+                for opcode, resources in profile["opcodes"].items()
+            } == {"PUSH1": 2, "ADD": 1, "STOP": 1}
+            assert profile["opcodes"]["PUSH1"]["n_steps"] == (
+                folded[f"{contract};PUSH1;pc_0"] + folded[f"{contract};PUSH1;pc_2"]
+            )
+            assert profile["contracts"][contract]["count"] == 4
+            assert profile["contracts"][contract]["n_steps"] == sum(folded.values())
+
         @pytest.mark.slow
         @pytest.mark.NoCI
         @pytest.mark.EFTests
-        @pytest.mark.parametrize(
-            "ef_blockchain_test",
-            EF_TESTS_PARSED_DIR.glob("*walletConstruction_d0g1v0_Cancun*.json"),
-        )
         def test_case(
             self,
             cairo_run,
             ef_blockchain_test,
         ):
-            test_case = json.loads(ef_blockchain_test.read_text())
-            block = test_case["blocks"][0]
-            tx = block["transactions"][0]
-            with SyscallHandler.patch_state(parse_state(test_case["pre"])):
-                evm, state, gas_used, required_gas = cairo_run(
-                    "eth_call",
-                    origin=int(tx["sender"], 16),
-                    to=int(tx.get("to"), 16) if tx.get("to") else None,
-                    gas_limit=int(tx["gasLimit"], 16),
-                    gas_price=int(tx["gasPrice"], 16),
-                    value=int(tx["value"], 16),
-                    data=tx["data"],
-                    nonce=int(tx["nonce"], 16),
+            run_blockchain_test(cairo_run, json.loads(ef_blockchain_test.read_text()))
+
+        def test_smoke_case(self, cairo_run):
+            # Fee-paying legacy and EIP-1559 transactions with a JUMP, and an invalid
+            # block, to keep the EF tests path exercised in CI
+            run_blockchain_test(cairo_run, json.loads(EF_SMOKE_TEST.read_text()))
+
+        def test_concurrent_runs_should_not_share_state_nor_recorded_calls(
+            self, cairo_run
+        ):
+            # The JUMP counter of the smoke test, with a different counter per run
+            counters = {
+                0x1000000000000000000000000000000000000000: 1,
+                0x2000000000000000000000000000000000000000: 10,
+            }
+            barrier = Barrier(len(counters))
+
+            def _run(contract):
+                state = parse_state(
+                    {
+                        contract: {
+                            "balance": 0,
+                            "code": "0x600456005b60005460010160005500",
+                            "nonce": 1,
+                            "storage": {"0x00": counters[contract]},
+                        }
+                    }
                 )
+                SyscallHandler.reset_mocks(record_calls=True)
+                with SyscallHandler.patch_state(state):
+                    barrier.wait()
+                    evm, tx_state, *_ = cairo_run(
+                        "eth_call", origin=int(OWNER, 16), to=contract, data="0x"
+                    )
+                return evm, tx_state, SyscallHandler.mock_call.call_args_list
 
-            parsed_state = {
-                int(address, 16): {
-                    "balance": int(account["balance"], 16),
-                    "code": account["code"],
-                    "nonce": account["nonce"],
-                    "storage": {
-                        key: int(value, 16)
-                        for key, value in account["storage"].items()
-                        if int(value, 16) > 0
-                    },
+            with ThreadPoolExecutor(max_workers=len(counters)) as executor:
+                results = dict(zip(counters, executor.map(_run, counters)))
+
+            for contract, (evm, tx_state, calls) in results.items():
+                assert not evm["reverted"]
+                account = next(
+                    account
+                    for address, account in tx_state["accounts"].items()
+                    if int(address, 16) == contract
+                )
+                assert {int(value, 16) for value in account["storage"].values()} == {
+                    counters[contract] + 1
                 }
-                for address, account in state["accounts"].items()
-                if int(address, 16) > 10
-            }
-            assert parsed_state == parse_state(test_case["postState"])
-            assert gas_used == int(block["blockHeader"]["gasUsed"], 16)
+                called = {call_.kwargs["contract_address"] for call_ in calls}
+                assert called & set(counters) == {contract}
+            # The calls of the threads are not recorded in the mocks of the test
+            assert SyscallHandler.mock_call.call_args_list == []
 
         @pytest.mark.skip
         def test_failing_contract(self, cairo_run):
@@ -1,5 +1,6 @@
 %builtins range_check
 
+from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.uint256 import Uint256, assert_uint256_eq
 
 from kakarot.memory import Memory
@@ -79,3 +80,69 @@ func test__load__should_return_element{range_check_ptr}() {
     assert value = Uint256(0, 0);
     return ();
 }
+
+func test__copy{range_check_ptr}() -> model.Memory* {
+    alloc_locals;
+    // Given
+    let (memory_init_state) = alloc();
+    local memory_init_state_len: felt;
+    local size: felt;
+    local src_offset: felt;
+    local dst_offset: felt;
+    %{
+        ids.memory_init_state_len = len(program_input["memory_init_state"])
+        segments.write_arg(ids.memory_init_state, program_input["memory_init_state"])
+        ids.size = program_input["size"]
+        ids.src_offset = program_input["src_offset"]
+        ids.dst_offset = program_input["dst_offset"]
+    %}
+    let memory = Memory.init();
+    with memory {
+        Memory.store_n(memory_init_state_len, memory_init_state, 0);
+    }
+    tempvar memory = new model.Memory(
+        memory.word_dict_start, memory.word_dict, memory_init_state_len / 32
+    );
+
+    // When
+    with memory {
+        Memory.copy(size, src_offset, dst_offset);
+    }
+
+    // Then
+    return memory;
+}
+
+func test__load_n_store_n{range_check_ptr}() -> model.Memory* {
+    alloc_locals;
+    // Given
+    let (memory_init_state) = alloc();
+    local memory_init_state_len: felt;
+    local size: felt;
+    local src_offset: felt;
+    local dst_offset: felt;
+    %{
+        ids.memory_init_state_len = len(program_input["memory_init_state"])
+        segments.write_arg(ids.memory_init_state, program_input["memory_init_state"])
+        ids.size = program_input["size"]
+        ids.src_offset = program_input["src_offset"]
+        ids.dst_offset = program_input["dst_offset"]
+    %}
+    let memory = Memory.init();
+    with memory {
+        Memory.store_n(memory_init_state_len, memory_init_state, 0);
+    }
+    tempvar memory = new model.Memory(
+        memory.word_dict_start, memory.word_dict, memory_init_state_len / 32
+    );
+
+    // When
+    let (data) = alloc();
+    with memory {
+        Memory.load_n(size, data, src_offset);
+        Memory.store_n(size, data, dst_offset);
+    }
+
+    // Then
+    return memory;
+}
@@ -1,4 +1,8 @@
 import pytest
+from hypothesis import example, given
+from hypothesis.strategies import binary, integers
+
+from tests.utils.reporting import _resources_report
 
 
 class TestMemory:
@@ -34,3 +38,62 @@ class TestMemory:
 
         def test_should_expand_memory_and_return_element(self, cairo_run):
             cairo_run("test__load__should_return_element")
+
+    class TestCopy:
+        @given(
+            memory_init_state=binary(min_size=1, max_size=200),
+            size=integers(min_value=0, max_value=100),
+            src_offset=integers(min_value=0, max_value=100),
+            dst_offset=integers(min_value=0, max_value=100),
+        )
+        # Same alignment, overlapping forward and backward copies
+        @example(
+            memory_init_state=bytes(range(200)), size=40, src_offset=3, dst_offset=19
+        )
+        @example(
+            memory_init_state=bytes(range(200)), size=40, src_offset=35, dst_offset=3
+        )
+        @example(
+            memory_init_state=bytes(range(200)), size=10, src_offset=36, dst_offset=4
+        )
+        @example(
+            memory_init_state=bytes(range(200)), size=64, src_offset=0, dst_offset=32
+        )
+        def test_should_copy_memory(
+            self, cairo_run, memory_init_state, size, src_offset, dst_offset
+        ):
+            memory_init_state = memory_init_state + bytes(
+                max(0, max(src_offset, dst_offset) + size - len(memory_init_state))
+            )
+            # Pad to a whole number of words, as after a memory expansion
+            memory_init_state += bytes(-len(memory_init_state) % 32)
+            memory = cairo_run(
+                "test__copy",
+                memory_init_state=memory_init_state,
+                size=size,
+                src_offset=src_offset,
+                dst_offset=dst_offset,
+            )
+            expected = bytearray(memory_init_state)
+            expected[dst_offset : dst_offset + size] = memory_init_state[
+                src_offset : src_offset + size
+            ]
+            assert bytes.fromhex(memory) == expected
+
+        # 32 KiB is in the range of the large payloads copied by contracts, e.g. proofs
+        @pytest.mark.parametrize("size", [32, 1024, 4096, 32_768])
+        def test_should_use_less_steps_than_load_n_store_n(self, cairo_run, size):
+            # ABI-like copy of a bytes payload between two 32-byte aligned offsets
+            kwargs = {
+                "memory_init_state": bytes(range(256)) * (2 * size // 256 + 1),
+                "size": size,
+                "src_offset": 32,
+                "dst_offset": size + 64,
+            }
+            copy = cairo_run("test__copy", **kwargs)
+            copy_steps = _resources_report[-1]["n_steps"]
+            load_n_store_n = cairo_run("test__load_n_store_n", **kwargs)
+            load_n_store_n_steps = _resources_report[-1]["n_steps"]
+
+            assert copy == load_n_store_n
+            assert copy_steps < load_n_store_n_steps
@@ -10,6 +10,7 @@ from starkware.cairo.common.dict_access import DictAccess
 from starkware.cairo.common.registers import get_fp_and_pc
 from starkware.starknet.common.syscalls import get_contract_address
 from starkware.cairo.common.memcpy import memcpy
+from starkware.cairo.common.bool import FALSE, TRUE
 
 from kakarot.model import model
 from backend.starknet import Starknet
@@ -69,6 +70,10 @@ func test__copy__should_return_new_state_with_same_attributes{
         tempvar state = new model.State(
             accounts_start=state.accounts_start,
             accounts=state.accounts,
+            owned_accounts_start=state.owned_accounts_start,
+            owned_accounts=state.owned_accounts,
+            valid_jumpdests_start=state.valid_jumpdests_start,
+            valid_jumpdests=state.valid_jumpdests,
             events_len=state.events_len,
             events=state.events,
             transfers_len=1,
@@ -104,6 +109,66 @@ func test__copy__should_return_new_state_with_same_attributes{
     return ();
 }
 
+func test__copy__should_not_mutate_parent_accounts{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr
+}() {
+    alloc_locals;
+    // Given
+    let state = State.init();
+    tempvar address = 'evm_address';
+    tempvar key = new Uint256(1, 2);
+    tempvar value = new Uint256(3, 4);
+    tempvar new_value = new Uint256(5, 6);
+    with state {
+        State.write_storage(address, key, value);
+        let state_copy = State.copy();
+    }
+
+    // When
+    State.write_storage{state=state_copy}(address, key, new_value);
+    State.write_transient_storage{state=state_copy}(address, key, new_value);
+    let value_copy = State.read_storage{state=state_copy}(address, key);
+
+    // Then
+    assert_uint256_eq([new_value], [value_copy]);
+    with state {
+        let value_parent = State.read_storage(address, key);
+        let transient_value_parent = State.read_transient_storage(address, key);
+        State.finalize();
+    }
+    assert_uint256_eq([value], [value_parent]);
+    assert_uint256_eq(Uint256(0, 0), [transient_value_parent]);
+    State.finalize{state=state_copy}();
+
+    return ();
+}
+
+func test__get_account_with_code__should_load_code_once{
+    syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr
+}() {
+    alloc_locals;
+    // Given
+    let state = State.init();
+
+    // When
+    with state {
+        let account = State.get_account(0xABDE1);
+        assert account.code_len = 3;
+        assert cast(account.code, felt) = 0;
+
+        let account = State.get_account_with_code(0xABDE1);
+        let account = State.get_account_with_code(0xABDE1);
+        let account = State.get_account(0xABDE1);
+    }
+
+    // Then
+    assert account.code_len = 3;
+    assert [account.code] = 0x60;
+    assert [account.code + 1] = 0x01;
+    assert [account.code + 2] = 0x00;
+    return ();
+}
+
 func test__is_account_alive__account_alive_in_state{
     pedersen_ptr: HashBuiltin*, syscall_ptr: felt*, range_check_ptr
 }() -> felt {
@@ -179,7 +244,16 @@ func test___copy_accounts__should_handle_null_pointers{range_check_ptr}() {
     let empty_address = 'empty address';
     dict_read{dict_ptr=accounts}(empty_address);
     let (local accounts_copy: DictAccess*) = default_dict_new(0);
-    Internals._copy_accounts{accounts=accounts_copy}(accounts_start, accounts);
+    let (owned_accounts) = default_dict_new(0);
+    Internals._copy_accounts{accounts=accounts_copy, owned_accounts=owned_accounts}(
+        accounts_start, accounts
+    );
+
+    // The copied accounts are owned, the null pointers are skipped
+    let (is_owned) = dict_read{dict_ptr=owned_accounts}(address.evm);
+    assert is_owned = TRUE;
+    let (is_owned) = dict_read{dict_ptr=owned_accounts}(empty_address);
+    assert is_owned = FALSE;
 
     let (pointer) = dict_read{dict_ptr=accounts_copy}(address.evm);
     tempvar existing_account = cast(pointer, model.Account*);
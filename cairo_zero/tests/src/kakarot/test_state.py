@@ -1,9 +1,12 @@
+from unittest.mock import call
+
 import pytest
 from eth_utils import keccak
 from ethereum.shanghai.transactions import (
     TX_ACCESS_LIST_ADDRESS_COST,
     TX_ACCESS_LIST_STORAGE_KEY_COST,
 )
+from starkware.starknet.public.abi import get_selector_from_name
 
 from tests.utils.constants import ALL_PRECOMPILES, TRANSACTIONS
 from tests.utils.helpers import flatten_tx_access_list, merge_access_list
@@ -20,6 +23,34 @@ class TestState:
         def test_should_return_new_state_with_same_attributes(self, cairo_run):
             cairo_run("test__copy__should_return_new_state_with_same_attributes")
 
+        @SyscallHandler.patch("IERC20.balanceOf", lambda *_: [0, 1])
+        def test_should_not_mutate_parent_accounts(self, cairo_run):
+            cairo_run("test__copy__should_not_mutate_parent_accounts")
+
+    class TestGetAccountWithCode:
+        @pytest.mark.record_syscalls
+        @SyscallHandler.patch("IERC20.balanceOf", lambda *_: [0, 1])
+        @SyscallHandler.patch("IAccount.get_nonce", lambda *_: [1])
+        @SyscallHandler.patch("Kakarot_evm_to_starknet_address", 0xABDE1, 0x1234)
+        @SyscallHandler.patch("IAccount.get_code_hash", lambda *_: [0x1, 0x1])
+        @SyscallHandler.patch("IAccount.bytecode_len", lambda *_: [3])
+        @SyscallHandler.patch("IAccount.bytecode", lambda *_: [3, 0x60, 0x01, 0x00])
+        def test_should_load_code_once(self, cairo_run):
+            cairo_run("test__get_account_with_code__should_load_code_once")
+            bytecode_calls = [
+                mock_call
+                for mock_call in SyscallHandler.mock_call.call_args_list
+                if mock_call.kwargs["function_selector"]
+                == get_selector_from_name("bytecode")
+            ]
+            assert bytecode_calls == [
+                call(
+                    contract_address=0x1234,
+                    function_selector=get_selector_from_name("bytecode"),
+                    calldata=[],
+                )
+            ]
+
     class TestIsAccountAlive:
         @pytest.mark.parametrize(
             "nonce, code, balance_low, expected_result",
@@ -44,7 +75,7 @@ class TestState:
             )
             assert is_alive == expected_result
 
-        @SyscallHandler.patch("IAccount.bytecode", lambda *_: [1, [0x2]])
+        @SyscallHandler.patch("IAccount.bytecode_len", lambda *_: [1])
         @SyscallHandler.patch("IERC20.balanceOf", lambda *_: [0, 1])
         @SyscallHandler.patch("IAccount.get_nonce", lambda *_: [1])
         @SyscallHandler.patch("Kakarot_evm_to_starknet_address", 0xABDE1, 0x1234)
@@ -6,6 +6,7 @@ from starkware.cairo.common.uint256 import Uint256, assert_uint256_eq
 from starkware.cairo.common.memset import memset
 from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.default_dict import default_dict_new
+from starkware.cairo.common.math import assert_nn
 
 from utils.utils import Helpers
 from utils.dict import dict_keys
@@ -229,3 +230,12 @@ func test__bytes_to_felt() -> felt {
     let res = Helpers.bytes_to_felt(len, ptr);
     return res;
 }
+
+func test__assert_nn_with_attr{range_check_ptr}() {
+    tempvar value;
+    %{ ids.value = program_input["value"] %}
+    with_attr error_message("value is negative") {
+        assert_nn(value);
+    }
+    return ();
+}
@@ -254,3 +254,11 @@ class TestBytesToFelt:
     def test_should_convert_bytes_to_felt_with_overflow(self, cairo_run, data):
         output = cairo_run("test__bytes_to_felt", data=list(data))
         assert output == int.from_bytes(data, byteorder="big") % DEFAULT_PRIME
+
+
+class TestNativeHints:
+    @pytest.mark.parametrize("value", [-1, DEFAULT_PRIME // 2])
+    def test_should_raise_with_attr_message_and_hint_message(self, cairo_run, value):
+        with cairo_error("value is negative") as e:
+            cairo_run("test__assert_nn_with_attr", value=value)
+        assert "is out of range" in str(e.value)
@@ -20,12 +20,24 @@ def pytest_addoption(parser):
         default=False,
         help="compute and dump TracerData for the VM runner: True or False",
     )
+    parser.addoption(
+        "--profile-evm",
+        action="store_true",
+        default=False,
+        help="dump the steps and builtins used by each EVM opcode executed by the interpreter, per opcode and per contract",
+    )
     parser.addoption(
         "--proof-mode",
         action="store_true",
         default=False,
         help="run the CairoRunner in proof mode: True or False",
     )
+    parser.addoption(
+        "--no-native-hints",
+        action="store_true",
+        default=False,
+        help="execute all the hints with the VM instead of their native implementations from tests.utils.hints",
+    )
     parser.addoption(
         "--layout",
         choices=list(LAYOUTS.keys()),
@@ -71,7 +83,11 @@ def seed(request, worker_id):
     random.seed(seed)
 
 
-pytest_plugins = ["tests.fixtures.starknet"]
+pytest_plugins = [
+    "tests.fixtures.starknet",
+    "tests.fixtures.ef_tests",
+    "tests.fixtures.scheduling",
+]
 
 settings.register_profile(
     "nightly",
@@ -1,7 +1,9 @@
 # %% Imports
 import logging
 import multiprocessing as mp
+import os
 import re
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
 from kakarot_scripts.constants import (
@@ -13,19 +15,43 @@ from kakarot_scripts.constants import (
 )
 from kakarot_scripts.utils.starknet import (
     compile_cairo_zero_contract,
-    compile_scarb_package,
+    compile_scarb_packages,
     compute_deployed_class_hash,
     dump_class_hashes,
+    get_artifact_hash,
+    get_class_hashes_metadata,
     locate_scarb_root,
 )
 
-mp.set_start_method("fork")
-
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def submit_class_hashes(pool, metadata, class_hashes, contract_names):
+    """
+    Compute the class hashes of the given contracts in the pool, or reuse the ones of
+    the last compilation when their artifact did not change.
+    """
+    for contract_name in contract_names:
+        if contract_name not in DECLARED_CONTRACTS:
+            continue
+
+        artifact_hash = get_artifact_hash(contract_name)
+        if metadata.get(contract_name, {}).get("artifact_hash") == artifact_hash:
+            class_hash = Future()
+            class_hash.set_result(metadata[contract_name]["class_hash"])
+        else:
+            logger.info(f"⏳ Computing class hash of {contract_name}")
+            class_hash = pool.submit(compute_deployed_class_hash, contract_name)
+        class_hashes[contract_name] = (artifact_hash, class_hash)
+
+
+def compile_and_hash(compile_fn, args, contract_names, *hash_args):
+    compile_fn(*args)
+    submit_class_hashes(*hash_args, contract_names)
+
+
 # %% Main
 def main():
     # %% Compile
@@ -35,6 +61,7 @@ def main():
     # Split contracts into Cairo 0 and Cairo 1 to avoid
     # re-compiling the same package multiple times.
     cairo0_contracts = []
+    cairo1_contracts = []
     cairo1_packages = set()
 
     for contract in COMPILED_CONTRACTS:
@@ -42,26 +69,58 @@ def main():
             re.sub("(?!^)([A-Z]+)", r"_\1", contract["contract_name"]).lower()
         )
         if contract_path.is_relative_to(CAIRO_DIR):
+            cairo1_contracts.append(contract["contract_name"])
             cairo1_packages.add(locate_scarb_root(contract_path))
         else:
             cairo0_contracts.append(contract)
 
-    with mp.Pool() as pool:
-        cairo0_task = pool.map_async(compile_cairo_zero_contract, cairo0_contracts)
-        cairo1_task = pool.map_async(compile_scarb_package, cairo1_packages)
+    # Class hashes are computed in processes as soon as each contract is compiled.
+    # The workers are forked upfront, before any compile thread is started.
+    metadata = get_class_hashes_metadata()
+    class_hashes = {}
+    hash_pool = ProcessPoolExecutor(mp_context=mp.get_context("fork"))
+    hash_pool.submit(int).result()
+    compiled = {contract["contract_name"] for contract in COMPILED_CONTRACTS}
+    submit_class_hashes(
+        hash_pool,
+        metadata,
+        class_hashes,
+        [name for name in DECLARED_CONTRACTS if name not in compiled],
+    )
 
+    # The compilers run as subprocesses: threads are enough to use all the cores.
+    # The scarb packages are built in a single thread, overlapped with the Cairo 0 ones.
+    hash_args = (hash_pool, metadata, class_hashes)
+    with hash_pool, ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        tasks = [
+            executor.submit(
+                compile_and_hash,
+                compile_scarb_packages,
+                (cairo1_packages, cairo1_contracts),
+                cairo1_contracts,
+                *hash_args,
+            ),
+            *[
+                executor.submit(
+                    compile_and_hash,
+                    compile_cairo_zero_contract,
+                    (contract,),
+                    [contract["contract_name"]],
+                    *hash_args,
+                )
+                for contract in cairo0_contracts
+            ],
+        ]
         try:
-            cairo0_task.wait()
-            cairo1_task.wait()
-            cairo0_task.get()
-            cairo1_task.get()
+            for task in tasks:
+                task.result()
+            dump_class_hashes(
+                {name: class_hashes[name][1].result() for name in DECLARED_CONTRACTS},
+                {name: class_hashes[name][0] for name in DECLARED_CONTRACTS},
+            )
         except Exception as e:
             logger.error(e)
             raise
-    logger.info("ℹ️  Computing deployed class hashes")
-    with mp.Pool() as pool:
-        class_hashes = pool.map(compute_deployed_class_hash, DECLARED_CONTRACTS)
-    dump_class_hashes(dict(zip(DECLARED_CONTRACTS, class_hashes)))
 
     logger.info(
         f"✅ Compiled all in {(datetime.now() - initial_time).total_seconds():.2f}s"
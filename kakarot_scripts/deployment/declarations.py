@@ -2,13 +2,13 @@
 from uvloop import run
 
 from kakarot_scripts.constants import DECLARED_CONTRACTS
-from kakarot_scripts.utils.starknet import declare, dump_declarations
+from kakarot_scripts.utils.starknet import declare_all, dump_declarations
 
 
 # %%
 async def declare_contracts():
     # %% Declare
-    class_hash = {contract: await declare(contract) for contract in DECLARED_CONTRACTS}
+    class_hash = await declare_all(DECLARED_CONTRACTS)
     dump_declarations(class_hash)
 
 
@@ -18,6 +18,7 @@ from kakarot_scripts.utils.starknet import (
     dump_deployments,
     execute_calls,
     get_declarations,
+    get_deployed_class_hash,
     get_deployments,
     get_starknet_account,
     invoke,
@@ -38,7 +39,7 @@ async def deploy_or_upgrade_kakarot(owner):
     # Deploy or upgrade Kakarot
     if starknet_deployments.get("kakarot") and NETWORK["type"] is not NetworkType.DEV:
         logger.info("ℹ️  Kakarot already deployed, checking version.")
-        deployed_class_hash = await RPC_CLIENT.get_class_hash_at(
+        deployed_class_hash = await get_deployed_class_hash(
             starknet_deployments["kakarot"]
         )
         if deployed_class_hash != class_hash["kakarot"]:
@@ -20,6 +20,7 @@ from kakarot_scripts.utils.starknet import (
     get_deployments,
     get_starknet_account,
     invoke,
+    prefetch_deployed_class_hashes,
     register_lazy_account,
     remove_lazy_account,
 )
@@ -39,6 +40,18 @@ async def deploy_starknet_contracts(account):
         return
 
     # %% Deployments
+    # Check all the deployed contracts, including kakarot, in a single request
+    await prefetch_deployed_class_hashes(
+        [
+            "EVM",
+            "Counter",
+            "MockPragmaOracle",
+            "MockPragmaSummaryStats",
+            "UniversalLibraryCaller",
+            "BenchmarkCairoCalls",
+            "kakarot",
+        ]
+    )
     starknet_deployments["EVM"] = await deploy_starknet(
         "EVM",
         account.address,
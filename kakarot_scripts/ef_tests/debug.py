@@ -7,13 +7,18 @@ import time
 from pathlib import Path
 
 import pyperclip
+import requests
 import rlp
 from dotenv import load_dotenv
 from eth.vm.forks.cancun.blocks import CancunBlock
 from web3 import Web3
 
 from kakarot_scripts.constants import BEACON_ROOT_ADDRESS
-from kakarot_scripts.ef_tests.fetch import EF_TESTS_PARSED_DIR
+from kakarot_scripts.ef_tests.fetch import (
+    EF_TESTS_INDEX,
+    EF_TESTS_PARSED_DIR,
+    get_index,
+)
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
@@ -27,6 +32,7 @@ if TEST_NAME is None:
     raise ValueError("Please set TEST_NAME")
 TEST_PARENT_FOLDER = os.getenv("TEST_PARENT_FOLDER", "")
 RPC_ENDPOINT = "http://127.0.0.1:8545"
+RPC_BATCH_SIZE = 1000
 
 
 class AnvilHandler:
@@ -61,13 +67,24 @@ class AnvilHandler:
 
 
 def get_test_file():
-    tests = [
-        file_name
-        for file_name in os.listdir(EF_TESTS_PARSED_DIR)
-        if TEST_NAME in file_name and TEST_PARENT_FOLDER in file_name
-    ]
+    tests = get_index()["tests"]
+    if not tests:
+        raise ValueError(
+            f"No EF tests index found at {EF_TESTS_INDEX}, please run `make fetch-ef-tests`"
+        )
 
-    if len(tests) == 0:
+    candidates = {
+        name: name.removeprefix(f"{Path(test['source']).parent.name}_")
+        for name, test in tests.items()
+        if TEST_PARENT_FOLDER in test["source"]
+    }
+    # Tests are indexed as <folder>_<EF test name>: an exact match of either takes
+    # precedence over the tests merely containing TEST_NAME
+    matches = [
+        name for name, ef_name in candidates.items() if TEST_NAME in (name, ef_name)
+    ] or [name for name in candidates if TEST_NAME in name]
+
+    if len(matches) == 0:
         if len(TEST_NAME) > 255:
             raise ValueError(
                 f"Test name '{TEST_NAME}' could not be parsed because it exceeds the maximum length of 255 characters."
@@ -75,7 +92,7 @@ def get_test_file():
         raise ValueError(
             f"Test '{TEST_NAME}' not found. Please ensure that you are using the valid EF-Test name, not the sanitized identifier used in the runner. If the test name is longer than 255 characters, it might be invalid."
         )
-    if len(tests) > 1:
+    if len(matches) > 1:
         if TEST_PARENT_FOLDER == "":
             raise ValueError(
                 f"Test {TEST_NAME} is ambiguous, please set TEST_PARENT_FOLDER to test file folder"
@@ -83,7 +100,7 @@ def get_test_file():
 
         raise ValueError(f"Test {TEST_NAME} not found")
 
-    return json.loads((EF_TESTS_PARSED_DIR / tests[0]).read_text())
+    return json.loads((EF_TESTS_PARSED_DIR / tests[matches[0]]["file"]).read_text())
 
 
 def connect_anvil():
@@ -93,16 +110,42 @@ def connect_anvil():
     return w3
 
 
-def set_pre_state(w3, data):
-    for address, account in data["pre"].items():
-        w3.provider.make_request("anvil_setCode", [address, account["code"]])
-        w3.provider.make_request("anvil_setBalance", [address, account["balance"]])
-        w3.provider.make_request("anvil_setNonce", [address, account["nonce"]])
-        for k, v in account["storage"].items():
-            w3.provider.make_request(
-                "anvil_setStorageAt",
-                [address, f"0x{int(k, 16):064x}", f"0x{int(v, 16):064x}"],
+def batch_requests(calls, batch_size=RPC_BATCH_SIZE):
+    """
+    Send (method, params) calls as JSON-RPC batches to the anvil endpoint.
+    """
+    calls = list(calls)
+    for start in range(0, len(calls), batch_size):
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(
+                calls[start : start + batch_size], start=start
             )
+        ]
+        response = requests.post(RPC_ENDPOINT, json=payload, timeout=60)
+        response.raise_for_status()
+        errors = [result for result in response.json() if "error" in result]
+        if errors:
+            raise ValueError(f"Batch request failed: {errors}")
+
+
+def set_pre_state(data):
+    batch_requests(
+        call
+        for address, account in data["pre"].items()
+        for call in [
+            ("anvil_setCode", [address, account["code"]]),
+            ("anvil_setBalance", [address, account["balance"]]),
+            ("anvil_setNonce", [address, account["nonce"]]),
+            *[
+                (
+                    "anvil_setStorageAt",
+                    [address, f"0x{int(k, 16):064x}", f"0x{int(v, 16):064x}"],
+                )
+                for k, v in account["storage"].items()
+            ],
+        ]
+    )
 
 
 def get_block(data):
@@ -163,7 +206,7 @@ def main():
     try:
         provider = connect_anvil()
         # Set test state
-        set_pre_state(provider, test)
+        set_pre_state(test)
         set_block(provider, test)
 
         # Send transactions
@@ -1,9 +1,9 @@
-import io
+import hashlib
 import json
 import logging
 import os
-import shutil
 import tarfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
 import requests
@@ -12,58 +12,169 @@ EF_TESTS_TAG = "v14.1.3-kkrt"
 EF_TESTS_URL = (
     f"https://github.com/kkrt-labs/tests/archive/refs/tags/{EF_TESTS_TAG}.tar.gz"
 )
-EF_TESTS_DIR = Path("tests") / "ef_tests" / "test_data" / EF_TESTS_TAG
 EF_TESTS_PARSED_DIR = Path("tests") / "ef_tests" / "test_data" / "parsed"
+EF_TESTS_INDEX = Path("tests") / "ef_tests" / "test_data" / "index.json"
 
 DEFAULT_NETWORK = "Cancun"
+GENERAL_STATE_TESTS = "BlockchainTests/GeneralStateTests"
+PYSPECS = f"{GENERAL_STATE_TESTS}/Pyspecs"
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def generate_tests():
-    if not EF_TESTS_DIR.exists():
-        response = requests.get(EF_TESTS_URL)
-        with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as tar:
-            tar.extractall(EF_TESTS_DIR)
-
-    test_cases = {
-        f"{os.path.basename(root)}_{name}": content
-        for (root, _, files) in os.walk(EF_TESTS_DIR)
-        for file in files
-        if file.endswith(".json")
-        and "BlockchainTests/GeneralStateTests" in root
-        and "Pyspecs" not in root
-        for name, content in json.loads((Path(root) / file).read_text()).items()
-        if content.get("network") == DEFAULT_NETWORK
+def get_index():
+    """
+    Load the index written by `generate_tests`.
+
+    The index has the following structure:
+    {
+        "tag": EF_TESTS_TAG,
+        "sources": {<fixture path in the suite>: {"sha256": str, "tests": [str]}},
+        "tests": {<test name>: {"file": str, "source": str}},
     }
+    """
+    try:
+        return json.loads(EF_TESTS_INDEX.read_text())
+    except FileNotFoundError:
+        return {"tag": None, "sources": {}, "tests": {}}
 
-    # Add tests from BlockchainTests/GeneralStateTests/Pyspecs
-    test_cases.update(
-        {
-            f"{name.split('::')[-1]}": content
-            for (root, _, files) in os.walk(EF_TESTS_DIR)
-            for file in files
-            if file.endswith(".json")
-            and "BlockchainTests/GeneralStateTests/Pyspecs" in root
-            for name, content in json.loads((Path(root) / file).read_text()).items()
-            if f"fork_{DEFAULT_NETWORK}" in name
-        }
-    )
 
-    shutil.rmtree(EF_TESTS_PARSED_DIR, ignore_errors=True)
-    EF_TESTS_PARSED_DIR.mkdir(parents=True, exist_ok=True)
+def dump_index(index):
+    EF_TESTS_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    with open(EF_TESTS_INDEX, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+
+
+def parse_fixture(source, content, output_dir=EF_TESTS_PARSED_DIR):
+    """
+    Filter the test cases of a single fixture file and write each of them to a
+    compact json file in output_dir.
+
+    Tests are named after their folder and their name in the fixture, only the last
+    part of the pyspecs names being kept.
+
+    Runs in a worker process: only the names of the written tests are sent back.
+    """
+    is_pyspec = PYSPECS in source
+    folder = Path(source).parent.name
+    tests = []
+    for name, test_case in json.loads(content).items():
+        if is_pyspec:
+            if f"fork_{DEFAULT_NETWORK}" not in name:
+                continue
+            name = name.split("::")[-1]
+        elif test_case.get("network") != DEFAULT_NETWORK:
+            continue
+        test_name = f"{folder}_{name}"
+        if test_name in tests:
+            logger.warning(f"Duplicate test {test_name} in {source}, keeping the last")
+            tests.remove(test_name)
 
-    for test_name, test_case in test_cases.items():
         try:
-            json.dump(
-                test_case,
-                open(EF_TESTS_PARSED_DIR / f"{test_name}.json", "w"),
-                indent=4,
-            )
+            with open(Path(output_dir) / f"{test_name}.json", "w") as f:
+                json.dump(test_case, f, separators=(",", ":"))
         except Exception as e:
-            print(e)
+            logger.error(f"Could not write {test_name}: {e}")
+            continue
+        tests.append(test_name)
+
+    return tests
+
+
+def iter_fixtures(url=EF_TESTS_URL):
+    """
+    Stream the fixture files of the GeneralStateTests from the tarball at url.
+
+    Members are read one by one straight from the http response: the archive is
+    never fully loaded in memory nor extracted on disk.
+
+    Yields (source, content) where source is the path of the file in the suite,
+    without the top level folder of the archive.
+    """
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith(".json"):
+                    continue
+                source = member.name.split("/", 1)[-1]
+                if not source.startswith(GENERAL_STATE_TESTS):
+                    continue
+                yield source, tar.extractfile(member).read()
+
+
+def generate_tests(max_workers=None, max_pending=None):
+    """
+    Fetch the EF tests and write the Cancun GeneralStateTests, one file per test,
+    in EF_TESTS_PARSED_DIR along with an index in EF_TESTS_INDEX.
+
+    The update is incremental: fixture files whose content did not change since
+    the previous run (possibly with another tag) are not parsed again, and the files
+    of EF_TESTS_PARSED_DIR not in the new index are removed.
+
+    The test files are named after the tests: when two fixture files write the same
+    test, a warning is logged and only the last one is kept in the index.
+    """
+    index = get_index()
+    if index["tag"] == EF_TESTS_TAG and EF_TESTS_PARSED_DIR.exists():
+        logger.info(f"EF tests {EF_TESTS_TAG} already up to date")
+        return
+
+    EF_TESTS_PARSED_DIR.mkdir(parents=True, exist_ok=True)
+    max_workers = max_workers or os.cpu_count()
+    # Bound the number of fixtures in flight to keep memory flat
+    max_pending = max_pending or 2 * max_workers
+
+    previous_sources = index["sources"]
+    sources = {}
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            source, sha256 = pending.pop(future)
+            sources[source] = {"sha256": sha256, "tests": future.result()}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for source, content in iter_fixtures():
+            sha256 = hashlib.sha256(content).hexdigest()
+            previous = previous_sources.pop(source, None)
+            if previous is not None and previous["sha256"] == sha256:
+                sources[source] = previous
+                continue
+
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(parse_fixture, source, content)] = (
+                source,
+                sha256,
+            )
+
+        collect(wait(pending).done)
+
+    tests = {}
+    for source, entry in sources.items():
+        for test_name in entry["tests"]:
+            if test_name in tests:
+                logger.warning(
+                    f"Test {test_name} written by both {tests[test_name]['source']} and {source}, keeping the last"
+                )
+            tests[test_name] = {"file": f"{test_name}.json", "source": source}
+
+    # Tests of the fixture files changed or removed since the previous run, and files
+    # written before the index existed
+    files = {test["file"] for test in tests.values()}
+    for path in EF_TESTS_PARSED_DIR.glob("*.json"):
+        if path.name not in files:
+            path.unlink()
+
+    dump_index({"tag": EF_TESTS_TAG, "sources": sources, "tests": tests})
+    logger.info(
+        f"EF tests {EF_TESTS_TAG}: {len(tests)} tests written to {EF_TESTS_PARSED_DIR}"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+# %% Imports
+import asyncio
+import json
+import logging
+import os
+
+from starknet_py.net.client_models import Call
+from starkware.starknet.public.abi import get_selector_from_name
+from uvloop import run
+
+from kakarot_scripts.constants import DEPLOYMENTS_DIR, RPC_CLIENT
+from kakarot_scripts.utils.fetch_outdated_eoas import iter_outdated_eoas
+from kakarot_scripts.utils.starknet import (
+    _multisig_account,
+    get_declarations,
+    get_deployments,
+    get_starknet_account,
+    send_invoke_v1,
+    sign_invoke_v1,
+    wait_for_transaction,
+)
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The multicalls are sized to use at most this share of the max steps
+STEPS_MARGIN = 0.8
+
+
+class Checkpoint:
+    """
+    Progress of an upgrade campaign, saved after each transaction so that an
+    interrupted campaign can be resumed. A checkpoint for another class hash is
+    discarded.
+    """
+
+    def __init__(self, path, class_hash):
+        self.path = path
+        self.class_hash = class_hash
+        state = json.loads(path.read_text()) if path.exists() else {}
+        if int(state.get("class_hash", "0x0"), 16) != class_hash:
+            state = {}
+        self.upgraded = {int(address, 16) for address in state.get("upgraded", [])}
+        self.failed = {int(address, 16) for address in state.get("failed", [])}
+        self.steps_per_call = state.get("steps_per_call")
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "class_hash": hex(self.class_hash),
+                    "steps_per_call": self.steps_per_call,
+                    "upgraded": [f"0x{address:040x}" for address in self.upgraded],
+                    "failed": [f"0x{address:040x}" for address in self.failed],
+                },
+                indent=2,
+            )
+        )
+        tmp_path.replace(self.path)
+
+
+class UpgradeCampaign:
+    """
+    Send the upgrade_account calls in multicall transactions, keeping up to
+    max_in_flight of them pending at once with locally sequenced nonces.
+
+    The size of the multicalls is derived from the steps used by the confirmed ones.
+    After a failed transaction, the pending ones are awaited and the nonce is fetched
+    again from the network, as they may have been rejected too. A failed multicall is
+    split in two halves to be retried, so that only the accounts whose upgrade fails
+    on their own are recorded as failed.
+
+    Multisig accounts are not supported: their transactions go through the multisig
+    API one at a time and cannot be pipelined.
+    """
+
+    def __init__(
+        self,
+        account,
+        kakarot_address,
+        checkpoint,
+        max_in_flight,
+        max_steps,
+        initial_batch_size,
+    ):
+        if _multisig_account[account.address]:
+            raise ValueError(
+                f"❌ Account 0x{account.address:064x} is a multisig, upgrade the "
+                "accounts with the multisig flow of execute_calls instead"
+            )
+        self.account = account
+        self.kakarot_address = kakarot_address
+        self.checkpoint = checkpoint
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_steps = max_steps
+        self.initial_batch_size = initial_batch_size
+        self.in_flight = set()
+        self.nonce = None
+        self.resync = False
+        self.retries = []
+
+    @property
+    def batch_size(self):
+        if not self.checkpoint.steps_per_call:
+            return self.initial_batch_size
+        return max(
+            1, int(self.max_steps * STEPS_MARGIN / self.checkpoint.steps_per_call)
+        )
+
+    async def drain(self):
+        await asyncio.gather(*self.in_flight)
+
+    def fail(self, evm_addresses):
+        self.resync = True
+        if len(evm_addresses) > 1:
+            half = len(evm_addresses) // 2
+            self.retries.extend([evm_addresses[:half], evm_addresses[half:]])
+        else:
+            self.checkpoint.failed.update(evm_addresses)
+
+    async def submit_retries(self):
+        while self.retries:
+            await self.submit(self.retries.pop())
+
+    async def submit(self, evm_addresses):
+        await self.semaphore.acquire()
+        if self.resync:
+            await self.drain()
+            self.nonce = None
+            self.resync = False
+        if self.nonce is None:
+            self.nonce = await self.account.get_nonce(block_number="pending")
+
+        calls = [
+            Call(
+                to_addr=self.kakarot_address,
+                selector=get_selector_from_name("upgrade_account"),
+                calldata=[evm_address, self.checkpoint.class_hash],
+            )
+            for evm_address in evm_addresses
+        ]
+        try:
+            transaction = await sign_invoke_v1(self.account, calls, self.nonce)
+            response = await send_invoke_v1(transaction)
+        except Exception as e:
+            logger.error(f"❌ Could not send upgrade of {len(calls)} accounts: {e}")
+            self.semaphore.release()
+            self.fail(evm_addresses)
+            self.checkpoint.save()
+            return
+
+        logger.info(
+            f"ℹ️  Upgrading {len(calls)} accounts with nonce {self.nonce}: 0x{response.transaction_hash:064x}"
+        )
+        self.nonce += 1
+        task = asyncio.create_task(
+            self.confirm(response.transaction_hash, evm_addresses)
+        )
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def confirm(self, tx_hash, evm_addresses):
+        # The task is only awaited when draining: errors are handled here so that a
+        # failed confirmation does not abort the campaign.
+        try:
+            status = await wait_for_transaction(tx_hash)
+            if status != "✅":
+                self.fail(evm_addresses)
+                return
+
+            receipt = await RPC_CLIENT._client.call(
+                method_name="getTransactionReceipt",
+                params={"transaction_hash": hex(tx_hash)},
+            )
+            steps = receipt.get("execution_resources", {}).get("steps")
+            if steps:
+                # Keep the most expensive call seen to stay under the limit
+                self.checkpoint.steps_per_call = max(
+                    self.checkpoint.steps_per_call or 0, steps / len(evm_addresses)
+                )
+            self.checkpoint.upgraded.update(evm_addresses)
+            self.checkpoint.failed.difference_update(evm_addresses)
+            logger.info(f"{status} {len(evm_addresses)} accounts upgraded")
+        except Exception as e:
+            logger.error(
+                f"❌ Could not confirm upgrade of {len(evm_addresses)} accounts in 0x{tx_hash:064x}: {e}"
+            )
+            self.fail(evm_addresses)
+        finally:
+            self.checkpoint.save()
+            self.semaphore.release()
+
+
+# %% Main
+async def main():
+    # %% Script constants
+    max_in_flight = int(os.getenv("UPGRADE_MAX_IN_FLIGHT", 8))
+    max_steps = int(os.getenv("UPGRADE_MAX_STEPS", 10_000_000))
+    initial_batch_size = 10
+    chunk_size = 1024
+
+    # %% Upgrade all the outdated EOAs to the declared account class
+    class_hash = get_declarations()["account_contract"]
+    checkpoint = Checkpoint(DEPLOYMENTS_DIR / "upgrade_accounts.json", class_hash)
+    if checkpoint.upgraded:
+        logger.info(
+            f"ℹ️  Resuming campaign, {len(checkpoint.upgraded)} accounts already upgraded"
+        )
+
+    # upgrade_account can only be called by the Kakarot owner
+    kakarot_address = get_deployments()["kakarot"]
+    campaign = UpgradeCampaign(
+        await get_starknet_account(),
+        kakarot_address,
+        checkpoint,
+        max_in_flight,
+        max_steps,
+        initial_batch_size,
+    )
+    pending = []
+    async for eoas in iter_outdated_eoas(
+        RPC_CLIENT, class_hash, chunk_size, address=kakarot_address
+    ):
+        pending.extend(
+            evm_address
+            for evm_address, _ in eoas
+            if evm_address not in checkpoint.upgraded
+        )
+        while len(pending) >= campaign.batch_size:
+            batch_size = campaign.batch_size
+            await campaign.submit(pending[:batch_size])
+            pending = pending[batch_size:]
+            await campaign.submit_retries()
+
+    while pending:
+        batch_size = campaign.batch_size
+        await campaign.submit(pending[:batch_size])
+        pending = pending[batch_size:]
+        await campaign.submit_retries()
+    await campaign.drain()
+    # The retried halves may fail and be split again
+    while campaign.retries:
+        await campaign.submit_retries()
+        await campaign.drain()
+
+    logger.info(
+        f"✅ {len(checkpoint.upgraded)} accounts upgraded, {len(checkpoint.failed)} failed"
+    )
+    if checkpoint.failed:
+        logger.info("ℹ️  Run the script again to retry the failed ones")
+
+
+# %% Run
+if __name__ == "__main__":
+    run(main())
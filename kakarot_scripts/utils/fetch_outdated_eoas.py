@@ -4,6 +4,8 @@ import json
 from starknet_py.net.full_node_client import FullNodeClient
 from starkware.starknet.public.abi import get_selector_from_name
 
+from kakarot_scripts.utils.starknet import batch_call
+
 node_url = (
     "https://juno-kakarot-dev.karnot.xyz/"  # update with priority RPC URL if required
 )
@@ -11,68 +13,86 @@ client = FullNodeClient(node_url=node_url)
 LATEST_CLASS_HASH = 0x1276D0B017701646F8646B69DE6C3B3584EDCE71879678A679F28C07A9971CF
 
 
-async def get_class_hash(address):
-    class_hash = await client.get_class_hash_at(address)
-    return address, class_hash
-
-
-async def get_storage(address):
-    storage = await client.get_storage_at(
-        address, get_selector_from_name("Account_bytecode_len")
-    )
-    return address, storage
-
-
-async def main():
-    evm_contract_deployed_events = (
-        await client.get_events(
+async def iter_deployed_accounts(client, chunk_size=1024, address=None):
+    """
+    Stream the (evm_address, starknet_address) of the deployed accounts by chunk,
+    optionally only the ones deployed by the given Kakarot address.
+    """
+    continuation_token = None
+    while True:
+        chunk = await client.get_events(
+            address=address,
             keys=[[get_selector_from_name("evm_contract_deployed")]],
-            chunk_size=10240,
+            continuation_token=continuation_token,
+            chunk_size=chunk_size,
         )
-    ).events
+        yield [(event.data[0], event.data[1]) for event in chunk.events]
+        continuation_token = chunk.continuation_token
+        if continuation_token is None:
+            return
+
+
+async def filter_outdated_eoas(client, accounts, latest_class_hash):
+    """
+    Return the given (evm_address, starknet_address) which are EOAs and whose class is
+    not latest_class_hash, using one batched request for the class hashes and one for
+    the bytecode lengths.
+    """
+    class_hashes = await batch_call(
+        client,
+        "starknet_getClassHashAt",
+        [
+            {"block_id": "pending", "contract_address": hex(starknet_address)}
+            for _, starknet_address in accounts
+        ],
+    )
+    outdated_accounts = [
+        account
+        for account, class_hash in zip(accounts, class_hashes)
+        if class_hash is not None and int(class_hash, 16) != latest_class_hash
+    ]
+
+    bytecode_lens = await batch_call(
+        client,
+        "starknet_getStorageAt",
+        [
+            {
+                "block_id": "pending",
+                "contract_address": hex(starknet_address),
+                "key": hex(get_selector_from_name("Account_bytecode_len")),
+            }
+            for _, starknet_address in outdated_accounts
+        ],
+    )
+    return [
+        account
+        for account, bytecode_len in zip(outdated_accounts, bytecode_lens)
+        if bytecode_len is not None and int(bytecode_len, 16) == 0
+    ]
 
-    evm_to_starknet = {
-        event.data[0]: event.data[1] for event in evm_contract_deployed_events
-    }
-    starknet_addresses = list(evm_to_starknet.values())
 
-    batch_size = 50
-    account_classes = {}
-    for i in range(0, len(starknet_addresses), batch_size):
-        batch = starknet_addresses[i : i + batch_size]
-        results = await asyncio.gather(
-            *[asyncio.create_task(get_class_hash(address)) for address in batch]
-        )
-        account_classes.update(dict(results))
-        print(
-            f"Processed batch {i // batch_size + 1} of {len(starknet_addresses) // batch_size + 1} for get_class_hash"
-        )
+async def iter_outdated_eoas(client, latest_class_hash, chunk_size=1024, address=None):
+    """
+    Stream the outdated EOAs by chunk of deployed accounts, optionally only the ones
+    deployed by the given Kakarot address.
+    """
+    async for accounts in iter_deployed_accounts(client, chunk_size, address):
+        yield await filter_outdated_eoas(client, accounts, latest_class_hash)
 
-    outdated_accounts = [
-        address
-        for address, class_hash in account_classes.items()
-        if class_hash != LATEST_CLASS_HASH
-    ]
 
-    eoa_accounts = []
-    for i in range(0, len(outdated_accounts), batch_size):
-        batch = outdated_accounts[i : i + batch_size]
-        results = await asyncio.gather(
-            *[asyncio.create_task(get_storage(address)) for address in batch]
-        )
-        eoa_accounts.extend(address for address, storage in results if storage == 0)
+async def main():
+    outdated_evm_classes = []
+    processed = 0
+    async for eoas in iter_outdated_eoas(client, LATEST_CLASS_HASH):
+        outdated_evm_classes.extend(f"0x{evm_address:040x}" for evm_address, _ in eoas)
+        processed += 1
         print(
-            f"Processed batch {i // batch_size + 1} of {len(outdated_accounts) // batch_size + 1} for get_storage"
+            f"Processed chunk {processed}, {len(outdated_evm_classes)} outdated EOAs found"
         )
 
-    outdated_evm_classes = [
-        f"0x{evm_address:040x}"
-        for evm_address, starknet_address in evm_to_starknet.items()
-        if starknet_address in eoa_accounts
-    ]
-
     with open("outdated_evm_classes.json", "w") as f:
         json.dump(outdated_evm_classes, f, indent=4)
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
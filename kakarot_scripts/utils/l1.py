@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+import time
 from types import MethodType
 from typing import Optional, cast
 
@@ -9,14 +11,19 @@ from eth_account.signers.local import LocalAccount
 from eth_typing import Address
 from eth_utils.address import to_checksum_address
 from hexbytes import HexBytes
-from web3 import Web3
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
 from web3._utils.abi import get_abi_output_types, map_abi_data
 from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
 from web3.contract import Contract as Web3Contract
 from web3.exceptions import NoABIFunctionsFound
 from web3.types import TxParams, Wei
 
-from kakarot_scripts.constants import DEPLOYMENTS_DIR, EVM_PRIVATE_KEY, L1_RPC_PROVIDER
+from kakarot_scripts.constants import (
+    DEPLOYMENTS_DIR,
+    EVM_PRIVATE_KEY,
+    L1_RPC_PROVIDER,
+    NETWORK,
+)
 from kakarot_scripts.utils.kakarot import (
     EvmTransactionError,
     _parse_events,
@@ -51,9 +58,9 @@ def get_l1_addresses():
         return {}
 
 
-def l1_contract_exists(address: HexBytes) -> bool:
+async def l1_contract_exists(address: HexBytes) -> bool:
     try:
-        code = L1_RPC_PROVIDER.eth.get_code(address)
+        code = await L1_CLIENT.provider.eth.get_code(address)
         if len(code) != 0:
             logger.info(f"ℹ️  Contract at address {address} already exists")
             return True
@@ -90,62 +97,184 @@ def get_l1_contract(
     return contract
 
 
-def prepare_l1_transaction(
+class L1Client:
+    """
+    Async L1 client for sending many transactions concurrently.
+
+    The chain id is fetched once and the gas price at most once every
+    gas_price_ttl seconds. The nonces are sequenced locally from the pending
+    transaction count.
+
+    The provider, whose http session is bound to an event loop, and the locks are
+    created lazily for each running event loop, so that the client can be used
+    across several asyncio.run calls.
+    """
+
+    def __init__(self, rpc_url: str, gas_price_ttl: float = 10):
+        self.rpc_url = rpc_url
+        self.gas_price_ttl = gas_price_ttl
+        self._chain_id = None
+        self._gas_price = None
+        self._gas_price_updated_at = 0.0
+        self._nonces = {}
+        self._loop = None
+        self._provider = None
+        self._nonce_lock = None
+        self._cache_lock = None
+
+    def _bind_to_running_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._provider = AsyncWeb3(AsyncHTTPProvider(self.rpc_url))
+        self._nonce_lock = asyncio.Lock()
+        self._cache_lock = asyncio.Lock()
+        # Transactions of a previous loop may still be pending
+        self._nonces = {}
+
+    @property
+    def provider(self) -> AsyncWeb3:
+        self._bind_to_running_loop()
+        return self._provider
+
+    async def chain_id(self) -> int:
+        self._bind_to_running_loop()
+        # Concurrent transactions wait for the first request instead of all sending it
+        async with self._cache_lock:
+            if self._chain_id is None:
+                self._chain_id = await self.provider.eth.chain_id
+        return self._chain_id
+
+    async def gas_price(self) -> Wei:
+        self._bind_to_running_loop()
+        async with self._cache_lock:
+            if (
+                self._gas_price is None
+                or time.monotonic() - self._gas_price_updated_at > self.gas_price_ttl
+            ):
+                self._gas_price = await self.provider.eth.gas_price
+                self._gas_price_updated_at = time.monotonic()
+        return self._gas_price
+
+    async def next_nonce(self, address) -> int:
+        self._bind_to_running_loop()
+        async with self._nonce_lock:
+            if address not in self._nonces:
+                self._nonces[address] = await self.provider.eth.get_transaction_count(
+                    address, "pending"
+                )
+            nonce = self._nonces[address]
+            self._nonces[address] += 1
+            return nonce
+
+    def reset_nonce(self, address, nonce: Optional[int] = None):
+        """
+        Fetch the nonce again from the network for the next transaction.
+
+        When the nonce of a failed transaction is given, the nonce is only reset if it is
+        the last one handed out. Otherwise, the transactions prepared with the higher
+        nonces stay stuck until a transaction is sent with the failed nonce, and fetching
+        it again would hand out these higher nonces twice.
+        """
+        if nonce is not None and self._nonces.get(address, nonce + 1) != nonce + 1:
+            logger.warning(
+                f"⚠️  Nonce {nonce} of {address} failed while higher nonces were already "
+                "handed out, their transactions are stuck until this nonce is used"
+            )
+            return
+        self._nonces.pop(address, None)
+
+    async def prepare_transaction(
+        self,
+        to: Optional[Address] = None,
+        data: bytes = b"",
+        value: Optional[Wei] = None,
+        caller_eoa: Optional[LocalAccount] = None,
+    ) -> TxParams:
+        evm_account = caller_eoa or EvmAccount.from_key(EVM_PRIVATE_KEY)
+        transaction: TxParams = {
+            "to": to_checksum_address(to) if to else "",
+            "value": value or Wei(0),
+            "data": data,
+            "from": evm_account.address,
+        }
+        gas, gas_price, chain_id = await asyncio.gather(
+            self.provider.eth.estimate_gas(transaction),
+            self.gas_price(),
+            self.chain_id(),
+        )
+        transaction["gas"] = gas
+        transaction["gasPrice"] = gas_price
+        transaction["chainId"] = chain_id
+        # The nonce is taken last so that a failed estimation does not leave a gap
+        transaction["nonce"] = await self.next_nonce(evm_account.address)
+
+        return transaction
+
+    async def send_transaction(
+        self,
+        transaction: TxParams,
+        caller_eoa: Optional[LocalAccount] = None,
+    ):
+        evm_account = caller_eoa or EvmAccount.from_key(EVM_PRIVATE_KEY)
+        evm_tx = self.provider.eth.account.sign_transaction(
+            transaction, evm_account.key
+        )
+        try:
+            tx_hash = await self.provider.eth.send_raw_transaction(
+                evm_tx.raw_transaction
+            )
+        except Exception:
+            self.reset_nonce(evm_account.address, transaction["nonce"])
+            raise
+        logger.info(f"⏳ Waiting for transaction {tx_hash}")
+        receipt = await self.provider.eth.wait_for_transaction_receipt(
+            tx_hash, timeout=5 * 60
+        )
+        response = []
+        if not receipt.status:
+            trace = await self.provider.manager.coro_request(
+                "debug_traceTransaction", [tx_hash, {"tracer": "callTracer"}]
+            )
+            response = trace["revertReason"].encode()
+
+        return receipt, response
+
+
+L1_CLIENT = L1Client(NETWORK["l1_rpc_url"])
+
+
+async def prepare_l1_transaction(
     to: Optional[Address] = None,
     data: bytes = b"",
     value: Optional[Wei] = None,
     caller_eoa: Optional[LocalAccount] = None,
 ):
     """Execute the data at the EVM contract on an L1 node."""
-    evm_account = caller_eoa or EvmAccount.from_key(EVM_PRIVATE_KEY)
-    transaction: TxParams = {
-        "to": to_checksum_address(to) if to else "",
-        "value": value or Wei(0),
-        "data": data,
-        "from": evm_account.address,
-    }
-    transaction["gas"] = L1_RPC_PROVIDER.eth.estimate_gas(transaction)
-    transaction["gasPrice"] = L1_RPC_PROVIDER.eth.gas_price
-    transaction["chainId"] = L1_RPC_PROVIDER.eth.chain_id
-    transaction["nonce"] = L1_RPC_PROVIDER.eth.get_transaction_count(
-        evm_account.address
-    )
-
-    return transaction
+    return await L1_CLIENT.prepare_transaction(to, data, value, caller_eoa)
 
 
-def send_l1_transaction(
+async def send_l1_transaction(
     transaction: TxParams,
     caller_eoa: Optional[LocalAccount] = None,
 ):
-    evm_account = caller_eoa or EvmAccount.from_key(EVM_PRIVATE_KEY)
-    evm_tx = L1_RPC_PROVIDER.eth.account.sign_transaction(transaction, evm_account.key)
-    tx_hash = L1_RPC_PROVIDER.eth.send_raw_transaction(evm_tx.raw_transaction)
-    logger.info(f"⏳ Waiting for transaction {tx_hash}")
-    receipt = L1_RPC_PROVIDER.eth.wait_for_transaction_receipt(tx_hash, timeout=5 * 60)
-    response = []
-    if not receipt.status:
-        trace = L1_RPC_PROVIDER.manager.request_blocking(
-            "debug_traceTransaction", [tx_hash, {"tracer": "callTracer"}]
-        )
-        response = trace["revertReason"].encode()
-
-    return receipt, response
+    return await L1_CLIENT.send_transaction(transaction, caller_eoa)
 
 
-def deploy_on_l1(
+async def deploy_on_l1(
     contract_app: str, contract_name: str, *args, **kwargs
 ) -> Web3Contract:
     logger.info(f"⏳ Deploying {contract_name}")
     caller_eoa = kwargs.pop("caller_eoa", None)
     contract = get_l1_contract(contract_app, contract_name)
     value = kwargs.pop("value", 0)
-    transaction = prepare_l1_transaction(
+    transaction = await prepare_l1_transaction(
         data=contract.constructor(*args, **kwargs).data_in_transaction,
         value=value,
         caller_eoa=caller_eoa,
     )
-    receipt, response = send_l1_transaction(transaction, caller_eoa)
+    receipt, response = await send_l1_transaction(transaction, caller_eoa)
     if receipt["status"] == 0:
         raise EvmTransactionError(bytes(response))
 
@@ -159,30 +288,38 @@ def deploy_on_l1(
 def _wrap_web3(fun: str, caller_eoa_: Optional[LocalAccount] = None):
     """Wrap a contract function call with the WEB3 provider."""
 
-    def _wrapper(self, *args, **kwargs):
+    async def _wrapper(self, *args, **kwargs):
         abi = self.get_function_by_name(fun).abi
         value = kwargs.pop("value", 0)
         calldata = self.get_function_by_name(fun)(
             *args, **kwargs
         )._encode_transaction_data()
         caller_eoa = kwargs.pop("caller_eoa", caller_eoa_)
-        transaction = prepare_l1_transaction(
-            to=self.address,
-            data=calldata,
-            value=value,
-            caller_eoa=caller_eoa,
-        )
 
         if abi["stateMutability"] in ["pure", "view"]:
-            # Setting gasPrice to 0 to avoid error due to sender balance to low
-            result = L1_RPC_PROVIDER.eth.call({**transaction, "gasPrice": 0})
+            # A call does not need the gas, gas price and nonce of a transaction
+            evm_account = caller_eoa or EvmAccount.from_key(EVM_PRIVATE_KEY)
+            result = await L1_CLIENT.provider.eth.call(
+                {
+                    "to": to_checksum_address(self.address),
+                    "data": calldata,
+                    "value": value,
+                    "from": evm_account.address,
+                }
+            )
             types = get_abi_output_types(abi)
             decoded = decode(types, bytes(result))
             normalized = map_abi_data(BASE_RETURN_NORMALIZERS, types, decoded)
             return normalized[0] if len(normalized) == 1 else normalized
 
+        transaction = await prepare_l1_transaction(
+            to=self.address,
+            data=calldata,
+            value=value,
+            caller_eoa=caller_eoa,
+        )
         logger.info(f"⏳ Executing {self.address}.{fun}")
-        receipt, response = send_l1_transaction(transaction, caller_eoa)
+        receipt, response = await send_l1_transaction(transaction, caller_eoa)
         if receipt["status"] == 0:
             logger.error(f"❌ {self.address}.{fun} failed")
             raise EvmTransactionError(bytes(response))
@@ -1,13 +1,15 @@
 import asyncio
 import functools
+import hashlib
 import json
 import logging
+import os
 import random
 import re
+import shutil
 import subprocess
 import time
 from collections import defaultdict, namedtuple
-from copy import deepcopy
 from datetime import datetime
 from functools import cache
 from typing import Iterable, List, Optional, Union, cast
@@ -36,6 +38,7 @@ from starknet_py.net.client_models import (
     SentTransactionResponse,
 )
 from starknet_py.net.full_node_client import _create_broadcasted_txn
+from starknet_py.net.http_client import HttpMethod
 from starknet_py.net.models.transaction import DeclareV1, InvokeV1
 from starknet_py.net.schemas.rpc import (
     DeclareTransactionResponseSchema,
@@ -232,21 +235,80 @@ async def fund_address(
         logger.info(f"💰 Balance of {hex(address)}: {balance / 1e18}")
 
 
-async def get_balance(address: Union[int, str], token_contract=None):
+async def get_balance(address: Union[int, str], token_contract=None, block_number=None):
     """
-    Get the ETH balance of a starknet address.
+    Get the ETH balance of a starknet address, optionally at a given block.
     """
     address = int(address, 16) if isinstance(address, str) else address
     eth_contract = token_contract or await get_eth_contract()
-    return (await eth_contract.functions["balanceOf"].call(address)).balance  # type: ignore
+    return (
+        await eth_contract.functions["balanceOf"].call(
+            address, block_number=block_number
+        )
+    ).balance  # type: ignore
+
 
+async def get_balances(
+    addresses: Iterable[Union[int, str]],
+    token_contract=None,
+    block_number=None,
+    max_concurrency=50,
+):
+    """
+    Get the ETH balances of many starknet addresses concurrently.
 
-def dump_class_hashes(class_hashes):
+    All the reads are pinned to the same block so that the returned balances are
+    consistent with each other; defaults to the latest block at call time.
+    """
+    eth_contract = token_contract or await get_eth_contract()
+    if block_number is None:
+        block_number = await RPC_CLIENT.get_block_number()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _get_balance(address):
+        async with semaphore:
+            return await get_balance(address, eth_contract, block_number)
+
+    return await asyncio.gather(*[_get_balance(address) for address in addresses])
+
+
+def dump_class_hashes(class_hashes, artifact_hashes=None):
     json.dump(
         {name: hex(class_hash) for name, class_hash in class_hashes.items()},
         open(BUILD_DIR / "class_hashes.json", "w"),
         indent=2,
     )
+    if artifact_hashes is not None:
+        json.dump(
+            {
+                name: {
+                    "artifact_hash": artifact_hashes[name],
+                    "class_hash": hex(class_hash),
+                }
+                for name, class_hash in class_hashes.items()
+            },
+            open(BUILD_DIR / "class_hashes_metadata.json", "w"),
+            indent=2,
+        )
+
+
+def get_class_hashes_metadata():
+    """
+    Return the class hashes computed by the last compilation, along with the hash of
+    the artifact they were computed from.
+    """
+    try:
+        return {
+            name: {
+                "artifact_hash": metadata["artifact_hash"],
+                "class_hash": int(metadata["class_hash"], 16),
+            }
+            for name, metadata in json.load(
+                open(BUILD_DIR / "class_hashes_metadata.json")
+            ).items()
+        }
+    except FileNotFoundError:
+        return {}
 
 
 def get_class_hashes():
@@ -256,49 +318,55 @@ def get_class_hashes():
     }
 
 
+# The deployments manifests are loaded once and kept in memory, the updates being
+# written through to disk.
+_manifests = {}
+
+
+def _load_manifest(file_name):
+    if file_name not in _manifests:
+        _manifests[file_name] = {
+            name: int(value, 16)
+            for name, value in json.load(open(DEPLOYMENTS_DIR / file_name)).items()
+        }
+    return _manifests[file_name]
+
+
+def _update_manifest(file_name, values):
+    _manifests[file_name] = dict(values)
+    # Written to a temporary file first so that a crash never leaves it truncated
+    tmp_path = (DEPLOYMENTS_DIR / file_name).with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({name: hex(value) for name, value in values.items()}, f, indent=2)
+    tmp_path.replace(DEPLOYMENTS_DIR / file_name)
+
+
 def dump_declarations(declarations):
-    json.dump(
-        {name: hex(class_hash) for name, class_hash in declarations.items()},
-        open(DEPLOYMENTS_DIR / "declarations.json", "w"),
-        indent=2,
-    )
+    _update_manifest("declarations.json", declarations)
 
 
 def get_declarations():
-    return {
-        name: int(class_hash, 16)
-        for name, class_hash in json.load(
-            open(DEPLOYMENTS_DIR / "declarations.json")
-        ).items()
-    }
+    return dict(_load_manifest("declarations.json"))
 
 
 def dump_deployments(deployments):
-    json.dump(
-        {name: hex(deployment) for name, deployment in deployments.items()},
-        open(DEPLOYMENTS_DIR / "deployments.json", "w"),
-        indent=2,
-    )
+    _update_manifest("deployments.json", deployments)
 
 
 def get_deployments():
     try:
-        return {
-            name: int(deployment, 16)
-            for name, deployment in json.load(
-                open(DEPLOYMENTS_DIR / "deployments.json", "r")
-            ).items()
-        }
+        return dict(_load_manifest("deployments.json"))
     except FileNotFoundError:
         return {}
 
 
 @cache
 def get_artifact(contract_name):
-    # Cairo 0 artifacts
-    artifacts = list(BUILD_DIR.glob(f"*{contract_name}*.json"))
-    if artifacts:
-        return Artifact(sierra=None, casm=artifacts[0])
+    # Cairo 0 artifacts, matched exactly as a name can be the prefix of another one,
+    # e.g. uninitialized_account and uninitialized_account_fixture
+    artifact = BUILD_DIR / f"{contract_name}.json"
+    if artifact.exists():
+        return Artifact(sierra=None, casm=artifact)
 
     # Cairo 1 artifacts
     artifacts = list(BUILD_DIR_SSJ.glob(f"**/*_{contract_name}.*.json")) or [
@@ -351,11 +419,28 @@ def locate_scarb_root(contract_path):
     return None
 
 
-def compile_scarb_package(package_path):
+def get_scarb_version(package_path):
+    tool_versions = package_path / ".tool-versions"
+    if tool_versions.exists():
+        for line in tool_versions.read_text().splitlines():
+            if line.startswith("scarb "):
+                return line.split()[1]
+    return "default"
+
+
+def compile_scarb_package(package_path, target_dir=None):
     logger.info(f"ℹ️  Compiling package {package_path}")
     start = datetime.now()
     output = subprocess.run(
-        "scarb build", shell=True, cwd=package_path, capture_output=True
+        "scarb build",
+        shell=True,
+        cwd=package_path,
+        capture_output=True,
+        env=(
+            {**os.environ, "SCARB_TARGET_DIR": str(target_dir.absolute())}
+            if target_dir is not None
+            else None
+        ),
     )
     if output.returncode != 0:
         raise RuntimeError(
@@ -366,6 +451,28 @@ def compile_scarb_package(package_path):
     logger.info(f"✅ {package_path} compiled in {elapsed.total_seconds():.2f}s")
 
 
+def compile_scarb_packages(package_paths, contract_names):
+    """
+    Build the scarb packages one after the other, sharing a target directory between
+    the packages pinned to the same scarb version, then copy the artifacts of the
+    given contracts to BUILD_DIR_SSJ.
+    """
+    target_dirs = set()
+    for package_path in sorted(package_paths):
+        target_dir = BUILD_DIR / "scarb" / get_scarb_version(package_path)
+        compile_scarb_package(package_path, target_dir=target_dir)
+        target_dirs.add(target_dir)
+
+    BUILD_DIR_SSJ.mkdir(exist_ok=True, parents=True)
+    for target_dir in target_dirs:
+        for artifact in (target_dir / "dev").glob("*.json"):
+            if any(
+                artifact.name.split(".")[0].endswith(f"_{contract_name}")
+                for contract_name in contract_names
+            ):
+                shutil.copy2(artifact, BUILD_DIR_SSJ / artifact.name)
+
+
 def compile_cairo_zero_contract(contract):
     logger.info(f"⏳ Compiling {contract['contract_name']}")
     start = datetime.now()
@@ -470,6 +577,14 @@ async def deploy_starknet_account(
     }
 
 
+def get_artifact_hash(contract_name):
+    """Hash of the artifact file the class hash is computed from."""
+    artifact = get_artifact.__wrapped__(contract_name)
+    return hashlib.sha256(
+        (artifact.sierra if artifact.sierra is not None else artifact.casm).read_bytes()
+    ).hexdigest()
+
+
 def compute_deployed_class_hash(contract_name):
     artifact = get_artifact.__wrapped__(contract_name)
 
@@ -481,24 +596,59 @@ def compute_deployed_class_hash(contract_name):
         contract_class = create_compiled_contract(
             compiled_contract=artifact.casm.read_text()
         )
-        return compute_class_hash(contract_class=deepcopy(contract_class))
+        # compute_class_hash already copies the class before altering it
+        return compute_class_hash(contract_class=contract_class)
 
 
-async def declare(contract_name):
-    logger.info(f"ℹ️  Declaring {contract_name}")
-    artifact = get_artifact(contract_name)
-    deployed_class_hash = get_class_hashes()[contract_name]
-    try:
-        await RPC_CLIENT.get_class_by_hash(deployed_class_hash)
-        logger.info("✅ Class already declared, skipping")
-        return deployed_class_hash
-    except Exception:
-        pass
+async def batch_call(client, method, params):
+    """
+    Send the same method with each of the given params in a single batched JSON-RPC
+    request, and return the results in the same order, None for the errors.
+    """
+    if not params:
+        return []
+
+    response = await client._client.request(
+        address=client.url,
+        http_method=HttpMethod.POST,
+        payload=[
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": param}
+            for i, param in enumerate(params)
+        ],
+    )
+    # A node not supporting batches answers with a single error object
+    if not isinstance(response, list):
+        raise ValueError(f"❌ Batched {method} request rejected: {response}")
+    results = [None] * len(params)
+    for result in response:
+        results[result["id"]] = result.get("result")
+    return results
 
-    account = await get_starknet_account()
-    if _multisig_account[account.address]:
-        account = await RelayerPool.get(account.address)
-    nonce = await get_nonce(account)
+
+async def get_declared_class_hashes(class_hashes):
+    """
+    Return the given class hashes which are already declared, using a single batched
+    JSON-RPC request.
+    """
+    class_hashes = list(class_hashes)
+    classes = await batch_call(
+        RPC_CLIENT,
+        "starknet_getClass",
+        [
+            {"block_id": "pending", "class_hash": hex(class_hash)}
+            for class_hash in class_hashes
+        ],
+    )
+    return {
+        class_hash
+        for class_hash, contract_class in zip(class_hashes, classes)
+        if contract_class is not None
+    }
+
+
+async def send_declare(contract_name, account, nonce):
+    """Sign and send the declaration of a contract, without waiting for it."""
+    artifact = get_artifact(contract_name)
 
     if artifact.sierra is not None:
         casm_compiled_contract = artifact.casm.read_text()
@@ -512,56 +662,148 @@ async def declare(contract_name):
             nonce=nonce,
         )
 
-        resp = await account.client.declare(transaction=declare_v2_transaction)
-    else:
-        contract_class = create_compiled_contract(
-            compiled_contract=artifact.casm.read_text()
-        )
+        return await account.client.declare(transaction=declare_v2_transaction)
 
-        tx_hash = compute_transaction_hash(
-            tx_hash_prefix=TransactionHashPrefix.DECLARE,
-            version=1,
-            contract_address=account.address,
-            entry_point_selector=DEFAULT_ENTRY_POINT_SELECTOR,
-            calldata=[deployed_class_hash],
-            max_fee=_max_fee,
-            chain_id=account.signer.chain_id.value,
-            additional_data=[nonce],
-        )
-        signature = message_signature(
-            msg_hash=tx_hash, priv_key=account.signer.private_key
-        )
-        transaction = DeclareV1(
-            contract_class=contract_class,
-            sender_address=account.address,
-            max_fee=_max_fee,
-            signature=signature,
-            nonce=nonce,
-            version=1,
-        )
-        params = _create_broadcasted_txn(transaction=transaction)
+    contract_class = create_compiled_contract(
+        compiled_contract=artifact.casm.read_text()
+    )
 
-        res = await RPC_CLIENT._client.call(
-            method_name="addDeclareTransaction",
-            params=[params],
-        )
-        resp = cast(
-            DeclareTransactionResponse,
-            DeclareTransactionResponseSchema().load(res, unknown=EXCLUDE),
+    tx_hash = compute_transaction_hash(
+        tx_hash_prefix=TransactionHashPrefix.DECLARE,
+        version=1,
+        contract_address=account.address,
+        entry_point_selector=DEFAULT_ENTRY_POINT_SELECTOR,
+        calldata=[get_class_hashes()[contract_name]],
+        max_fee=_max_fee,
+        chain_id=account.signer.chain_id.value,
+        additional_data=[nonce],
+    )
+    signature = message_signature(msg_hash=tx_hash, priv_key=account.signer.private_key)
+    transaction = DeclareV1(
+        contract_class=contract_class,
+        sender_address=account.address,
+        max_fee=_max_fee,
+        signature=signature,
+        nonce=nonce,
+        version=1,
+    )
+    params = _create_broadcasted_txn(transaction=transaction)
+
+    res = await RPC_CLIENT._client.call(
+        method_name="addDeclareTransaction",
+        params=[params],
+    )
+    return cast(
+        DeclareTransactionResponse,
+        DeclareTransactionResponseSchema().load(res, unknown=EXCLUDE),
+    )
+
+
+async def declare_all(contract_names):
+    """
+    Declare the given contracts, skipping the ones already declared.
+
+    The existing classes are checked in a single batched request. The missing ones
+    are sent back to back with locally sequenced nonces, and their receipts are
+    awaited concurrently.
+    """
+    class_hashes = get_class_hashes()
+    declared = await get_declared_class_hashes(
+        {class_hashes[contract_name] for contract_name in contract_names}
+    )
+    missing = []
+    for contract_name in contract_names:
+        if class_hashes[contract_name] in declared:
+            logger.info(f"✅ {contract_name} already declared, skipping")
+        else:
+            missing.append(contract_name)
+
+    if missing:
+        account = await get_starknet_account()
+        if _multisig_account[account.address]:
+            account = await RelayerPool.get(account.address)
+        nonce = await get_nonce(account)
+        # get_nonce waits for the network nonce, which the pending declarations would
+        # not match yet: the following nonces are sequenced locally, and the cached
+        # one is set to the next unused nonce even if a declaration fails to be sent.
+        responses = {}
+        try:
+            for contract_name in missing:
+                logger.info(f"ℹ️  Declaring {contract_name}")
+                responses[contract_name] = await send_declare(
+                    contract_name, account, nonce
+                )
+                nonce += 1
+        finally:
+            _nonces[account.address] = nonce
+
+        statuses = await asyncio.gather(
+            *[
+                wait_for_transaction(resp.transaction_hash, account)
+                for resp in responses.values()
+            ]
         )
-        deployed_class_hash = resp.class_hash
+        for (contract_name, resp), status in zip(responses.items(), statuses):
+            logger.info(f"{status} {contract_name} class hash: {hex(resp.class_hash)}")
+            class_hashes[contract_name] = resp.class_hash
+
+    return {
+        contract_name: class_hashes[contract_name] for contract_name in contract_names
+    }
 
-    status = await wait_for_transaction(resp.transaction_hash, account)
 
-    logger.info(f"{status} {contract_name} class hash: {hex(resp.class_hash)}")
-    return deployed_class_hash
+async def declare(contract_name):
+    return (await declare_all([contract_name]))[contract_name]
+
+
+# Class hashes of the deployed contracts, prefetched by prefetch_deployed_class_hashes
+_deployed_class_hashes = {}
+
+
+async def prefetch_deployed_class_hashes(contract_names):
+    """
+    Fetch the class hashes of the given deployed contracts using a single batched
+    JSON-RPC request, for deploy to check them without further request.
+    """
+    deployments = get_deployments()
+    addresses = [deployments[name] for name in contract_names if deployments.get(name)]
+    if not addresses:
+        return
+
+    class_hashes = await batch_call(
+        RPC_CLIENT,
+        "starknet_getClassHashAt",
+        [
+            {"block_id": "pending", "contract_address": hex(address)}
+            for address in addresses
+        ],
+    )
+    # Errors are not cached, get_deployed_class_hash will raise them again
+    _deployed_class_hashes.update(
+        {
+            address: int(class_hash, 16)
+            for address, class_hash in zip(addresses, class_hashes)
+            if class_hash is not None
+        }
+    )
+
+
+async def get_deployed_class_hash(address):
+    """
+    Return the class hash of a deployed contract, from the prefetched ones if any.
+
+    A prefetched value is used only once as the contract may be upgraded afterwards.
+    """
+    if address in _deployed_class_hashes:
+        return _deployed_class_hashes.pop(address)
+    return await RPC_CLIENT.get_class_hash_at(address)
 
 
 async def deploy(contract_name, *args):
     deployments = get_deployments()
     if deployments.get(contract_name):
         try:
-            deployed_class_hash = await RPC_CLIENT.get_class_hash_at(
+            deployed_class_hash = await get_deployed_class_hash(
                 deployments[contract_name]
             )
             latest_class_hash = get_declarations().get(contract_name)
@@ -619,14 +861,19 @@ def lazy_execute(execute):
 
 
 async def execute_calls():
+    """Send the calls logged by the lazy accounts and return the responses."""
     global _logs
-    for _account, _calls in _logs.items():
-        logger.info(
-            f"ℹ️  Executing {len(_calls)} calls with account 0x{_account.address:064x}"
-        )
-        await execute_v1.__wrapped__(_account, _calls)
-
-    _logs = defaultdict(list)
+    responses = []
+    try:
+        for _account, _calls in _logs.items():
+            logger.info(
+                f"ℹ️  Executing {len(_calls)} calls with account 0x{_account.address:064x}"
+            )
+            responses.append(await execute_v1.__wrapped__(_account, _calls))
+    finally:
+        # The calls of a failed send are dropped as well
+        _logs = defaultdict(list)
+    return responses
 
 
 async def get_nonce(account):
@@ -655,14 +902,13 @@ async def get_nonce(account):
     return nonce
 
 
-@lazy_execute
-async def execute_v1(account, calls):
+async def sign_invoke_v1(account, calls, nonce):
+    """Sign an invoke transaction with the given nonce, without sending it."""
     for call in calls:
         # Convert calldata to int (in case some boolean values are passed)
         call.calldata = [int(data) for data in call.calldata]
 
     calldata = _parse_calls(await account.cairo_version, calls)
-    nonce = await get_nonce(account)
     msg_hash = compute_transaction_hash(
         tx_hash_prefix=TransactionHashPrefix.INVOKE,
         version=1,
@@ -676,7 +922,7 @@ async def execute_v1(account, calls):
     signature = message_signature(
         msg_hash=msg_hash, priv_key=account.signer.private_key, seed=None
     )
-    transaction = InvokeV1(
+    return InvokeV1(
         version=1,
         signature=signature,
         nonce=nonce,
@@ -685,6 +931,26 @@ async def execute_v1(account, calls):
         calldata=calldata,
     )
 
+
+async def send_invoke_v1(transaction):
+    """Send a signed invoke transaction, without waiting for it."""
+    params = _create_broadcasted_txn(transaction=transaction)
+    return cast(
+        SentTransactionResponse,
+        SentTransactionSchema().load(
+            await RPC_CLIENT._client.call(
+                method_name="addInvokeTransaction",
+                params={"invoke_transaction": params},
+            )
+        ),
+    )
+
+
+@lazy_execute
+async def execute_v1(account, calls):
+    nonce = await get_nonce(account)
+    transaction = await sign_invoke_v1(account, calls, nonce)
+
     if _multisig_account[account.address]:
         data = {
             "creator": f"0x{account.signer.public_key:064x}",
@@ -701,7 +967,9 @@ async def execute_v1(account, calls):
                     for call in calls
                 ],
             },
-            "starknetSignature": dict(zip(["r", "s"], [hex(v) for v in signature])),
+            "starknetSignature": dict(
+                zip(["r", "s"], [hex(v) for v in transaction.signature])
+            ),
         }
         response = requests.post(
             f"{NETWORK['argent_multisig_api']}/0x{account.address:064x}/request",
@@ -742,17 +1010,7 @@ async def execute_v1(account, calls):
             "status": content["state"],
         }
 
-    params = _create_broadcasted_txn(transaction=transaction)
-    res = cast(
-        SentTransactionResponse,
-        SentTransactionSchema().load(
-            await RPC_CLIENT._client.call(
-                method_name="addInvokeTransaction",
-                params={"invoke_transaction": params},
-            )
-        ),
-    )
-
+    res = await send_invoke_v1(transaction)
     status = await wait_for_transaction(res.transaction_hash, account)
     logger.info(f"{status} 0x{res.transaction_hash:064x}")
     return res
@@ -3,14 +3,20 @@ import logging
 import os
 from asyncio import run
 
-import requests
-
 from kakarot_scripts.constants import ETH_TOKEN_ADDRESS, NETWORK, RPC_CLIENT
+from kakarot_scripts.utils.fetch_outdated_eoas import iter_deployed_accounts
 from kakarot_scripts.utils.starknet import (
+    batch_call,
+    execute_calls,
     get_balance,
+    get_balances,
     get_declarations,
     get_deployments,
+    get_starknet_account,
     invoke,
+    register_lazy_account,
+    remove_lazy_account,
+    wait_for_transaction,
 )
 
 logging.basicConfig()
@@ -18,68 +24,181 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-# %% Fetch contract events
-def get_contracts():
-    contract_address = hex(get_deployments()["kakarot"])
-    logger.info(f"ℹ️  Fetching contracts from {contract_address}")
-    url = f"{NETWORK['voyager_api_url']}/events?ps=10&p=1&contract={contract_address}"
-    headers = {
-        "accept": "application/json",
-        "x-api-key": os.getenv("VOYAGER_API_KEY"),
-    }
-    response = requests.get(url, headers=headers)
-    return [
-        {item["name"]: item["value"] for item in event["dataDecoded"]}
-        for event in response.json()["items"]
-        if event.get("name") == "evm_contract_deployed"
-    ]
+# The multicalls are sized to use at most this share of the max steps
+STEPS_MARGIN = 0.8
 
 
-# %% Main
-async def main():
-    # %% Withdraw all accounts
+class Withdrawal:
+    """
+    Send the balances of the accounts to the deployer.
 
-    contracts = get_contracts()
+    Each account is upgraded to BalanceSender, emptied and restored to its class, the
+    three calls being sent in multicall transactions. As restoring an account migrates
+    its jumpdests, the size of the multicalls is derived from the steps used by the
+    previous ones. A failed multicall is split in two halves to be retried, so that
+    only the accounts whose withdrawal fails on their own are recorded as failed.
+    """
 
-    balance_prev = await get_balance(NETWORK["account_address"])
-    logger.info(f"ℹ️  Current deployer balance {balance_prev / 1e18} ETH")
-    for contract in contracts:
-        balance = await get_balance(contract["starknet_contract_address"])
-        if balance == 0:
-            logger.info(
-                f"ℹ️  No balance to withdraw from EVM contract {contract['evm_contract_address']}"
+    def __init__(self, account, max_steps, initial_batch_size):
+        self.account = account
+        self.max_steps = max_steps
+        self.initial_batch_size = initial_batch_size
+        self.steps_per_account = None
+        self.withdrawn = 0
+        self.failed = []
+
+    @property
+    def batch_size(self):
+        if not self.steps_per_account:
+            return self.initial_batch_size
+        return max(1, int(self.max_steps * STEPS_MARGIN / self.steps_per_account))
+
+    async def execute(self, batch_len):
+        """Send the logged calls and return whether all the transactions succeeded."""
+        try:
+            responses = await execute_calls()
+        except Exception as e:
+            logger.error(f"❌ Could not send withdrawal of {batch_len} accounts: {e}")
+            return False
+
+        success = True
+        for response in responses:
+            if isinstance(response, dict):
+                tx_hash = int(response["transaction_hash"], 16)
+                status = "✅" if response["status"] == "TX_ACCEPTED_L2" else "❌"
+            else:
+                tx_hash = response.transaction_hash
+                status = await wait_for_transaction(tx_hash)
+            if status != "✅":
+                success = False
+                continue
+
+            receipt = await RPC_CLIENT._client.call(
+                method_name="getTransactionReceipt",
+                params={"transaction_hash": hex(tx_hash)},
             )
-            continue
+            steps = receipt.get("execution_resources", {}).get("steps")
+            if steps:
+                # Keep the most expensive account seen to stay under the limit
+                self.steps_per_account = max(
+                    self.steps_per_account or 0, steps / batch_len
+                )
+        return success
 
-        logger.info(
-            f"ℹ️  Withdrawing {balance / 1e18} ETH from EVM contract {contract['evm_contract_address']}"
-        )
-        current_class = await RPC_CLIENT.get_class_hash_at(
-            contract["starknet_contract_address"]
-        )
-        await invoke(
-            "kakarot",
-            "upgrade_account",
-            int(contract["evm_contract_address"], 16),
-            get_declarations()["BalanceSender"],
-        )
-        await invoke(
-            "BalanceSender",
-            "send_balance",
-            ETH_TOKEN_ADDRESS,
-            int(NETWORK["account_address"], 16),
-            address=int(contract["starknet_contract_address"], 16),
+    async def send(self, batch):
+        """
+        Withdraw the balances of the given (evm_address, starknet_address, balance,
+        class_hash) in a single multicall, splitting it in two halves on failure.
+        """
+        for evm_address, starknet_address, _, class_hash in batch:
+            await invoke(
+                "kakarot",
+                "upgrade_account",
+                evm_address,
+                get_declarations()["BalanceSender"],
+            )
+            await invoke(
+                "BalanceSender",
+                "send_balance",
+                ETH_TOKEN_ADDRESS,
+                int(NETWORK["account_address"], 16),
+                address=starknet_address,
+            )
+            await invoke("kakarot", "upgrade_account", evm_address, class_hash)
+
+        if await self.execute(len(batch)):
+            self.withdrawn += sum(balance for _, _, balance, _ in batch)
+            return
+
+        if len(batch) == 1:
+            evm_address, _, balance, _ = batch[0]
+            logger.error(
+                f"❌ Could not withdraw {balance / 1e18} ETH from EVM contract 0x{evm_address:040x}"
+            )
+            self.failed.append(evm_address)
+            return
+
+        half = len(batch) // 2
+        await self.send(batch[:half])
+        await self.send(batch[half:])
+
+    async def withdraw(self, accounts):
+        """Withdraw the balances of the given (evm_address, starknet_address)."""
+        balances = await get_balances(
+            [starknet_address for _, starknet_address in accounts]
         )
-        await invoke(
-            "kakarot",
-            "upgrade_account",
-            int(contract["evm_contract_address"], 16),
-            current_class,
+        accounts = [
+            (evm_address, starknet_address, balance)
+            for (evm_address, starknet_address), balance in zip(accounts, balances)
+            if balance > 0
+        ]
+        if not accounts:
+            return
+
+        class_hashes = await batch_call(
+            RPC_CLIENT,
+            "starknet_getClassHashAt",
+            [
+                {"block_id": "pending", "contract_address": hex(starknet_address)}
+                for _, starknet_address, _ in accounts
+            ],
         )
+
+        register_lazy_account(self.account.address)
+        try:
+            batch = []
+            for (evm_address, starknet_address, balance), class_hash in zip(
+                accounts, class_hashes
+            ):
+                if class_hash is None:
+                    logger.warning(
+                        f"⚠️  Unknown class for EVM contract 0x{evm_address:040x}, skipping"
+                    )
+                    continue
+
+                logger.info(
+                    f"ℹ️  Withdrawing {balance / 1e18} ETH from EVM contract 0x{evm_address:040x}"
+                )
+                batch.append(
+                    (evm_address, starknet_address, balance, int(class_hash, 16))
+                )
+                if len(batch) >= self.batch_size:
+                    await self.send(batch)
+                    batch = []
+            if batch:
+                await self.send(batch)
+        finally:
+            remove_lazy_account(self.account.address)
+
+
+# %% Main
+async def main():
+    # %% Script constants
+    chunk_size = 1024
+    max_steps = int(os.getenv("WITHDRAW_MAX_STEPS", 10_000_000))
+    initial_batch_size = 10
+
+    # %% Withdraw all accounts
+    balance_prev = await get_balance(NETWORK["account_address"])
+    logger.info(f"ℹ️  Current deployer balance {balance_prev / 1e18} ETH")
+
+    # upgrade_account can only be called by the Kakarot owner
+    withdrawal = Withdrawal(await get_starknet_account(), max_steps, initial_batch_size)
+    async for accounts in iter_deployed_accounts(
+        RPC_CLIENT, chunk_size, address=get_deployments()["kakarot"]
+    ):
+        logger.info(f"ℹ️  Checking the balances of {len(accounts)} EVM contracts")
+        await withdrawal.withdraw(accounts)
+
     balance = await get_balance(NETWORK["account_address"])
     logger.info(
-        f"ℹ️  Current deployer balance {balance / 1e18} ETH: {(balance - balance_prev) / 1e18} ETH recovered"
+        f"ℹ️  Current deployer balance {balance / 1e18} ETH: {(balance - balance_prev) / 1e18} ETH recovered out of {withdrawal.withdrawn / 1e18} ETH"
     )
+    if withdrawal.failed:
+        logger.warning(
+            f"⚠️  {len(withdrawal.failed)} accounts could not be withdrawn: "
+            + ", ".join(f"0x{evm_address:040x}" for evm_address in withdrawal.failed)
+        )
 
 
 # %% Run
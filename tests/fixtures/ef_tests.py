@@ -0,0 +1,220 @@
+"""
+Pytest plugin running the EF BlockchainTests/GeneralStateTests, as parsed by
+kakarot_scripts.ef_tests.fetch, in-process against the Cairo Zero Kakarot program.
+
+Any test requesting the `ef_blockchain_test` argument is parametrized with the path
+of each parsed test. Tests listed in blockchain-tests-skip.yml are marked as skipped,
+and the steps and builtins used by each test are recorded to a csv file that is also
+used to order the tests, heaviest first, for the next runs. With --weighted-dist,
+these estimated steps also weight the tests without history on the xdist workers.
+"""
+
+import logging
+import re
+from functools import cache, partial
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+
+from kakarot_scripts.ef_tests.fetch import EF_TESTS_PARSED_DIR, PYSPECS, get_index
+from tests.fixtures.scheduling import ESTIMATED_STEPS
+from tests.utils.reporting import on_xdist_controller
+
+EF_TESTS_SKIP_FILE = Path("blockchain-tests-skip.yml")
+
+logger = logging.getLogger()
+
+_resources = []
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--ef-tests",
+        action="store",
+        default=None,
+        help="Regex filtering the names of the EF tests to run, default to all the parsed tests.",
+    )
+    parser.addoption(
+        "--ef-tests-resources",
+        action="store",
+        default="resources/resources.csv",
+        help="The csv file where the steps and builtins used by each EF test are recorded.",
+    )
+
+
+def format_into_identifier(name: str) -> str:
+    """
+    Format a test name as the ef-tests runner does, i.e. as in the skip file.
+    """
+    for char, replacement in {
+        "-": "_minus_",
+        "+": "_plus_",
+        "^": "_xor_",
+        "[": "__",
+        "]": "",
+        "(": "_lpar_",
+        ")": "_rpar_",
+        ",": "_",
+        ".": "_",
+        " ": "_",
+    }.items():
+        name = name.replace(char, replacement)
+    return name.removeprefix("test_")
+
+
+@cache
+def get_skip_list():
+    skip_list = yaml.safe_load(EF_TESTS_SKIP_FILE.read_text())
+    return {
+        key: skip_list.get(key) or {}
+        for key in ["directories", "filename", "testname", "regex"]
+    }
+
+
+def should_skip(test_name: str, source: str) -> bool:
+    skip_list = get_skip_list()
+    folder = Path(source).parent.name
+    if folder in skip_list["directories"]:
+        return True
+
+    if Path(source).name in (skip_list["filename"].get(folder) or []):
+        return True
+
+    name = test_name.removeprefix(f"{folder}_")
+    if PYSPECS in source:
+        name = format_into_identifier(name)
+    if name in (skip_list["testname"].get(folder) or []):
+        return True
+
+    return any(
+        re.match(pattern, name) for pattern in skip_list["regex"].get(folder) or []
+    )
+
+
+@cache
+def get_estimated_steps(resources_file: Path) -> dict:
+    """
+    Estimate the steps of each indexed test from the previous runs, or from the size
+    of its parsed file (scaled with the average steps per byte of the known tests).
+
+    Tests whose parsed file is missing are left out.
+    """
+    known = (
+        pd.read_csv(resources_file).set_index("test").n_steps.to_dict()
+        if resources_file.exists()
+        else {}
+    )
+    sizes = {}
+    for name, test in get_index()["tests"].items():
+        try:
+            sizes[name] = (EF_TESTS_PARSED_DIR / test["file"]).stat().st_size
+        except FileNotFoundError:
+            continue
+    steps_per_byte = (
+        sum(known[name] for name in sizes if name in known)
+        / sum(sizes[name] for name in sizes if name in known)
+        if any(name in known for name in sizes)
+        else 1
+    )
+    return {
+        name: known.get(name, size * steps_per_byte) for name, size in sizes.items()
+    }
+
+
+def estimate_test_steps(config, nodeid):
+    """
+    Return the estimated steps of an EF test given its node id, None for the other
+    tests. Used by the xdist scheduler to weight the tests without history.
+    """
+    match = re.search(r"::test_case\[(.+)\]$", nodeid)
+    if match is None:
+        return None
+    resources_file = Path(config.getoption("ef_tests_resources"))
+    return get_estimated_steps(resources_file).get(match.group(1))
+
+
+def pytest_configure(config):
+    config.stash[ESTIMATED_STEPS] = partial(estimate_test_steps, config)
+
+
+def get_skip_reason(name, test):
+    if not (EF_TESTS_PARSED_DIR / test["file"]).exists():
+        return f"Missing parsed file {test['file']}, run `make fetch-ef-tests`"
+    if should_skip(name, test["source"]):
+        return f"Skipped in {EF_TESTS_SKIP_FILE}"
+    return None
+
+
+def pytest_generate_tests(metafunc):
+    if "ef_blockchain_test" not in metafunc.fixturenames:
+        return
+
+    tests = get_index()["tests"]
+    pattern = metafunc.config.getoption("ef_tests")
+    if pattern is not None:
+        tests = {name: test for name, test in tests.items() if re.search(pattern, name)}
+    steps = get_estimated_steps(Path(metafunc.config.getoption("ef_tests_resources")))
+    skip_reasons = {name: get_skip_reason(name, test) for name, test in tests.items()}
+
+    # Heaviest tests first so that they don't end up together at the end of the run
+    metafunc.parametrize(
+        "ef_blockchain_test",
+        [
+            pytest.param(
+                EF_TESTS_PARSED_DIR / tests[name]["file"],
+                id=name,
+                marks=(
+                    [pytest.mark.skip(reason=skip_reasons[name])]
+                    if skip_reasons[name] is not None
+                    else []
+                ),
+            )
+            for name in sorted(tests, key=lambda name: -steps.get(name, 0))
+        ],
+    )
+
+
+def pytest_runtest_setup(item):
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None and "ef_blockchain_test" in callspec.params:
+        item.user_properties.append(
+            ("ef_test", Path(callspec.params["ef_blockchain_test"]).stem)
+        )
+
+
+def pytest_runtest_logreport(report):
+    if report.when != "call":
+        return
+
+    properties = dict(report.user_properties)
+    if "ef_test" not in properties or "resources" not in properties:
+        return
+
+    _resources.append(
+        {
+            "test": properties["ef_test"],
+            "passed": report.passed,
+            "duration": report.duration,
+            **properties["resources"],
+        }
+    )
+
+
+@on_xdist_controller
+def pytest_sessionfinish(session):
+    if not _resources:
+        return
+
+    resources_file = Path(session.config.getoption("ef_tests_resources"))
+    resources_file.parent.mkdir(parents=True, exist_ok=True)
+    resources = pd.DataFrame(_resources)
+    if resources_file.exists():
+        previous = pd.read_csv(resources_file)
+        resources = pd.concat(
+            [previous.loc[~previous.test.isin(resources.test)], resources],
+            ignore_index=True,
+        )
+    resources.sort_values("test").to_csv(resources_file, index=False)
+    logger.info(f"EF tests resources written to {resources_file}")
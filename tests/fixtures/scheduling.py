@@ -0,0 +1,160 @@
+"""
+Pytest plugin recording the duration and steps of each test in the pytest cache, and
+scheduling the tests on the xdist workers using this history.
+
+With --weighted-dist, the tests with a known duration are assigned up-front to the
+workers by longest-processing-time-first: the heaviest test is given to the least
+loaded worker, and so on. Tests without history are weighted by their estimated
+steps when a plugin provides them, see ESTIMATED_STEPS, and scheduled dynamically
+as for the default `--dist load` otherwise.
+"""
+
+import heapq
+import logging
+from collections import defaultdict
+from typing import Callable, Optional
+
+import pytest
+from xdist.scheduler import LoadScheduling
+
+from tests.utils.reporting import on_xdist_controller
+
+HISTORY_KEY = "kakarot/tests_history"
+# Stash key of a callable returning the estimated steps of a test given its node id,
+# or None if unknown
+ESTIMATED_STEPS = pytest.StashKey[Callable[[str], Optional[float]]]()
+
+logger = logging.getLogger()
+
+_history = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--weighted-dist",
+        action="store_true",
+        default=False,
+        help="schedule the tests on the xdist workers by longest duration first, using the durations recorded in the previous runs",
+    )
+
+
+class WeightedScheduling(LoadScheduling):
+    """
+    Load scheduling with an initial longest-processing-time-first distribution of
+    the tests for which a weight is known, or can be estimated with estimate.
+    """
+
+    def __init__(self, config, log=None, weights=None, estimate=None):
+        super().__init__(config, log)
+        self.weights = weights or {}
+        self.estimate = estimate
+
+    def schedule(self):
+        assert self.collection_is_completed
+
+        if self.collection is not None:
+            return super().schedule()
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = list(self.node2collection.values())[0]
+        if not self.collection:
+            return
+
+        if self.maxschedchunk is None:
+            self.maxschedchunk = len(self.collection)
+
+        if self.estimate is not None:
+            for nodeid in self.collection:
+                if nodeid not in self.weights:
+                    weight = self.estimate(nodeid)
+                    if weight is not None:
+                        self.weights[nodeid] = weight
+
+        known = [
+            index
+            for index, nodeid in enumerate(self.collection)
+            if nodeid in self.weights
+        ]
+        self.pending[:] = [
+            index
+            for index, nodeid in enumerate(self.collection)
+            if nodeid not in self.weights
+        ]
+
+        loads = [(0, i, node) for i, node in enumerate(self.nodes)]
+        assignments = defaultdict(list)
+        for index in sorted(known, key=lambda i: -self.weights[self.collection[i]]):
+            load, i, node = heapq.heappop(loads)
+            assignments[node].append(index)
+            heapq.heappush(
+                loads, (load + self.weights[self.collection[index]], i, node)
+            )
+
+        for node, indices in assignments.items():
+            self.node2pending[node].extend(indices)
+            node.send_runtest_some(indices)
+
+        # Dispatch the tests without history, or shut down the nodes if none
+        for node in self.nodes:
+            self.check_schedule(node)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    if not config.getoption("weighted_dist") or not hasattr(config, "cache"):
+        return None
+
+    history = config.cache.get(HISTORY_KEY, {})
+    estimate_steps = config.stash.get(ESTIMATED_STEPS, None)
+    if not history and estimate_steps is None:
+        logger.info("No tests history found, using default load scheduling")
+        return None
+
+    # The estimated steps are converted to durations with the average duration per
+    # step of the tests with history, and used as is without history.
+    timed = [test for test in history.values() if test.get("n_steps")]
+    estimate = None
+    if estimate_steps is not None and (timed or not history):
+        seconds_per_step = (
+            sum(test["duration"] for test in timed)
+            / sum(test["n_steps"] for test in timed)
+            if timed
+            else 1
+        )
+
+        def estimate(nodeid):
+            steps = estimate_steps(nodeid)
+            return steps * seconds_per_step if steps is not None else None
+
+    return WeightedScheduling(
+        config,
+        log,
+        weights={nodeid: test["duration"] for nodeid, test in history.items()},
+        estimate=estimate,
+    )
+
+
+def pytest_runtest_logreport(report):
+    if report.when != "call" or not report.passed:
+        return
+
+    _history[report.nodeid] = {
+        "duration": report.duration,
+        "n_steps": dict(report.user_properties).get("resources", {}).get("n_steps"),
+    }
+
+
+@on_xdist_controller
+def pytest_sessionfinish(session):
+    if not _history:
+        return
+    # The cache is not available when running with -p no:cacheprovider
+    if not hasattr(session.config, "cache"):
+        return
+
+    history = session.config.cache.get(HISTORY_KEY, {})
+    history.update(_history)
+    session.config.cache.set(HISTORY_KEY, history)
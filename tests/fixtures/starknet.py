@@ -24,8 +24,13 @@ from starkware.starknet.compiler.starknet_pass_manager import starknet_pass_mana
 
 from tests.utils.constants import Opcodes
 from tests.utils.coverage import VmWithCoverage
-from tests.utils.hints import debug_info
-from tests.utils.reporting import profile_from_tracer_data
+from tests.utils.hints import VmWithNativeHints, debug_info
+from tests.utils.reporting import (
+    _resources_report,
+    dump_evm_profile,
+    evm_profile_from_tracer_data,
+    profile_from_tracer_data,
+)
 from tests.utils.serde import Serde
 from tests.utils.syscall_handler import SyscallHandler
 
@@ -37,6 +42,41 @@ logging.getLogger("asyncio").setLevel(logging.INFO)
 logger = logging.getLogger()
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """
+    Sum the resources of all the cairo runs of a test into its user_properties.
+
+    user_properties are sent along with the test reports, so that they are also
+    available in the controller process when running with xdist.
+    """
+    _resources_report.clear()
+    yield
+    if not _resources_report:
+        return
+
+    resources = {}
+    for run in _resources_report:
+        for key, value in run.items():
+            if key != "entrypoint":
+                resources[key] = resources.get(key, 0) + value
+    item.user_properties.append(("resources", resources))
+    _resources_report.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_syscall_handler(request):
+    """
+    Reset the SyscallHandler mocks before each test; the syscalls are only recorded
+    in the mocks for the tests marked with record_syscalls.
+    """
+    SyscallHandler.reset_mocks(
+        record_calls=request.node.get_closest_marker("record_syscalls") is not None
+    )
+    yield
+    SyscallHandler.reset_mocks()
+
+
 def cairo_compile(path):
     module_reader = get_module_reader(cairo_path=["cairo_zero"])
 
@@ -73,6 +113,7 @@ def cairo_run(request, cairo_program) -> list:
     Returns the output of the cairo program put in the output memory segment.
 
     When --profile-cairo is passed, the cairo program is run with the tracer enabled and the resulting trace is dumped.
+    When --profile-evm is passed, the steps and builtins of each EVM opcode executed by the interpreter are dumped.
 
     Logic is mainly taken from starkware.cairo.lang.vm.cairo_run with minor updates like the addition of the output segment.
     """
@@ -169,7 +210,11 @@ def cairo_run(request, cairo_program) -> list:
                 "serde": serde,
                 "Opcodes": Opcodes,
             },
-            vm_class=VmWithCoverage,
+            vm_class=(
+                VmWithCoverage
+                if request.config.getoption("no_native_hints")
+                else VmWithNativeHints
+            ),
         )
         run_resources = RunResources(n_steps=10_000_000)
         try:
@@ -179,6 +224,14 @@ def cairo_run(request, cairo_program) -> list:
 
         runner.original_steps = runner.vm.current_step
         runner.end_run(disable_trace_padding=False)
+        resources = runner.get_execution_resources()
+        _resources_report.append(
+            {
+                "entrypoint": entrypoint,
+                "n_steps": resources.n_steps,
+                **resources.builtin_instance_counter,
+            }
+        )
         if request.config.getoption("proof_mode"):
             return_data_offset = serde.get_offset(return_data.cairo_type)
             pointer = runner.vm.run_context.ap - return_data_offset
@@ -216,7 +269,9 @@ def cairo_run(request, cairo_program) -> list:
         output_stem = Path(
             f"{output_stem[:160]}_{int(time_ns())}_{md5(output_stem.encode()).digest().hex()[:8]}"
         )
-        if request.config.getoption("profile_cairo"):
+        if request.config.getoption("profile_cairo") or request.config.getoption(
+            "profile_evm"
+        ):
             tracer_data = TracerData(
                 program=cairo_program,
                 memory=runner.relocated_memory,
@@ -224,11 +279,26 @@ def cairo_run(request, cairo_program) -> list:
                 debug_info=runner.get_relocated_debug_info(),
                 program_base=PROGRAM_BASE,
             )
+
+        if request.config.getoption("profile_cairo"):
             data = profile_from_tracer_data(tracer_data)
 
             with open(output_stem.with_suffix(".pb.gz"), "wb") as fp:
                 fp.write(data)
 
+        if request.config.getoption("profile_evm"):
+            samples = evm_profile_from_tracer_data(
+                tracer_data,
+                cells_per_builtin={
+                    name.replace("_builtin", ""): builtin_runner.cells_per_instance
+                    for name, builtin_runner in runner.builtin_runners.items()
+                },
+            )
+            if samples:
+                dump_evm_profile(
+                    output_stem.with_name(f"{output_stem.name}_evm"), samples
+                )
+
         if request.config.getoption("proof_mode"):
             with open(output_stem.with_suffix(".trace"), "wb") as fp:
                 write_binary_trace(fp, runner.relocated_trace)
@@ -0,0 +1,212 @@
+from types import SimpleNamespace
+
+import pytest
+
+from tests.fixtures.scheduling import (
+    ESTIMATED_STEPS,
+    HISTORY_KEY,
+    WeightedScheduling,
+    pytest_sessionfinish,
+    pytest_xdist_make_scheduler,
+)
+
+
+class FakeNode:
+    def __init__(self, name):
+        self.gateway = SimpleNamespace(id=name)
+        self.sent = []
+        self.shutting_down = False
+
+    def send_runtest_some(self, indices):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+class FakeCache:
+    def __init__(self, values=None):
+        self.values = values or {}
+
+    def get(self, key, default):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class FakeConfig:
+    def __init__(self, n_nodes=2, history=None, **options):
+        self.options = {
+            "tx": [f"{n_nodes}*popen"],
+            "maxschedchunk": None,
+            "weighted_dist": True,
+            **options,
+        }
+        self.cache = FakeCache({HISTORY_KEY: history} if history else {})
+        self.stash = pytest.Stash()
+
+    def getoption(self, name):
+        return self.options[name]
+
+    getvalue = getoption
+
+
+def start(scheduler, collection, n_nodes=2):
+    nodes = [FakeNode(f"gw{i}") for i in range(n_nodes)]
+    for node in nodes:
+        scheduler.add_node(node)
+    for node in nodes:
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+    return nodes
+
+
+def sent_tests(node, collection):
+    return [collection[index] for index in node.sent]
+
+
+def run_all(scheduler, nodes):
+    """Complete the pending tests of the nodes until all of them are shut down."""
+    ran = []
+    while not all(node.shutting_down for node in nodes):
+        for node in nodes:
+            pending = scheduler.node2pending[node]
+            if pending:
+                ran.append(pending[0])
+                scheduler.mark_test_complete(node, pending[0])
+    # The tests still pending on a node are run before it finishes shutting down
+    for node in nodes:
+        ran.extend(scheduler.node2pending[node])
+    return ran
+
+
+class TestWeightedScheduling:
+    def test_should_assign_heaviest_tests_to_least_loaded_node(self):
+        collection = ["a", "b", "c", "d"]
+        scheduler = WeightedScheduling(
+            FakeConfig(), weights={"a": 5, "b": 4, "c": 3, "d": 2}
+        )
+        gw0, gw1 = start(scheduler, collection)
+
+        # a (5) + d (2) and b (4) + c (3)
+        assert sent_tests(gw0, collection) == ["a", "d"]
+        assert sent_tests(gw1, collection) == ["b", "c"]
+        assert scheduler.pending == []
+
+    def test_should_schedule_unknown_tests_dynamically(self):
+        collection = ["a", "b", "x", "y", "z", "t"]
+        scheduler = WeightedScheduling(FakeConfig(), weights={"a": 2, "b": 1})
+        nodes = start(scheduler, collection)
+        gw0, gw1 = nodes
+
+        assert sent_tests(gw0, collection)[0] == "a"
+        assert sent_tests(gw1, collection)[0] == "b"
+        assert {collection[index] for index in scheduler.pending} <= {
+            "x",
+            "y",
+            "z",
+            "t",
+        }
+
+        ran = run_all(scheduler, nodes)
+        assert sorted(ran) == list(range(len(collection)))
+        assert scheduler.tests_finished
+
+    def test_should_weight_unknown_tests_with_estimate(self):
+        collection = ["a", "b", "c"]
+        estimates = {"b": 3, "c": 2}
+        scheduler = WeightedScheduling(
+            FakeConfig(), weights={"a": 4}, estimate=estimates.get
+        )
+        gw0, gw1 = start(scheduler, collection)
+
+        assert sent_tests(gw0, collection) == ["a"]
+        assert sent_tests(gw1, collection) == ["b", "c"]
+
+    def test_should_reschedule_tests_of_node_down(self):
+        collection = ["a", "b", "c", "d"]
+        scheduler = WeightedScheduling(
+            FakeConfig(), weights={"a": 5, "b": 4, "c": 3, "d": 2}
+        )
+        gw0, gw1 = start(scheduler, collection)
+
+        crashitem = scheduler.remove_node(gw0)
+
+        # The running test is reported as crashed, the other ones are pending again
+        assert crashitem == "a"
+        assert [collection[index] for index in scheduler.pending] == ["d"]
+        # gw1 is already shutting down, the replacement of gw0 runs them
+        gw2 = FakeNode("gw2")
+        scheduler.add_node(gw2)
+        scheduler.add_node_collection(gw2, collection)
+        scheduler.schedule()
+        assert sent_tests(gw1, collection) == ["b", "c"]
+        assert sent_tests(gw2, collection) == ["d"]
+        assert sorted(run_all(scheduler, [gw1, gw2])) == [1, 2, 3]
+
+
+class TestMakeScheduler:
+    def test_should_use_default_scheduling_without_history(self):
+        assert pytest_xdist_make_scheduler(FakeConfig(), log=None) is None
+
+    def test_should_use_default_scheduling_without_weighted_dist(self):
+        config = FakeConfig(history={"a": {"duration": 1}}, weighted_dist=False)
+        assert pytest_xdist_make_scheduler(config, log=None) is None
+
+    def test_should_weight_tests_by_duration(self):
+        config = FakeConfig(history={"a": {"duration": 1.5, "n_steps": None}})
+        scheduler = pytest_xdist_make_scheduler(config, log=None)
+        assert scheduler.weights == {"a": 1.5}
+        assert scheduler.estimate is None
+
+    def test_should_use_estimated_steps_without_history(self):
+        config = FakeConfig()
+        config.stash[ESTIMATED_STEPS] = {"a": 100}.get
+        scheduler = pytest_xdist_make_scheduler(config, log=None)
+        assert scheduler.estimate("a") == 100
+        assert scheduler.estimate("b") is None
+
+    def test_should_convert_estimated_steps_to_durations(self):
+        config = FakeConfig(
+            history={
+                "a": {"duration": 1, "n_steps": 1000},
+                "b": {"duration": 3, "n_steps": 1000},
+            }
+        )
+        config.stash[ESTIMATED_STEPS] = {"c": 500}.get
+        scheduler = pytest_xdist_make_scheduler(config, log=None)
+        assert scheduler.estimate("c") == 1
+
+
+class TestHistory:
+    def test_should_merge_history_in_cache(self, monkeypatch):
+        config = FakeConfig(
+            history={
+                "a": {"duration": 1, "n_steps": 10},
+                "b": {"duration": 2, "n_steps": 20},
+            }
+        )
+        monkeypatch.setattr(
+            "tests.fixtures.scheduling._history",
+            {"b": {"duration": 3, "n_steps": 30}, "c": {"duration": 4, "n_steps": 40}},
+        )
+
+        pytest_sessionfinish(SimpleNamespace(config=config))
+
+        assert config.cache.get(HISTORY_KEY, {}) == {
+            "a": {"duration": 1, "n_steps": 10},
+            "b": {"duration": 3, "n_steps": 30},
+            "c": {"duration": 4, "n_steps": 40},
+        }
+
+    def test_should_not_write_history_on_workers(self, monkeypatch):
+        config = FakeConfig()
+        config.workerinput = {}
+        monkeypatch.setattr(
+            "tests.fixtures.scheduling._history", {"a": {"duration": 1}}
+        )
+
+        pytest_sessionfinish(SimpleNamespace(config=config))
+
+        assert config.cache.get(HISTORY_KEY, {}) == {}
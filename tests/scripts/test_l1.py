@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from eth_account import Account
+from web3.providers.async_base import AsyncBaseProvider
+
+from kakarot_scripts.utils.l1 import L1Client
+
+ACCOUNT = Account.from_key(b"\x01" * 32)
+TO = "0x000000000000000000000000000000000000dEaD"
+
+
+class StubProvider(AsyncBaseProvider):
+    """
+    Answer the RPC calls of the L1Client and record them, yielding to the event loop on
+    each request so that concurrent calls interleave.
+    """
+
+    def __init__(self, transaction_count=0, gas_price=1):
+        super().__init__()
+        self.transaction_count = transaction_count
+        self.gas_price = gas_price
+        self.send_error = None
+        self.calls = []
+
+    async def is_connected(self, show_traceback=False):
+        return True
+
+    async def make_request(self, method, params):
+        self.calls.append(method)
+        await asyncio.sleep(0)
+        if method == "eth_sendRawTransaction" and self.send_error is not None:
+            return {"jsonrpc": "2.0", "id": 0, "error": self.send_error}
+        result = {
+            "eth_chainId": hex(1),
+            "eth_gasPrice": hex(self.gas_price),
+            "eth_estimateGas": hex(21_000),
+            "eth_getTransactionCount": hex(self.transaction_count),
+            "eth_sendRawTransaction": "0x" + "11" * 32,
+        }[method]
+        return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+
+@pytest.fixture
+def provider():
+    return StubProvider()
+
+
+@pytest.fixture
+def client(provider, monkeypatch):
+    monkeypatch.setattr(
+        "kakarot_scripts.utils.l1.AsyncHTTPProvider", lambda _: provider
+    )
+    return L1Client("http://stub", gas_price_ttl=60)
+
+
+class TestL1Client:
+    class TestPrepareTransaction:
+        async def test_should_sequence_nonces_of_concurrent_transactions(
+            self, client, provider
+        ):
+            provider.transaction_count = 3
+
+            transactions = await asyncio.gather(
+                *[client.prepare_transaction(TO, caller_eoa=ACCOUNT) for _ in range(5)]
+            )
+
+            assert sorted(tx["nonce"] for tx in transactions) == [3, 4, 5, 6, 7]
+            assert provider.calls.count("eth_getTransactionCount") == 1
+            assert provider.calls.count("eth_gasPrice") == 1
+            assert {tx["chainId"] for tx in transactions} == {1}
+
+        async def test_should_cache_gas_price_for_ttl(self, client, provider):
+            await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+            provider.gas_price = 2
+            transaction = await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+
+            assert transaction["gasPrice"] == 1
+            assert provider.calls.count("eth_gasPrice") == 1
+
+            client._gas_price_updated_at -= client.gas_price_ttl + 1
+            transaction = await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+
+            assert transaction["gasPrice"] == 2
+            assert provider.calls.count("eth_gasPrice") == 2
+
+    class TestSendTransaction:
+        async def test_should_reset_nonce_after_failed_send(self, client, provider):
+            transaction = await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+            provider.send_error = {"code": -32000, "message": "nonce too low"}
+
+            with pytest.raises(ValueError, match="nonce too low"):
+                await client.send_transaction(transaction, caller_eoa=ACCOUNT)
+
+            provider.transaction_count = 1
+            transaction = await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+            assert transaction["nonce"] == 1
+            assert provider.calls.count("eth_getTransactionCount") == 2
+
+        async def test_should_not_reset_nonce_when_higher_nonces_were_handed_out(
+            self, client, provider
+        ):
+            first, second = [
+                await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+                for _ in range(2)
+            ]
+            provider.send_error = {"code": -32000, "message": "insufficient funds"}
+
+            with pytest.raises(ValueError, match="insufficient funds"):
+                await client.send_transaction(first, caller_eoa=ACCOUNT)
+
+            transaction = await client.prepare_transaction(TO, caller_eoa=ACCOUNT)
+            assert [first["nonce"], second["nonce"], transaction["nonce"]] == [0, 1, 2]
+            assert provider.calls.count("eth_getTransactionCount") == 1
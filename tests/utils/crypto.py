@@ -0,0 +1,117 @@
+"""
+Crypto primitives backing the precompile patches of the SyscallHandler.
+
+Two backends are available:
+    - native: coincurve (libsecp256k1) and fastecdsa (GMP), both installed along with
+      the ethereum and cairo-lang packages;
+    - python: the pure python implementations of ethereum.crypto and ecdsa.
+
+The native backend is used when importable, and the backend can be forced with the
+KAKAROT_CRYPTO_BACKEND env variable.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import cache
+from hashlib import sha256
+from typing import Callable, Optional
+
+SECP256R1N = 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551
+
+
+@dataclass(frozen=True)
+class CryptoBackend:
+    name: str
+    # (msg_hash, r, s, y_parity) -> uncompressed public key without prefix, None if invalid
+    secp256k1_recover: Callable[[bytes, int, int, int], Optional[bytes]]
+    # (msg_hash, r, s, x, y) -> whether the signature is valid
+    secp256r1_verify: Callable[[int, int, int, int, int], bool]
+
+
+def _python_secp256k1_recover(msg_hash, r, s, y_parity):
+    from ethereum.base_types import U256
+    from ethereum.crypto.elliptic_curve import secp256k1_recover
+
+    try:
+        return bytes(secp256k1_recover(U256(r), U256(s), U256(y_parity), msg_hash))
+    except Exception:
+        return None
+
+
+def _python_secp256r1_verify(msg_hash, r, s, x, y):
+    import ecdsa
+
+    verifying_key = ecdsa.VerifyingKey.from_string(
+        x.to_bytes(32, "big") + y.to_bytes(32, "big"),
+        curve=ecdsa.NIST256p,
+        hashfunc=sha256,
+    )
+    return verifying_key.pubkey.verifies(msg_hash, ecdsa.ecdsa.Signature(r, s))
+
+
+def _native_secp256k1_recover(msg_hash, r, s, y_parity):
+    from coincurve import PublicKey
+
+    try:
+        public_key = PublicKey.from_signature_and_message(
+            r.to_bytes(32, "big") + s.to_bytes(32, "big") + bytes([y_parity]),
+            msg_hash,
+            hasher=None,
+        )
+    except Exception:
+        return None
+    return public_key.format(compressed=False)[1:]
+
+
+def _native_secp256r1_verify(msg_hash, r, s, x, y):
+    from fastecdsa.curve import P256
+    from fastecdsa.ecdsa import verify
+    from fastecdsa.point import Point
+
+    public_key = Point(x, y, curve=P256)
+    # Same as ecdsa, which returns False instead of raising for out of range values
+    if not (0 < r < SECP256R1N and 0 < s < SECP256R1N):
+        return False
+    return verify(
+        (r, s),
+        msg_hash.to_bytes(32, "big"),
+        public_key,
+        curve=P256,
+        hashfunc=sha256,
+        prehashed=True,
+    )
+
+
+BACKENDS = {
+    "python": CryptoBackend(
+        name="python",
+        secp256k1_recover=_python_secp256k1_recover,
+        secp256r1_verify=_python_secp256r1_verify,
+    ),
+    "native": CryptoBackend(
+        name="native",
+        secp256k1_recover=_native_secp256k1_recover,
+        secp256r1_verify=_native_secp256r1_verify,
+    ),
+}
+
+
+def _native_available() -> bool:
+    try:
+        import coincurve  # noqa: F401
+        import fastecdsa  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@cache
+def get_backend() -> CryptoBackend:
+    name = os.getenv(
+        "KAKAROT_CRYPTO_BACKEND", "native" if _native_available() else "python"
+    )
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown crypto backend {name}, expected one of {list(BACKENDS)}"
+        )
+    return BACKENDS[name]
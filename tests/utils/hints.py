@@ -1,10 +1,34 @@
+import re
+import traceback
 from collections import defaultdict
 from contextlib import contextmanager
-from typing import Optional
+from functools import lru_cache
+from textwrap import dedent
+from typing import Callable, Dict, Optional
 from unittest.mock import patch
 
 from starkware.cairo.common.dict import DictTracker
+from starkware.cairo.common.math_utils import assert_integer
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME as PRIME
+from starkware.cairo.lang.compiler.ast.cairo_types import TypeStruct
+from starkware.cairo.lang.compiler.ast.expr import (
+    ExprConst,
+    ExprDeref,
+    ExprOperator,
+    ExprReg,
+)
+from starkware.cairo.lang.compiler.expression_evaluator import ExpressionEvaluator
+from starkware.cairo.lang.compiler.expression_simplifier import ExpressionSimplifier
+from starkware.cairo.lang.compiler.instruction import Register
+from starkware.cairo.lang.compiler.preprocessor.flow import MissingReferenceError
 from starkware.cairo.lang.compiler.program import CairoHint
+from starkware.cairo.lang.compiler.type_system_visitor import simplify_type_system
+from starkware.cairo.lang.vm.virtual_machine_base import CompiledHint
+
+from tests.utils.coverage import VmWithCoverage
+
+RC_BOUND = 2**128
+SHIFT = 2**128
 
 
 def debug_info(program):
@@ -100,3 +124,272 @@ def insert_hint(program, location: str, hint):
         patch.object(program, "hints", new=new_hints),
     ):
         yield
+
+
+# Hint code -> native implementation, see native_hint
+NATIVE_HINTS: Dict[str, Callable] = {}
+
+
+def _normalize(code: str) -> str:
+    return dedent(code).strip()
+
+
+def native_hint(*codes: str):
+    """
+    Register a native implementation for the given hint codes.
+
+    The implementation is called with the memory, ap and a NativeIds object instead of
+    executing the hint code with the `ids` proxy of the VM.
+    """
+
+    def _register(fn):
+        for code in codes:
+            NATIVE_HINTS[_normalize(code)] = fn
+        return fn
+
+    return _register
+
+
+@native_hint(
+    """
+    sum_low = ids.a.low + ids.b.low
+    ids.carry_low = 1 if sum_low >= ids.SHIFT else 0
+    sum_high = ids.a.high + ids.b.high + ids.carry_low
+    ids.carry_high = 1 if sum_high >= ids.SHIFT else 0
+    """
+)
+def uint256_add(memory, ap, ids):
+    a, b = ids.a, ids.b
+    ids.carry_low = carry_low = 1 if memory[a] + memory[b] >= SHIFT else 0
+    ids.carry_high = 1 if memory[a + 1] + memory[b + 1] + carry_low >= SHIFT else 0
+
+
+@native_hint(
+    """
+    a = (ids.a.high << 128) + ids.a.low
+    div = (ids.div.high << 128) + ids.div.low
+    quotient, remainder = divmod(a, div)
+
+    ids.quotient.low = quotient & ((1 << 128) - 1)
+    ids.quotient.high = quotient >> 128
+    ids.remainder.low = remainder & ((1 << 128) - 1)
+    ids.remainder.high = remainder >> 128
+    """
+)
+def uint256_unsigned_div_rem(memory, ap, ids):
+    a, div = ids.a, ids.div
+    quotient, remainder = divmod(
+        (memory[a + 1] << 128) + memory[a], (memory[div + 1] << 128) + memory[div]
+    )
+    quotient_ptr, remainder_ptr = ids.quotient, ids.remainder
+    memory[quotient_ptr] = quotient & (SHIFT - 1)
+    memory[quotient_ptr + 1] = quotient >> 128
+    memory[remainder_ptr] = remainder & (SHIFT - 1)
+    memory[remainder_ptr + 1] = remainder >> 128
+
+
+@native_hint(
+    """
+    from starkware.cairo.common.math_utils import assert_integer
+    assert_integer(ids.div)
+    assert 0 < ids.div <= PRIME // range_check_builtin.bound, \\
+        f'div={hex(ids.div)} is out of the valid range.'
+    ids.q, ids.r = divmod(ids.value, ids.div)
+    """
+)
+def div_rem(memory, ap, ids):
+    div = ids.div
+    assert_integer(div)
+    assert 0 < div <= PRIME // RC_BOUND, f"div={hex(div)} is out of the valid range."
+    ids.q, ids.r = divmod(ids.value, div)
+
+
+@native_hint(
+    """
+    from starkware.cairo.common.math_utils import assert_integer
+    assert_integer(ids.a)
+    assert 0 <= ids.a % PRIME < range_check_builtin.bound, f'a = {ids.a} is out of range.'
+    """
+)
+def assert_nn(memory, ap, ids):
+    a = ids.a
+    assert_integer(a)
+    assert 0 <= a % PRIME < RC_BOUND, f"a = {a} is out of range."
+
+
+@native_hint(
+    """
+    ids.low = ids.a & ((1<<64) - 1)
+    ids.high = ids.a >> 64
+    """
+)
+def split_64(memory, ap, ids):
+    a = ids.a
+    ids.low = a & ((1 << 64) - 1)
+    ids.high = a >> 64
+
+
+@native_hint(
+    """
+    memory[ids.output] = res = (int(ids.value) % PRIME) % ids.base
+    assert res < ids.bound, f'split_int(): Limb {res} is out of range.'
+    """
+)
+def split_int(memory, ap, ids):
+    memory[ids.output] = res = (int(ids.value) % PRIME) % ids.base
+    assert res < ids.bound, f"split_int(): Limb {res} is out of range."
+
+
+@native_hint(
+    "memory[ap] = 0 if 0 <= (ids.a % PRIME) < range_check_builtin.bound else 1"
+)
+def is_nn(memory, ap, ids):
+    memory[ap] = 0 if 0 <= (ids.a % PRIME) < RC_BOUND else 1
+
+
+@native_hint(
+    "memory[ap] = 0 if 0 <= ((-ids.a - 1) % PRIME) < range_check_builtin.bound else 1"
+)
+def is_nn_out_of_range(memory, ap, ids):
+    memory[ap] = 0 if 0 <= ((-ids.a - 1) % PRIME) < RC_BOUND else 1
+
+
+def _compile_expr(expr, identifiers) -> Callable:
+    """
+    Compile an expression into a function of (memory, ap, fp), with fast paths for the
+    constants and the usual fp + offset and ap + offset addresses.
+    """
+    expr = ExpressionSimplifier().visit(expr)
+    if isinstance(expr, ExprConst):
+        return lambda memory, ap, fp: expr.val
+    if isinstance(expr, ExprReg):
+        expr = ExprOperator(a=expr, op="+", b=ExprConst(val=0))
+    if (
+        isinstance(expr, ExprOperator)
+        and expr.op == "+"
+        and isinstance(expr.a, ExprReg)
+        and isinstance(expr.b, ExprConst)
+    ):
+        offset = expr.b.val
+        if expr.a.reg == Register.FP:
+            return lambda memory, ap, fp: fp + offset
+        if expr.a.reg == Register.AP:
+            return lambda memory, ap, fp: ap + offset
+
+    return lambda memory, ap, fp: ExpressionEvaluator(
+        PRIME, ap, fp, memory, identifiers
+    ).eval(expr)
+
+
+def _resolve_id(program, hint: CairoHint, name: str):
+    """
+    Resolve an id of a hint once for all, as the VmConsts of the VM do on each access.
+
+    Return a (getter, address) pair of functions of (memory, ap, fp), the address being
+    None if the id doesn't reference memory.
+
+    As in VmConsts, the value of a struct is its address.
+    """
+    reference = hint.flow_tracking_data.resolve_reference(
+        reference_manager=program.reference_manager,
+        name=hint.accessible_scopes[-1] + name,
+    )
+    expr, expr_type = simplify_type_system(
+        reference.eval(hint.flow_tracking_data.ap_tracking),
+        identifiers=program.identifiers,
+    )
+    if not isinstance(expr, ExprDeref):
+        return _compile_expr(expr, program.identifiers), None
+
+    address = _compile_expr(expr.addr, program.identifiers)
+    if isinstance(expr_type, TypeStruct):
+        return address, address
+    return (lambda memory, ap, fp: memory[address(memory, ap, fp)]), address
+
+
+class NativeIds:
+    """
+    A lightweight replacement of the `ids` object of the VM for the native hints.
+    """
+
+    __slots__ = ("_ids", "_memory", "_ap", "_fp")
+
+    def __init__(self, ids, memory, ap, fp):
+        object.__setattr__(self, "_ids", ids)
+        object.__setattr__(self, "_memory", memory)
+        object.__setattr__(self, "_ap", ap)
+        object.__setattr__(self, "_fp", fp)
+
+    def __getattr__(self, name):
+        getter, _ = self._ids[name]
+        return getter(self._memory, self._ap, self._fp)
+
+    def __setattr__(self, name, value):
+        _, address = self._ids[name]
+        assert address is not None, f"{name} does not reference memory."
+        self._memory[address(self._memory, self._ap, self._fp)] = value
+
+
+class NativeHint:
+    """
+    A native implementation of a hint, with its ids resolved for the hint location.
+    """
+
+    def __init__(self, fn: Callable, program, hint: CairoHint):
+        self.fn = fn
+        self.ids = {}
+        for name in sorted(set(re.findall(r"\bids\.(\w+)", hint.code))):
+            try:
+                self.ids[name] = _resolve_id(program, hint, name)
+            except MissingReferenceError:
+                # Not a reference, e.g. a constant such as SHIFT
+                continue
+
+    def __call__(self, memory, ap, fp):
+        self.fn(memory, ap, NativeIds(self.ids, memory, ap, fp))
+
+
+@lru_cache(maxsize=None)
+def _compile_hint(source: str, filename: str):
+    return compile(source, filename, mode="exec")
+
+
+class VmWithNativeHints(VmWithCoverage):
+    """
+    VM executing the hints registered with native_hint as plain python functions, which
+    skips the exec and `ids` machinery for the hottest hints.
+    The other hints are compiled once per process instead of once per run.
+    """
+
+    def load_hints(self, program, program_base):
+        super().load_hints(program, program_base)
+        for pc, hints in program.hints.items():
+            for hint_index, hint in enumerate(hints):
+                fn = NATIVE_HINTS.get(_normalize(hint.code))
+                if fn is None:
+                    continue
+                self.hints[pc + program_base][hint_index] = CompiledHint(
+                    compiled=NativeHint(fn, program, hint),
+                    consts=lambda *_: None,
+                )
+
+    def compile_hint(self, source, filename, hint_index, pc):
+        if _normalize(source) in NATIVE_HINTS:
+            return None
+        try:
+            return _compile_hint(source, filename)
+        except (IndentationError, SyntaxError):
+            # Let the base class raise the proper VmException
+            return super().compile_hint(source, filename, hint_index, pc)
+
+    def exec_hint(self, code, globals_, hint_index):
+        if not isinstance(code, NativeHint):
+            return super().exec_hint(code, globals_, hint_index)
+
+        try:
+            code(globals_["memory"], globals_["ap"], globals_["fp"])
+        except Exception as exc:
+            # HintException expects the traceback to start in the base VM exec_hint
+            raise self.as_vm_exception(
+                exc, notes=[traceback.format_exc()], hint_index=hint_index
+            ) from None
@@ -1,24 +1,31 @@
 import json
 import logging
+from collections import defaultdict
 from functools import wraps
 from pathlib import Path
 from time import perf_counter
-from typing import Any, Callable, List, TypeVar, Union, cast
+from typing import Any, Callable, Dict, List, TypeVar, Union, cast
 
 from starkware.cairo.lang.compiler.identifier_definition import LabelDefinition
+from starkware.cairo.lang.compiler.scoped_name import ScopedName
 from starkware.cairo.lang.tracer.profile import ProfileBuilder
 
+from tests.utils.constants import ALL_PRECOMPILES, Opcodes
 from tests.utils.coverage import CoverageFile
 
 logging.basicConfig(format="%(levelname)-8s %(message)s")
 logger = logging.getLogger("timer")
 
 _time_report: List[dict] = []
+# Execution resources of each cairo run of the current test, see tests.fixtures.starknet
+_resources_report: List[dict] = []
 # A mapping to fix the mismatch between the debug_info and the identifiers.
 _label_scope = {
     "kakarot.constants.opcodes_label": "kakarot.constants",
     "kakarot.accounts.library.internal.pow_": "kakarot.accounts.library.internal",
 }
+# The function dispatching one EVM opcode, sampled by the EVM profiler.
+_exec_opcode = "kakarot.interpreter.Interpreter.exec_opcode"
 T = TypeVar("T", bound=Callable[..., Any])
 
 
@@ -40,6 +47,21 @@ def timeit(fun: T) -> T:
     return cast(T, timed_fun)
 
 
+def on_xdist_controller(hook: T) -> T:
+    """
+    Skip the decorated session hook on the xdist workers: their reports are all sent
+    to the controller, which is the only one to write them.
+    """
+
+    @wraps(hook)
+    def controller_hook(session):
+        if hasattr(session.config, "workerinput"):
+            return None
+        return hook(session)
+
+    return cast(T, controller_hook)
+
+
 def dump_coverage(path: Union[str, Path], files: List[CoverageFile]):
     p = Path(path)
     p.mkdir(exist_ok=True, parents=True)
@@ -97,3 +119,187 @@ def profile_from_tracer_data(tracer_data):
             pass
 
     return builder.dump()
+
+
+def _member_offsets(program, struct: str) -> Dict[str, int]:
+    return {
+        name: member.offset
+        for name, member in program.identifiers.get_by_full_name(
+            ScopedName.from_string(struct)
+        ).members.items()
+    }
+
+
+def evm_profile_from_tracer_data(
+    tracer_data, cells_per_builtin: Dict[str, int]
+) -> List[dict]:
+    """
+    Attribute the steps and builtins of each Interpreter.exec_opcode call to the
+    executed EVM opcode.
+
+    A call is sampled from its first step until it returns, i.e. until the fp goes
+    below the one of the call. The builtins usage is the difference between the
+    builtin pointers passed to and returned by the call.
+
+    Returns one sample per dispatched opcode, empty if the program does not
+    contain the interpreter.
+    """
+    program = tracer_data.program
+    exec_opcode = program.identifiers.get_by_full_name(
+        ScopedName.from_string(_exec_opcode)
+    )
+    if exec_opcode is None:
+        return []
+
+    entry_pc = tracer_data.get_pc_from_offset(exec_opcode.pc)
+    implicit_args = list(_member_offsets(program, f"{_exec_opcode}.ImplicitArgs"))
+    args_size = len(implicit_args) + len(
+        _member_offsets(program, f"{_exec_opcode}.Args")
+    )
+    # The returned values are the implicit args followed by the returned evm
+    return_size = len(implicit_args) + 1
+    builtins = {
+        name: name.replace("_ptr", "")
+        for name in implicit_args
+        if name.replace("_ptr", "") in cells_per_builtin
+    }
+    evm_offsets = _member_offsets(program, "kakarot.model.model.EVM")
+    message_offsets = _member_offsets(program, "kakarot.model.model.Message")
+    address_offsets = _member_offsets(program, "kakarot.model.model.Address")
+
+    memory = tracer_data.memory
+    trace = tracer_data.trace
+    samples = []
+    # Samples of the calls returning a child evm, waiting for the gas left in their
+    # frame after the child returns, i.e. at the next dispatch at their depth
+    pending = {}
+    for i, entry in enumerate(trace):
+        if entry.pc != entry_pc:
+            continue
+
+        fp = entry.fp
+        # Arguments are pushed right before the return fp and pc
+        args_base = fp - 2 - args_size
+        evm = memory[args_base + args_size - 1]
+        message = memory[evm + evm_offsets["message"]]
+        pc = memory[evm + evm_offsets["program_counter"]]
+        gas_left = memory[evm + evm_offsets["gas_left"]]
+        depth = memory[message + message_offsets["depth"]]
+        bytecode = memory[message + message_offsets["bytecode"]]
+        bytecode_len = memory[message + message_offsets["bytecode_len"]]
+        code_address = memory[
+            memory[message + message_offsets["code_address"]] + address_offsets["evm"]
+        ]
+
+        if depth in pending:
+            pending.pop(depth)["trace"]["gas_after"] = gas_left
+
+        value = memory[bytecode + pc] if pc < bytecode_len else None
+        if value is not None:
+            opcode = (
+                Opcodes(value).name
+                if value in Opcodes._value2member_map_
+                else f"UNDEFINED_0x{value:02x}"
+            )
+        else:
+            opcode = "PRECOMPILE" if code_address in ALL_PRECOMPILES else "STOP"
+
+        end = next(
+            (j for j in range(i + 1, len(trace)) if trace[j].fp < fp), len(trace) - 1
+        )
+        return_base = trace[end].ap - return_size
+        sample = {
+            "contract": f"0x{code_address:040x}",
+            "pc": pc,
+            "opcode": opcode,
+            "n_steps": end - i,
+            **{
+                builtin: (
+                    memory[return_base + implicit_args.index(name)]
+                    - memory[args_base + implicit_args.index(name)]
+                )
+                // cells_per_builtin[builtin]
+                for name, builtin in builtins.items()
+            },
+        }
+
+        # Same format as the gas-trace feature of kakarot-ssj, only for the opcodes
+        # actually read from the bytecode
+        if value is not None:
+            returned_evm = memory[return_base + return_size - 1]
+            sample["trace"] = {
+                "address": memory[
+                    memory[message + message_offsets["address"]]
+                    + address_offsets["evm"]
+                ],
+                "depth": depth,
+                "pc": pc,
+                "opcode": value,
+                "gas_before": gas_left,
+                "gas_after": None,
+            }
+            returned_message = memory[returned_evm + evm_offsets["message"]]
+            if memory[returned_message + message_offsets["depth"]] == depth:
+                sample["trace"]["gas_after"] = memory[
+                    returned_evm + evm_offsets["gas_left"]
+                ]
+            else:
+                pending[depth] = sample
+
+        samples.append(sample)
+
+    return samples
+
+
+def dump_evm_profile(path: Union[str, Path], samples: List[dict]):
+    """
+    Dump the EVM profile samples as:
+        - <path>.folded: the steps folded by contract, opcode and pc, to be used with
+          flamegraph.pl, inferno or speedscope;
+        - <path>.json: the resources aggregated per opcode and per contract;
+        - <path>.ndjson: the trace of the executed opcodes, one JSON object per line,
+          to be analyzed with cairo/kakarot-ssj/scripts/gas_debug_call.py.
+    """
+    p = Path(path)
+    folded = defaultdict(int)
+    aggregates = {"opcodes": defaultdict(dict), "contracts": defaultdict(dict)}
+    for sample in samples:
+        folded[f"{sample['contract']};{sample['opcode']};pc_{sample['pc']}"] += sample[
+            "n_steps"
+        ]
+        resources = {
+            "count": 1,
+            **{
+                key: value
+                for key, value in sample.items()
+                if key not in ("contract", "pc", "opcode", "trace")
+            },
+        }
+        for kind, key in (
+            ("opcodes", sample["opcode"]),
+            ("contracts", sample["contract"]),
+        ):
+            for resource, value in resources.items():
+                aggregates[kind][key][resource] = (
+                    aggregates[kind][key].get(resource, 0) + value
+                )
+
+    with open(p.with_suffix(".folded"), "w") as fp:
+        fp.writelines(f"{stack} {steps}\n" for stack, steps in folded.items())
+
+    with open(p.with_suffix(".ndjson"), "w") as fp:
+        fp.writelines(
+            f"{json.dumps(sample['trace'])}\n"
+            for sample in samples
+            if "trace" in sample
+        )
+
+    with open(p.with_suffix(".json"), "w") as fp:
+        json.dump(
+            {
+                kind: dict(sorted(values.items(), key=lambda item: -item[1]["n_steps"]))
+                for kind, values in aggregates.items()
+            },
+            fp,
+            indent=2,
+        )
@@ -122,7 +122,12 @@ class Serde:
         raw = self.serialize_pointers("model.Account", ptr)
         return {
             "address": self.serialize_address(raw["address"]),
-            "code": self.serialize_list(raw["code"], list_len=raw["code_len"]),
+            # The code of the accounts fetched from Starknet is only loaded when used
+            "code": (
+                self.serialize_list(raw["code"], list_len=raw["code_len"])
+                if raw["code"] is not None
+                else None
+            ),
             "storage": self.serialize_dict(raw["storage_start"], "Uint256"),
             "nonce": raw["nonce"],
             "balance": self.serialize_uint256(raw["balance"]),
@@ -1,16 +1,16 @@
+import struct
 import time
-from collections import OrderedDict
+from collections import ChainMap, OrderedDict
 from contextlib import contextmanager
-from dataclasses import dataclass
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
 from hashlib import sha256
 from typing import Iterable, Optional, Union
 from unittest import mock
 
-import ecdsa
 from eth_utils import keccak
-from ethereum.base_types import U256
-from ethereum.crypto.elliptic_curve import SECP256K1N, secp256k1_recover
-from ethereum.crypto.hash import keccak256
+from ethereum.crypto.elliptic_curve import SECP256K1N
 from starkware.starknet.public.abi import (
     get_selector_from_name,
     get_storage_var_address,
@@ -18,47 +18,66 @@ from starkware.starknet.public.abi import (
 
 from kakarot_scripts.utils.uint256 import int_to_uint256, uint256_to_int
 from tests.utils.constants import CAIRO1_HELPERS_CLASS_HASH, CHAIN_ID
+from tests.utils.crypto import get_backend
 
 
+def memoize(patch):
+    """
+    Cache the retdata of a patch by its calldata, the contract address being ignored.
+    """
+
+    @lru_cache(maxsize=2**14)
+    def _cached(calldata: tuple) -> tuple:
+        return tuple(patch(None, list(calldata)))
+
+    @wraps(patch)
+    def _patch(_, calldata):
+        return list(_cached(tuple(calldata)))
+
+    _patch.cache_info = _cached.cache_info
+    _patch.cache_clear = _cached.cache_clear
+    return _patch
+
+
+@memoize
 def cairo_keccak(_, calldata):
-    return int_to_uint256(
-        int.from_bytes(
-            keccak(
-                b"".join(
-                    [num.to_bytes(8, "little") for num in calldata[1:-2]]
-                    + [calldata[-2].to_bytes(calldata[-1], "little")]
-                )
-            ),
-            "big",
-        )
+    """
+    Compute the keccak of the Cairo-style keccak calldata, i.e. full u64 little-endian words
+    followed by the last word and its length in bytes.
+    """
+    full_words = calldata[1:-2]
+    data = struct.pack(f"<{len(full_words)}Q", *full_words) + calldata[-2].to_bytes(
+        calldata[-1], "little"
     )
+    return int_to_uint256(int.from_bytes(keccak(data), "big"))
 
 
+@memoize
 def cairo_recover_eth_address(_, calldata):
     """
     Convert the input calldata from Cairo's `recover_eth_address` into a signature and a message hash,
     and then recover the Ethereum address from the signature.
     """
-    msg_hash = b"".join([num.to_bytes(16, "big") for num in reversed(calldata[0:2])])
-    r = U256(uint256_to_int(calldata[2], calldata[3]))
-    s = U256(uint256_to_int(calldata[4], calldata[5]))
-    y_parity = U256(calldata[6])
+    msg_hash = uint256_to_int(calldata[0], calldata[1]).to_bytes(32, "big")
+    r = uint256_to_int(calldata[2], calldata[3])
+    s = uint256_to_int(calldata[4], calldata[5])
+    y_parity = calldata[6]
 
     # r and s must have been validated by the precompile preparation
     if 0 >= r or r >= SECP256K1N:
         raise ValueError("Invalid r value")
     if 0 >= s or s >= SECP256K1N:
         raise ValueError("Invalid s value")
-    try:
-        public_key = secp256k1_recover(r, s, y_parity, msg_hash)
-    except Exception:
+    public_key = get_backend().secp256k1_recover(msg_hash, r, s, y_parity)
+    if public_key is None:
         return [0, 0]  # return [is_some: 0, address: 0]
     return [
         1,
-        int.from_bytes(keccak256(public_key)[12:32], "big"),
+        int.from_bytes(keccak(public_key)[12:32], "big"),
     ]  # return [is_some: 1, address: int]
 
 
+@memoize
 def cairo_verify_signature_secp256r1(_, calldata):
     """
     Convert the input calldata from Cairo's `verify_signature_secp256r1` into a message hash,
@@ -71,33 +90,39 @@ def cairo_verify_signature_secp256r1(_, calldata):
     x = uint256_to_int(calldata[6], calldata[7])
     y = uint256_to_int(calldata[8], calldata[9])
 
-    rawPublicKey = x.to_bytes(32, "big") + y.to_bytes(32, "big")
-    verifyingKey = ecdsa.VerifyingKey.from_string(
-        rawPublicKey, curve=ecdsa.NIST256p, hashfunc=sha256
-    )
-    public_key = verifyingKey.pubkey
-    signature = ecdsa.ecdsa.Signature(r, s)
-    is_valid = public_key.verifies(msg_hash, signature)
-    return [is_valid]
+    is_valid = get_backend().secp256r1_verify(msg_hash, r, s, x, y)
+    return [int(is_valid)]
 
 
+@memoize
 def cairo_compute_sha256_u32_array(_, calldata):
     """
     Compute the sha256 of a u32 array and return its bytes4 array representation.
     """
+    full_words = calldata[1:-2]
     sha256_hash = sha256(
-        b"".join(
-            [num.to_bytes(4, "big") for num in calldata[1:-2]]
-            + [calldata[-2].to_bytes(calldata[-1], "big")]
-        )
-    ).hexdigest()
+        struct.pack(f">{len(full_words)}I", *full_words)
+        + calldata[-2].to_bytes(calldata[-1], "big")
+    ).digest()
 
-    sha256_u32_array = [
-        int(sha256_hash[i : i + 8], 16) for i in range(0, len(sha256_hash), 8)
-    ]
+    sha256_u32_array = struct.unpack(">8I", sha256_hash)
     return [8, *sha256_u32_array]
 
 
+def get_valid_jumpdests(code) -> set:
+    """Return the offsets of the JUMPDEST opcodes of the code, skipping the PUSH data."""
+    jumpdests = set()
+    i = 0
+    while i < len(code):
+        opcode = code[i]
+        if opcode == 0x5B:
+            jumpdests.add(i)
+        elif 0x60 <= opcode <= 0x7F:
+            i += opcode - 0x5F
+        i += 1
+    return jumpdests
+
+
 def parse_state(state):
     """
     Parse a serialized state as a dict of string, mainly converting hex strings to
@@ -151,8 +176,58 @@ def parse_state(state):
     }
 
 
+_active_patches: ContextVar[ChainMap] = ContextVar("active_patches")
+
+
+@dataclass
+class SyscallRecorder:
+    """
+    The mocks recording the syscalls of the handlers of a context, only when
+    record_calls is set, see the record_syscalls marker in tests.fixtures.starknet.
+    """
+
+    record_calls: bool = False
+    mock_call: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_library_call: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_storage: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_event: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_replace_class: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_send_message_to_l1: mock.MagicMock = field(default_factory=mock.MagicMock)
+    mock_deploy: mock.MagicMock = field(default_factory=mock.MagicMock)
+
+
+RECORDER_FIELDS = tuple(SyscallRecorder.__dataclass_fields__)
+
+_recorder: ContextVar[SyscallRecorder] = ContextVar("recorder")
+
+
+def get_recorder() -> SyscallRecorder:
+    """
+    Return the recorder of the current context, creating it on first use so that
+    each thread gets its own.
+    """
+    try:
+        return _recorder.get()
+    except LookupError:
+        recorder = SyscallRecorder()
+        _recorder.set(recorder)
+        return recorder
+
+
+class _RecorderAttributes(type):
+    """
+    Resolve SyscallHandler.record_calls and SyscallHandler.mock_* to the recorder of
+    the current context, unless patched on the class.
+    """
+
+    def __getattr__(cls, name):
+        if name in RECORDER_FIELDS:
+            return getattr(get_recorder(), name)
+        raise AttributeError(name)
+
+
 @dataclass
-class SyscallHandler:
+class SyscallHandler(metaclass=_RecorderAttributes):
     """
     Mock class for execution of system calls in the StarkNet OS.
 
@@ -177,14 +252,13 @@ class SyscallHandler:
     contract_address: int = 0xABDE1
     caller_address: int = 0xABDE1
     class_hash: int = 0xC1A55
-    mock_call = mock.MagicMock()
-    mock_library_call = mock.MagicMock()
-    mock_storage = mock.MagicMock()
-    mock_event = mock.MagicMock()
-    mock_replace_class = mock.MagicMock()
-    mock_send_message_to_l1 = mock.MagicMock()
-    mock_deploy = mock.MagicMock()
+    # Storage written and events emitted during the run
+    storage: dict = field(default_factory=dict)
+    events: list = field(default_factory=list)
+    # record_calls and the mock_* objects are bound to the handler when created, from
+    # the recorder of the current context, see SyscallRecorder
 
+    # Default patches, shared by all the handlers and never mutated.
     # Patch the keccak library call to return the keccak of the input data.
     # We need to reconstruct the raw bytes from the Cairo-style keccak calldata.
     patches = {
@@ -202,9 +276,44 @@ class SyscallHandler:
     }
 
     def __post_init__(self):
-        self.patches[get_selector_from_name("execute_starknet_call")] = (
-            lambda addr, data: self.execute_starknet_call(addr, data)
-        )
+        # Each thread has its own recorder, created on first use, so that
+        # concurrent runs don't share the recorded syscalls
+        for name in RECORDER_FIELDS:
+            setattr(self, name, getattr(type(self), name))
+        # Snapshot of the patches active in the current context, so that each
+        # handler is isolated from the patches entered or exited during its run.
+        self.patches = {
+            **self.active_patches(),
+            get_selector_from_name("execute_starknet_call"): (
+                lambda addr, data: self.execute_starknet_call(addr, data)
+            ),
+        }
+
+    @classmethod
+    def active_patches(cls) -> ChainMap:
+        """
+        Return the patches of the current context, i.e. the scopes entered with patch
+        and patch_state (latest first) layered over the default patches.
+
+        The scopes are stored in a context variable, so that threads and asyncio tasks
+        each see their own patches.
+        """
+        return _active_patches.get(ChainMap(cls.patches))
+
+    @classmethod
+    @contextmanager
+    def patch_scope(cls, patches: dict):
+        """
+        Enter a new scope of patches, layered over the ones of the current context.
+
+        The underlying dicts are never mutated: exiting the scope restores the
+        previous layers.
+        """
+        token = _active_patches.set(cls.active_patches().new_child(patches))
+        try:
+            yield
+        finally:
+            _active_patches.reset(token)
 
     def execute_starknet_call(self, _, calldata):
         contract_address = calldata[0]
@@ -215,11 +324,12 @@ class SyscallHandler:
             raise ValueError(
                 f"Function selector 0x{function_selector:x} not found in patches."
             )
-        self.mock_call(
-            contract_address=contract_address,
-            function_selector=function_selector,
-            calldata=calldata,
-        )
+        if self.record_calls:
+            self.mock_call(
+                contract_address=contract_address,
+                function_selector=function_selector,
+                calldata=calldata,
+            )
         inner_retdata = self.patches.get(function_selector)(contract_address, calldata)
         return [len(inner_retdata), *inner_retdata, 1]
 
@@ -342,9 +452,10 @@ class SyscallHandler:
 
     def storage_read(self, segments, syscall_ptr):
         """
-        Return a constant value for the storage read system call.
-        We use the patches dict to store the storage values; returned value is 0 if the address is not found as in Starknet.
-        Value can also be set by patching the underling mock_storage object.
+        Return the value of the storage read system call.
+        Patched values take precedence, then the value returned by the underlying mock_storage object
+        (when recording calls), then the values written during the run; returned value is 0 if the
+        address is not found as in Starknet.
 
         Syscall structure is:
 
@@ -363,16 +474,18 @@ class SyscallHandler:
             }
         """
         address = segments.memory[syscall_ptr + 1]
-        mock = self.mock_storage(address=address)
+        mock = self.mock_storage(address=address) if self.record_calls else None
         patched = self.patches.get(address)
         value = (
-            patched if patched is not None else (mock if isinstance(mock, int) else 0)
+            patched
+            if patched is not None
+            else (mock if isinstance(mock, int) else self.storage.get(address, 0))
         )
         segments.write_arg(syscall_ptr + 2, [value])
 
     def storage_write(self, segments, syscall_ptr):
         """
-        Record the call in the internal mock object.
+        Write the value in the storage dict, and record the call in the internal mock object.
 
         Syscall structure is:
 
@@ -382,10 +495,11 @@ class SyscallHandler:
                 value: felt,
             }
         """
-        self.mock_storage(
-            address=segments.memory[syscall_ptr + 1],
-            value=segments.memory[syscall_ptr + 2],
-        )
+        address = segments.memory[syscall_ptr + 1]
+        value = segments.memory[syscall_ptr + 2]
+        self.storage[address] = value
+        if self.record_calls:
+            self.mock_storage(address=address, value=value)
 
     def replace_class(self, segments, syscall_ptr):
         """
@@ -399,13 +513,14 @@ class SyscallHandler:
             }
         """
         class_hash = segments.memory[syscall_ptr + 1]
-        self.mock_replace_class(
-            class_hash=class_hash,
-        )
+        if self.record_calls:
+            self.mock_replace_class(
+                class_hash=class_hash,
+            )
 
     def emit_event(self, segments, syscall_ptr):
         """
-        Record the call in the internal mock object.
+        Append the event to the events journal, and record the call in the internal mock object.
 
         Syscall structure is:
 
@@ -423,7 +538,9 @@ class SyscallHandler:
         data_len = segments.memory[syscall_ptr + 3]
         data_ptr = segments.memory[syscall_ptr + 4]
         data = [segments.memory[data_ptr + i] for i in range(data_len)]
-        self.mock_event(keys=keys, data=data)
+        self.events.append({"keys": keys, "data": data})
+        if self.record_calls:
+            self.mock_event(keys=keys, data=data)
 
     def call_contract(self, segments, syscall_ptr):
         """
@@ -462,11 +579,12 @@ class SyscallHandler:
             segments.memory[calldata_ptr + i]
             for i in range(segments.memory[syscall_ptr + 3])
         ]
-        self.mock_call(
-            contract_address=contract_address,
-            function_selector=function_selector,
-            calldata=calldata,
-        )
+        if self.record_calls:
+            self.mock_call(
+                contract_address=contract_address,
+                function_selector=function_selector,
+                calldata=calldata,
+            )
         retdata = self.patches.get(function_selector)(contract_address, calldata)
         retdata_segment = segments.add()
         segments.write_arg(retdata_segment, retdata)
@@ -503,11 +621,12 @@ class SyscallHandler:
             segments.memory[calldata_ptr + i]
             for i in range(segments.memory[syscall_ptr + 3])
         ]
-        self.mock_library_call(
-            class_hash=class_hash,
-            function_selector=function_selector,
-            calldata=calldata,
-        )
+        if self.record_calls:
+            self.mock_library_call(
+                class_hash=class_hash,
+                function_selector=function_selector,
+                calldata=calldata,
+            )
         retdata = self.patches.get(function_selector)(class_hash, calldata)
         retdata_segment = segments.add()
         segments.write_arg(retdata_segment, retdata)
@@ -529,7 +648,8 @@ class SyscallHandler:
         payload_size = segments.memory[syscall_ptr + 2]
         payload_ptr = segments.memory[syscall_ptr + 3]
         payload = [segments.memory[payload_ptr + i] for i in range(payload_size)]
-        self.mock_send_message_to_l1(to_address=to_address, payload=payload)
+        if self.record_calls:
+            self.mock_send_message_to_l1(to_address=to_address, payload=payload)
 
     def deploy(self, segments, syscall_ptr):
         """
@@ -561,12 +681,13 @@ class SyscallHandler:
             for i in range(constructor_calldata_size)
         ]
         deploy_from_zero = segments.memory[syscall_ptr + 5]
-        self.mock_deploy(
-            class_hash=class_hash,
-            contract_address_salt=contract_address_salt,
-            constructor_calldata=constructor_calldata,
-            deploy_from_zero=deploy_from_zero,
-        )
+        if self.record_calls:
+            self.mock_deploy(
+                class_hash=class_hash,
+                contract_address_salt=contract_address_salt,
+                constructor_calldata=constructor_calldata,
+                deploy_from_zero=deploy_from_zero,
+            )
 
         retdata = self.patches.get(get_selector_from_name("deploy"))(
             class_hash, constructor_calldata
@@ -575,6 +696,19 @@ class SyscallHandler:
         segments.write_arg(retdata_segment, retdata)
         segments.write_arg(syscall_ptr + 6, [len(retdata), retdata_segment])
 
+    @classmethod
+    def reset_mocks(cls, record_calls: bool = False):
+        """
+        Reset the calls recorded by the mock objects of the current context.
+
+        :param record_calls: Whether the syscalls should be recorded in the mocks.
+        """
+        recorder = get_recorder()
+        recorder.record_calls = record_calls
+        for name in RECORDER_FIELDS:
+            if name.startswith("mock_"):
+                getattr(recorder, name).reset_mock()
+
     @classmethod
     @contextmanager
     def patch(
@@ -603,7 +737,7 @@ class SyscallHandler:
         if value is None:
             args = list(args)
             value = args.pop()
-        cls.patches[selector_if_call] = value
+        patches = {selector_if_call: value}
         try:
             if isinstance(target, str):
                 selector_if_storage = get_storage_var_address(target, *args)
@@ -612,18 +746,15 @@ class SyscallHandler:
 
             if isinstance(value, Iterable):
                 for i, v in enumerate(value):
-                    cls.patches[selector_if_storage + i] = v
+                    patches[selector_if_storage + i] = v
             else:
-                cls.patches[selector_if_storage] = value
+                patches[selector_if_storage] = value
 
         except AssertionError:
             pass
 
-        yield
-
-        del cls.patches[selector_if_call]
-        if "selector_if_storage" in globals():
-            del cls.patches[selector_if_storage]
+        with cls.patch_scope(patches):
+            yield
 
     @classmethod
     @contextmanager
@@ -634,53 +765,67 @@ class SyscallHandler:
         Actual corresponding Starknet address are unknown but it doesn't matter since the
         Kakarot_evm_to_starknet_address storage is also patched.
 
+        The code hash and the valid jumpdests of the accounts are derived from their
+        code, unless already patched in the current context.
+
         :param state: the state to patch with, an output dictionary of parse_state
         """
-        patched_before = set(cls.patches.keys())
 
         def _balance_of(_, calldata):
             return int_to_uint256(state.get(calldata[0], {}).get("balance", 0))
 
-        balance_selector = get_selector_from_name("balanceOf")
-        cls.patches[balance_selector] = _balance_of
-
         def _bytecode(contract_address, _):
             code = state.get(contract_address, {}).get("code", [])
             return [len(code), *code]
 
-        bytecode_selector = get_selector_from_name("bytecode")
-        cls.patches[bytecode_selector] = _bytecode
-
         def _bytecode_len(contract_address, _):
             code = state.get(contract_address, {}).get("code", [])
             return [len(code)]
 
-        bytecode_len_selector = get_selector_from_name("bytecode_len")
-        cls.patches[bytecode_len_selector] = _bytecode_len
-
         def _get_nonce(contract_address, _):
             return [state.get(contract_address, {}).get("nonce", 0)]
 
-        nonce_selector = get_selector_from_name("get_nonce")
-        cls.patches[nonce_selector] = _get_nonce
-
         def _storage(contract_address, calldata):
             return int_to_uint256(
                 state.get(contract_address, {}).get("storage", {}).get(calldata[0], 0)
             )
 
-        storage_selector = get_selector_from_name("storage")
-        cls.patches[storage_selector] = _storage
+        @lru_cache(maxsize=None)
+        def _code_hash(contract_address):
+            code = state.get(contract_address, {}).get("code", [])
+            return int.from_bytes(keccak(bytes(code)), "big")
+
+        @lru_cache(maxsize=None)
+        def _valid_jumpdests(contract_address):
+            return get_valid_jumpdests(state.get(contract_address, {}).get("code", []))
+
+        def _get_code_hash(contract_address, _):
+            return int_to_uint256(_code_hash(contract_address))
+
+        def _is_valid_jumpdest(contract_address, calldata):
+            return [int(calldata[0] in _valid_jumpdests(contract_address))]
+
+        patches = {
+            get_selector_from_name("balanceOf"): _balance_of,
+            get_selector_from_name("bytecode"): _bytecode,
+            get_selector_from_name("bytecode_len"): _bytecode_len,
+            get_selector_from_name("get_nonce"): _get_nonce,
+            get_selector_from_name("storage"): _storage,
+        }
+        active_patches = cls.active_patches()
+        for name, patch in (
+            ("get_code_hash", _get_code_hash),
+            ("is_valid_jumpdest", _is_valid_jumpdest),
+        ):
+            if get_selector_from_name(name) not in active_patches:
+                patches[get_selector_from_name(name)] = patch
 
         # Register accounts
         for address in state.keys():
             address_selector = get_storage_var_address(
                 "Kakarot_evm_to_starknet_address", address
             )
-            cls.patches[address_selector] = address
-
-        yield
+            patches[address_selector] = address
 
-        patched = set(cls.patches.keys())
-        for selector in patched - patched_before:
-            del cls.patches[selector]
+        with cls.patch_scope(patches):
+            yield
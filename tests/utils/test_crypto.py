@@ -0,0 +1,124 @@
+from hashlib import sha256
+from unittest import mock
+
+import ecdsa
+import pytest
+from coincurve import PrivateKey
+from ethereum.crypto.elliptic_curve import SECP256K1N
+from hypothesis import given, settings
+from hypothesis.strategies import binary, integers
+
+from kakarot_scripts.utils.uint256 import int_to_uint256
+from tests.utils.crypto import BACKENDS, SECP256R1N
+from tests.utils.syscall_handler import cairo_recover_eth_address, memoize
+
+native = BACKENDS["native"]
+python = BACKENDS["python"]
+
+
+class TestSecp256k1Recover:
+    @given(
+        secret=integers(min_value=1, max_value=SECP256K1N - 1),
+        msg_hash=binary(min_size=32, max_size=32),
+    )
+    @settings(max_examples=20, deadline=None)
+    def test_should_recover_same_public_key(self, secret, msg_hash):
+        private_key = PrivateKey.from_int(secret)
+        signature = private_key.sign_recoverable(msg_hash, hasher=None)
+        r = int.from_bytes(signature[:32], "big")
+        s = int.from_bytes(signature[32:64], "big")
+
+        expected = private_key.public_key.format(compressed=False)[1:]
+        assert native.secp256k1_recover(msg_hash, r, s, signature[64]) == expected
+        assert python.secp256k1_recover(msg_hash, r, s, signature[64]) == expected
+
+    @given(
+        r=integers(min_value=1, max_value=SECP256K1N - 1),
+        s=integers(min_value=1, max_value=SECP256K1N - 1),
+        y_parity=integers(min_value=0, max_value=1),
+        msg_hash=binary(min_size=32, max_size=32),
+    )
+    @settings(max_examples=20, deadline=None)
+    def test_should_agree_on_random_signatures(self, r, s, y_parity, msg_hash):
+        # Random r values are not always the x coordinate of a point of the curve
+        assert native.secp256k1_recover(
+            msg_hash, r, s, y_parity
+        ) == python.secp256k1_recover(msg_hash, r, s, y_parity)
+
+
+class TestSecp256r1Verify:
+    @given(
+        secret=integers(min_value=1, max_value=SECP256R1N - 1),
+        msg_hash=integers(min_value=0, max_value=2**256 - 1),
+    )
+    @settings(max_examples=20, deadline=None)
+    def test_should_agree_on_valid_and_tampered_signatures(self, secret, msg_hash):
+        signing_key = ecdsa.SigningKey.from_secret_exponent(
+            secret, curve=ecdsa.NIST256p, hashfunc=sha256
+        )
+        r, s = ecdsa.util.sigdecode_string(
+            signing_key.sign_digest(msg_hash.to_bytes(32, "big")), SECP256R1N
+        )
+        point = signing_key.get_verifying_key().pubkey.point
+        x, y = point.x(), point.y()
+
+        assert native.secp256r1_verify(msg_hash, r, s, x, y)
+        assert python.secp256r1_verify(msg_hash, r, s, x, y)
+        tampered = (msg_hash + 1) % 2**256
+        assert not native.secp256r1_verify(tampered, r, s, x, y)
+        assert not python.secp256r1_verify(tampered, r, s, x, y)
+
+    @pytest.mark.parametrize("r, s", [(0, 1), (1, 0), (SECP256R1N, 1), (1, SECP256R1N)])
+    def test_should_reject_out_of_range_signatures(self, r, s):
+        point = ecdsa.NIST256p.generator
+        x, y = point.x(), point.y()
+        assert not native.secp256r1_verify(0, r, s, x, y)
+        assert not python.secp256r1_verify(0, r, s, x, y)
+
+
+class TestMemoize:
+    def test_should_return_cached_retdata_for_same_calldata(self):
+        patch = mock.Mock(side_effect=lambda _, calldata: [sum(calldata)])
+        memoized = memoize(patch)
+
+        assert memoized(0x1, [1, 2]) == [3]
+        # The contract address is not part of the cache key
+        assert memoized(0x2, [1, 2]) == [3]
+        patch.assert_called_once_with(None, [1, 2])
+        assert memoized.cache_info().hits == 1
+
+    def test_should_not_share_retdata_across_calldata(self):
+        patch = mock.Mock(side_effect=lambda _, calldata: [sum(calldata)])
+        memoized = memoize(patch)
+
+        assert memoized(None, [1, 2]) == [3]
+        assert memoized(None, [2, 2]) == [4]
+        assert memoized(None, [1, 2, 0]) == [3]
+        assert patch.call_count == 3
+
+    def test_should_not_alter_cache_when_mutating_retdata(self):
+        memoized = memoize(lambda _, calldata: list(calldata))
+
+        retdata = memoized(None, [1, 2])
+        retdata.append(3)
+
+        assert memoized(None, [1, 2]) == [1, 2]
+
+    def test_should_recover_different_addresses_for_different_signatures(self):
+        msg_hash = b"\x01" * 32
+        addresses = []
+        for secret in (1, 2):
+            signature = PrivateKey.from_int(secret).sign_recoverable(
+                msg_hash, hasher=None
+            )
+            calldata = [
+                *int_to_uint256(int.from_bytes(msg_hash, "big")),
+                *int_to_uint256(int.from_bytes(signature[:32], "big")),
+                *int_to_uint256(int.from_bytes(signature[32:64], "big")),
+                signature[64],
+            ]
+            addresses.append(cairo_recover_eth_address(None, calldata))
+            assert cairo_recover_eth_address(None, calldata) == addresses[-1]
+
+        assert addresses[0][0] == addresses[1][0] == 1
+        assert addresses[0][1] != addresses[1][1]
@@ -0,0 +1,80 @@
+%builtins range_check
+
+from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.math import assert_nn, split_int, unsigned_div_rem
+from starkware.cairo.common.math_cmp import is_nn
+from starkware.cairo.common.uint256 import Uint256, split_64, uint256_add, uint256_unsigned_div_rem
+
+func test__uint256_add{range_check_ptr}() -> (felt, felt, felt) {
+    alloc_locals;
+    let (a_ptr) = alloc();
+    let (b_ptr) = alloc();
+    %{
+        segments.write_arg(ids.a_ptr, program_input["a"])
+        segments.write_arg(ids.b_ptr, program_input["b"])
+    %}
+    let (res, carry) = uint256_add([cast(a_ptr, Uint256*)], [cast(b_ptr, Uint256*)]);
+
+    return (res.low, res.high, carry);
+}
+
+func test__uint256_unsigned_div_rem{range_check_ptr}() -> (felt, felt, felt, felt) {
+    alloc_locals;
+    let (a_ptr) = alloc();
+    let (div_ptr) = alloc();
+    %{
+        segments.write_arg(ids.a_ptr, program_input["a"])
+        segments.write_arg(ids.div_ptr, program_input["div"])
+    %}
+    let (quotient, remainder) = uint256_unsigned_div_rem(
+        [cast(a_ptr, Uint256*)], [cast(div_ptr, Uint256*)]
+    );
+
+    return (quotient.low, quotient.high, remainder.low, remainder.high);
+}
+
+func test__unsigned_div_rem{range_check_ptr}() -> (felt, felt) {
+    tempvar value: felt;
+    tempvar div: felt;
+    %{
+        ids.value = program_input["value"]
+        ids.div = program_input["div"]
+    %}
+    let (q, r) = unsigned_div_rem(value, div);
+
+    return (q, r);
+}
+
+func test__assert_nn{range_check_ptr}() {
+    tempvar a: felt;
+    %{ ids.a = program_input["a"] %}
+    assert_nn(a);
+
+    return ();
+}
+
+func test__split_64{range_check_ptr}() -> (felt, felt) {
+    tempvar a: felt;
+    %{ ids.a = program_input["a"] %}
+    let (low, high) = split_64(a);
+
+    return (low, high);
+}
+
+func test__split_int{range_check_ptr}() -> (felt, felt, felt, felt) {
+    alloc_locals;
+    tempvar value: felt;
+    %{ ids.value = program_input["value"] %}
+    let (output) = alloc();
+    split_int(value=value, n=4, base=2 ** 64, bound=2 ** 64, output=output);
+
+    return (output[0], output[1], output[2], output[3]);
+}
+
+func test__is_nn{range_check_ptr}() -> felt {
+    tempvar a: felt;
+    %{ ids.a = program_input["a"] %}
+    let res = is_nn(a);
+
+    return res;
+}
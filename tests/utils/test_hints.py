@@ -0,0 +1,110 @@
+from unittest.mock import patch
+
+import pytest
+from hypothesis import example, given, settings
+from hypothesis.strategies import integers
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME as PRIME
+
+from kakarot_scripts.utils.uint256 import int_to_uint256
+from tests.utils.hints import NATIVE_HINTS, _normalize
+
+
+@pytest.fixture(scope="module")
+def cairo_run_both(cairo_run, pytestconfig):
+    """
+    Run the entrypoint with the native hints and with the hints executed by the VM.
+    Return both outputs, or both error messages when the runs fail.
+    """
+
+    def _run(entrypoint, **kwargs):
+        results = []
+        for no_native_hints in (False, True):
+            with patch.object(pytestconfig.option, "no_native_hints", no_native_hints):
+                try:
+                    results.append(cairo_run(entrypoint, **kwargs))
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    return _run
+
+
+class TestNativeHints:
+    def test_should_exercise_all_native_hints(self, cairo_program):
+        codes = {
+            _normalize(hint.code)
+            for hints in cairo_program.hints.values()
+            for hint in hints
+        }
+        assert set(NATIVE_HINTS) <= codes
+
+    @given(
+        a=integers(min_value=0, max_value=2**256 - 1),
+        b=integers(min_value=0, max_value=2**256 - 1),
+    )
+    @settings(max_examples=20)
+    def test_uint256_add(self, cairo_run_both, a, b):
+        native, vm = cairo_run_both(
+            "test__uint256_add", a=int_to_uint256(a), b=int_to_uint256(b)
+        )
+        assert native == vm
+
+    @given(
+        a=integers(min_value=0, max_value=2**256 - 1),
+        div=integers(min_value=1, max_value=2**256 - 1),
+    )
+    @settings(max_examples=20)
+    def test_uint256_unsigned_div_rem(self, cairo_run_both, a, div):
+        native, vm = cairo_run_both(
+            "test__uint256_unsigned_div_rem",
+            a=int_to_uint256(a),
+            div=int_to_uint256(div),
+        )
+        assert native == vm
+
+    @given(
+        value=integers(min_value=0, max_value=PRIME - 1),
+        div=integers(min_value=0, max_value=PRIME // 2**128 + 1),
+    )
+    @settings(max_examples=20)
+    def test_unsigned_div_rem(self, cairo_run_both, value, div):
+        native, vm = cairo_run_both("test__unsigned_div_rem", value=value, div=div)
+        if 0 < div <= PRIME // 2**128:
+            assert native == vm
+        else:
+            assert "is out of the valid range" in str(native)
+            assert "is out of the valid range" in str(vm)
+
+    @given(a=integers(min_value=0, max_value=PRIME - 1))
+    @settings(max_examples=20)
+    @example(a=2**128 - 1)
+    @example(a=2**128)
+    def test_assert_nn(self, cairo_run_both, a):
+        native, vm = cairo_run_both("test__assert_nn", a=a)
+        if a < 2**128:
+            assert native == vm
+        else:
+            assert f"a = {a} is out of range." in str(native)
+            assert f"a = {a} is out of range." in str(vm)
+
+    @given(a=integers(min_value=0, max_value=2**192 - 1))
+    @settings(max_examples=20)
+    def test_split_64(self, cairo_run_both, a):
+        native, vm = cairo_run_both("test__split_64", a=a)
+        assert native == vm
+
+    @given(value=integers(min_value=0, max_value=PRIME - 1))
+    @settings(max_examples=20)
+    def test_split_int(self, cairo_run_both, value):
+        native, vm = cairo_run_both("test__split_int", value=value)
+        assert native == vm
+
+    @given(a=integers(min_value=0, max_value=PRIME - 1))
+    @settings(max_examples=20)
+    # Negative values are checked by the second hint of is_nn
+    @example(a=PRIME - 1)
+    @example(a=PRIME - 2**128)
+    @example(a=2**128 - 1)
+    def test_is_nn(self, cairo_run_both, a):
+        native, vm = cairo_run_both("test__is_nn", a=a)
+        assert native == vm